@@ -0,0 +1,154 @@
+"""
+Per-session, content-addressed copy of the candidate's files.
+
+Clients can keep the server's copy in sync by sending a manifest of
+{path: sha256(content)} plus the content of only the files the server
+doesn't have yet, instead of re-uploading every file on every request.
+/prompt, /run-tests and /submit all read from the same copy.
+
+Sync protocol (any endpoint that accepts file_hashes):
+  1. Client sends file_hashes (the full manifest) and the files it
+     believes changed.
+  2. Server applies them. Paths missing from the manifest are dropped.
+  3. If any manifest hash is still unknown, the request fails with 409 and
+     {"missing_files": [...]}; the client resends with those files.
+
+Copies are kept like in-memory sessions: at most SPONGE_SESSION_MAX, least
+recently used evicted first, and dropped after SPONGE_SESSION_TTL idle.
+A client whose copy was dropped gets the 409 above and resends it.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+
+from gemini.client import _build_context_block
+from gemini.symbol_index import Query, query_basis
+from store import SESSION_MAX, SESSION_TTL_S
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class SessionFiles:
+    """A session's current files, addressed by path and content hash."""
+
+    def __init__(self):
+        self._files: dict[str, tuple[str, str]] = {}  # path → (hash, content)
+        self.version = 0                               # bumped on every change
+        self._context_key: Optional[tuple] = None      # (version, active_file)
+        self._context: tuple = ()                      # (contents, called, common)
+        self._context_blocks: dict[bool, str] = {}     # delta layout? → block
+
+    def __bool__(self) -> bool:
+        return bool(self._files)
+
+    def manifest(self) -> dict[str, str]:
+        return {path: h for path, (h, _) in self._files.items()}
+
+    def contents(self) -> dict[str, str]:
+        return {path: content for path, (_, content) in self._files.items()}
+
+    def _put(self, path: str, content: str) -> None:
+        h = content_hash(content)
+        if self._files.get(path, (None,))[0] != h:
+            self._files[path] = (h, content)
+            self.version += 1
+
+    def replace_all(self, file_contents: dict[str, str]) -> None:
+        """Adopt a full snapshot (the legacy request shape)."""
+        for path in list(self._files):
+            if path not in file_contents:
+                del self._files[path]
+                self.version += 1
+        for path, content in file_contents.items():
+            self._put(path, content)
+
+    def sync(self, manifest: dict[str, str], changed: dict[str, str]) -> list[str]:
+        """Apply a manifest plus changed files; return paths still missing.
+
+        Content that arrives is trusted over the hash the manifest claims
+        for it.
+        """
+        for path, content in changed.items():
+            self._put(path, content)
+        for path in list(self._files):
+            if path not in manifest:
+                del self._files[path]
+                self.version += 1
+        return sorted(
+            path for path, h in manifest.items()
+            if path not in changed and self._files.get(path, (None,))[0] != h
+        )
+
+    def context_block(self, active_file: Optional[str], prompt: Optional[str] = None,
+                      baseline: Optional[dict[str, str]] = None) -> str:
+        """Gemini codebase context for a prompt.
+
+        With baseline, only the files that differ from it (the layout used
+        with the cached prompt prefix). What the prompt doesn't affect —
+        the contents and the prompt-independent part of the ranking query —
+        is kept for the current (files version, active file) only. The
+        prompt just feeds ranking; a block is kept only for prompts that
+        name nothing, one per layout. The symbol index is cached by content,
+        so only edited files are re-parsed.
+        """
+        key = (self.version, active_file)
+        if self._context_key != key:
+            contents = self.contents()
+            self._context = (contents, *query_basis(active_file, contents))
+            self._context_blocks.clear()
+            self._context_key = key
+        contents, called, common = self._context
+        query = Query(prompt, called, common)
+        delta = baseline is not None
+        if not query.is_blank():
+            return _build_context_block(active_file, contents, prompt, baseline, query=query)
+        block = self._context_blocks.get(delta)
+        if block is None:
+            block = _build_context_block(active_file, contents, prompt, baseline, query=query)
+            self._context_blocks[delta] = block
+        return block
+
+
+# session_id → (expires at, files), least recently used first
+_files: "OrderedDict[str, tuple[float, SessionFiles]]" = OrderedDict()
+_files_lock = threading.Lock()
+
+
+def get_files(session_id: str) -> SessionFiles:
+    now = time.time()
+    with _files_lock:
+        while _files:
+            oldest = next(iter(_files.values()))
+            if oldest[0] > now:
+                break
+            _files.popitem(last=False)          # idle past the TTL
+        entry = _files.pop(session_id, None)
+        files = entry[1] if entry is not None else SessionFiles()
+        _files[session_id] = (now + SESSION_TTL_S, files)
+        while len(_files) > SESSION_MAX:
+            _files.popitem(last=False)
+    return files
+
+
+def sync_files(session_id: str, file_hashes: Optional[dict[str, str]],
+               changed: Optional[dict[str, str]]) -> SessionFiles:
+    """Bring the session's copy up to date with a request.
+
+    file_hashes given: manifest sync (409 if the server lacks any content).
+    Only changed given: treated as a full snapshot. Neither: untouched.
+    """
+    files = get_files(session_id)
+    if file_hashes is not None:
+        missing = files.sync(file_hashes, changed or {})
+        if missing:
+            raise HTTPException(status_code=409, detail={"missing_files": missing})
+    elif changed is not None:
+        files.replace_all(changed)
+    return files
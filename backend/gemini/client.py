@@ -3,7 +3,8 @@ Gemini AIDE client.
 
 Provides codebase-aware AI assistance for the Sponge coding exercise.
 Uses the google-genai library (replaces deprecated google-generativeai)
-with native async support — no asyncio.to_thread needed.
+with native async support — no asyncio.to_thread needed. call_gemini()
+returns the whole response; stream_gemini() yields it as it is generated.
 
 Edge cases handled:
   - Missing / invalid / expired API key
@@ -11,57 +12,43 @@ Edge cases handled:
   - Model not found (wrong plan or model name)
   - Network timeouts and transient errors
   - Safety filter blocks and empty responses
-  - Large codebase payloads (token budget + per-file truncation)
-  - Long conversation history (trimming + alternating-role enforcement)
+  - Large codebase payloads (relevance-ranked token budget + per-file truncation)
+  - Long conversation history (token budget + rolling summary + alternating-role enforcement)
   - Duplicate user message in history (frontend includes current msg)
 """
 
 import asyncio
 import logging
-import os
-from typing import Optional
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Optional, Union
 
-from google import genai
 from google.genai import types
 
 from gemini.config import GEMINI_MODEL_CHAIN
-from gemini.fallback import generate_with_fallback
+from gemini.context_cache import get_prefix_cache, is_cache_error
+from gemini.fallback import generate_with_fallback, stream_with_fallback
+from gemini.history import HISTORY_TOKENS, MAX_HISTORY_TURNS, fit_history
+from gemini.service import get_client
+from gemini.symbol_index import (
+    Query, build_query, file_symbols, rank_files, rank_symbols, symbol_score,
+)
+from gemini.tokens import calibrate, chars_for_tokens, estimate_tokens
 from .system_prompt import SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 
 # ─── Limits ────────────────────────────────────────────────────────────
 
-MAX_CONTEXT_CHARS = 120_000   # ~30k tokens — safe under Gemini's 1M window
-MAX_FILE_CHARS = 20_000       # Truncate any single file beyond this
-MAX_HISTORY_TURNS = 40        # Keep last N turns to avoid token overflow
+# Token budgets (gemini/tokens.py estimates). The input budget is split
+# between system prompt, history (gemini/history.py), prompt and context.
+MAX_INPUT_TOKENS = 45_000     # Whole request — well under Gemini's 1M window
+MAX_FILE_TOKENS = 5_000       # Condense any single file beyond this
+PROMPT_TOKENS_RESERVE = 2_000 # Room kept for the user's own message
+DELTA_CONTEXT_TOKENS = 16_000 # Edited files, when the baseline is in the cached prefix
+DELTA_MIN_SCORE = 4           # ...plus files outside the baseline the prompt names
 MAX_OUTPUT_TOKENS = 2048      # Cap response length — prevents one-shot dumps
 GEMINI_TIMEOUT_S = 55         # Per-call timeout — Vercel Pro allows 60s
-
-
-# ─── Lazy client initialization ────────────────────────────────────────
-
-_client: Optional[genai.Client] = None
-_configured_key: Optional[str] = None
-
-
-def _get_client() -> Optional[genai.Client]:
-    """
-    Lazily initialize and cache the Gemini Client.
-    Recreates the client only if the API key changes.
-    Returns None if GEMINI_API_KEY is not set.
-    """
-    global _client, _configured_key
-
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return None
-
-    if api_key != _configured_key:
-        _client = genai.Client(api_key=api_key)
-        _configured_key = api_key
-
-    return _client
+MAX_OUTLINE_NAMES = 8         # Definitions listed on a "[skipped]" marker
 
 
 # ─── Generation config ─────────────────────────────────────────────────
@@ -82,6 +69,12 @@ def _make_config() -> types.GenerateContentConfig:
 
 # ─── Context builder ──────────────────────────────────────────────────
 
+def _context_token_budget() -> int:
+    """What's left of MAX_INPUT_TOKENS after the system prompt, history and prompt."""
+    return (MAX_INPUT_TOKENS - estimate_tokens(SYSTEM_PROMPT)
+            - HISTORY_TOKENS - PROMPT_TOKENS_RESERVE)
+
+
 def _truncate(content: str, limit: int) -> str:
     """Truncate content with a visible marker so Gemini knows it's partial."""
     if len(content) <= limit:
@@ -89,47 +82,152 @@ def _truncate(content: str, limit: int) -> str:
     return content[:limit] + f"\n... [truncated — {len(content)} chars total]"
 
 
+def _condense(path: str, content: str, query: Query, limit: int) -> str:
+    """Fit a long file into limit by eliding its least relevant function bodies.
+
+    Keeps the file's layout and every signature; falls back to _truncate if
+    eliding everything still isn't enough (or the file doesn't parse).
+    """
+    if len(content) <= limit:
+        return content
+    lines = content.split("\n")
+    elidable = [s for s in file_symbols(path, content).symbols if s.kind != "class"]
+    # Least relevant first, biggest first among equals
+    elidable.sort(key=lambda s: (symbol_score(s, query), s.start - s.end))
+    size = len(content)
+    for symbol in elidable:
+        if size <= limit:
+            break
+        first = symbol.start - 1
+        while first < symbol.end - 1 and not lines[first].rstrip().endswith(":"):
+            first += 1   # keep decorators and the whole signature
+        body = range(first + 1, symbol.end)
+        if len(body) < 2:
+            continue
+        removed = sum(len(lines[i]) + 1 for i in body)
+        indent = lines[first + 1][:len(lines[first + 1]) - len(lines[first + 1].lstrip())]
+        marker = f"{indent}# ... {len(body)} lines elided"
+        lines[first + 1] = marker
+        for i in range(first + 2, symbol.end):
+            lines[i] = None
+        size += len(marker) + 1 - removed
+    condensed = "\n".join(line for line in lines if line is not None)
+    return _truncate(condensed, limit)
+
+
+def _excerpt(path: str, content: str, query: Query, budget: int) -> Optional[str]:
+    """The file's most relevant definitions that fit in budget tokens, in file order."""
+    lines = content.split("\n")
+    header = f"\n--- {path} --- [excerpts]"
+    used = estimate_tokens(header)
+    chosen = []
+    for symbol, _ in rank_symbols(path, content, query):
+        if any(symbol.start <= end and start <= symbol.end for start, end, _ in chosen):
+            continue   # already inside a chosen class, or contains one
+        piece = (
+            f"\n# ... {symbol.qualname} (lines {symbol.start}-{symbol.end})\n"
+            + "\n".join(lines[symbol.start - 1:symbol.end])
+        )
+        cost = estimate_tokens(piece)
+        if cost > MAX_FILE_TOKENS or used + cost > budget:
+            continue
+        chosen.append((symbol.start, symbol.end, piece))
+        used += cost
+    if not chosen:
+        return None
+    return header + "".join(piece for _, _, piece in sorted(chosen))
+
+
+def _skipped_marker(path: str, content: str) -> str:
+    names = [s.name for s in file_symbols(path, content).symbols if s.kind != "method"]
+    marker = f"\n--- {path} --- [skipped — context limit reached"
+    if names:
+        shown = ", ".join(names[:MAX_OUTLINE_NAMES])
+        marker += f"; defines {shown}" + (", …" if len(names) > MAX_OUTLINE_NAMES else "")
+    return marker + "]"
+
+
+def _fit_file(path: str, content: str, query: Query) -> str:
+    return _condense(path, content, query, chars_for_tokens(content, MAX_FILE_TOKENS))
+
+
 def _build_context_block(
     active_file: Optional[str],
     file_contents: Optional[dict[str, str]],
+    prompt: Optional[str] = None,
+    baseline: Optional[dict[str, str]] = None,
+    query: Optional[Query] = None,
 ) -> str:
     """
-    Build a codebase context string prepended to the user prompt.
+    Build a codebase context string prepended to the user prompt, within
+    _context_token_budget() tokens. query, if given, is the prompt's
+    already built Query.
+
+    With baseline (the sources in the cached prompt prefix, see
+    gemini/context_cache.py) only files that differ from it — plus other
+    files relevant to the prompt — are included, within DELTA_CONTEXT_TOKENS.
 
     Strategy:
-      1. Active file gets full content (up to MAX_FILE_CHARS) — shown first
-      2. Remaining files fill the budget in sorted order
-      3. Files that don't fit get a "[skipped]" marker so Gemini knows they exist
+      1. Active file gets full content (up to MAX_FILE_TOKENS) — shown first
+      2. Remaining files are ranked by relevance to the prompt and to what
+         the active file calls (gemini/symbol_index.py), and fill the
+         budget in that order
+      3. Files over MAX_FILE_TOKENS lose their least relevant function
+         bodies first, rather than their tail
+      4. A relevant file too big for what's left contributes only its
+         matching functions/classes
+      5. Files that don't fit get a "[skipped]" marker listing what they
+         define, so Gemini knows they exist
     """
     if not file_contents:
         return ""
 
     parts = []
-    budget = MAX_CONTEXT_CHARS
+    overflow = []
+    budget = _context_token_budget()
+    if query is None:
+        query = build_query(prompt, active_file, file_contents)
+
+    if baseline is not None:
+        budget = DELTA_CONTEXT_TOKENS
+        unchanged = {path for path, content in file_contents.items() if baseline.get(path) == content}
+        if active_file in unchanged:
+            parts.append(f"--- ACTIVE FILE: {active_file} --- [unchanged from baseline]")
+        file_contents = {p: c for p, c in file_contents.items() if p not in unchanged}
 
     # Active file first — the developer is looking at this
     if active_file and active_file in file_contents:
         header = f"--- ACTIVE FILE: {active_file} ---"
-        content = _truncate(file_contents[active_file], MAX_FILE_CHARS)
+        content = _fit_file(active_file, file_contents[active_file], query)
         block = f"{header}\n{content}"
         parts.append(block)
-        budget -= len(block)
+        budget -= estimate_tokens(block)
 
-    # Remaining files, sorted for consistency across requests
-    for path in sorted(file_contents.keys()):
-        if path == active_file:
+    for path, score in rank_files(file_contents, query, exclude=active_file):
+        if baseline is not None and score < DELTA_MIN_SCORE and path not in baseline:
+            # Delta layout: tests/docs outside the cached baseline only when relevant
+            overflow.append(path)
             continue
-
-        header = f"\n--- {path} ---"
-
-        if budget <= len(header) + 100:
-            parts.append(f"\n--- {path} --- [skipped — context limit reached]")
-            continue
-
-        content = _truncate(file_contents[path], min(MAX_FILE_CHARS, budget - len(header)))
-        block = f"{header}\n{content}"
+        content = file_contents[path]
+        block = f"\n--- {path} ---\n{_fit_file(path, content, query)}"
+        cost = estimate_tokens(block)
+        if cost > budget and score > 0:
+            excerpt = _excerpt(path, content, query, budget)
+            if excerpt:
+                block, cost = excerpt, estimate_tokens(excerpt)
+        if cost > budget:
+            block = _skipped_marker(path, content)
+            cost = estimate_tokens(block)
+            if cost > budget:
+                overflow.append(path)
+                continue
         parts.append(block)
-        budget -= len(block)
+        budget -= cost
+
+    if overflow:
+        parts.append(f"\n[{len(overflow)} more files skipped — context limit reached: {', '.join(overflow)}]")
+    if not parts:
+        return ""
 
     return (
         "=== CODEBASE CONTEXT ===\n"
@@ -226,73 +324,304 @@ def _extract_response(response) -> str:
     return "I wasn't able to generate a response. Could you try rephrasing your question?"
 
 
-# ─── Public async entry point ──────────────────────────────────────────
+# ─── Error messages ───────────────────────────────────────────────────
+
+RATE_LIMITED_MESSAGE = (
+    "The AI assistant is temporarily rate-limited. "
+    "Please wait a moment and try again."
+)
+CONFIG_ERROR_MESSAGE = "The AI assistant is unavailable due to a configuration error."
+TIMEOUT_MESSAGE = (
+    "The AI assistant timed out. "
+    "Try a shorter question or try again in a moment."
+)
+
+
+def _error_message(exc: Exception) -> str:
+    """Map a Gemini API failure to the message shown to the user."""
+    err = str(exc).lower()
+
+    if "quota" in err or "rate" in err or "429" in err or "resource_exhausted" in err:
+        return RATE_LIMITED_MESSAGE
+    if "api key" in err or "api_key" in err or "401" in err or "403" in err:
+        return CONFIG_ERROR_MESSAGE
+    if "not found" in err or "404" in err:
+        return "The AI assistant is temporarily unavailable. Please try again."
+    if "block" in err or "safety" in err or "filter" in err:
+        return (
+            "Your message was flagged by content filters. "
+            "Could you rephrase your question?"
+        )
+
+    return "The AI assistant encountered an error. Please try again."
+
+
+def _build_contents(
+    prompt: str,
+    conversation_history: list[dict],
+    active_file: Optional[str],
+    file_contents: Optional[dict[str, str]],
+    context_block: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> tuple[list[dict], int]:
+    """Sanitized history plus the new user message with codebase context.
+
+    Turns that don't fit HISTORY_TOKENS reach Gemini as the session's
+    rolling summary, ahead of the context. Also returns the estimated
+    input tokens (system prompt included) for calibration.
+    """
+    if context_block is None:
+        context_block = _build_context_block(active_file, file_contents, prompt)
+    summary, recent = fit_history(session_id, conversation_history)
+    if summary:
+        summary = (
+            "=== EARLIER CONVERSATION (summary) ===\n"
+            + summary
+            + "\n=== END EARLIER CONVERSATION ===\n\n"
+        )
+    prompt_with_context = f"{summary}{context_block}{prompt}"
+
+    gemini_history = _sanitize_history(recent)
+    contents = gemini_history + [{"role": "user", "parts": [{"text": prompt_with_context}]}]
+    estimated = estimate_tokens(SYSTEM_PROMPT) + sum(
+        estimate_tokens(part["text"]) for turn in contents for part in turn["parts"]
+    )
+    return contents, estimated
+
+
+def _record_usage(response, estimated: int) -> None:
+    """Calibrate token estimates against what Gemini actually counted."""
+    usage = getattr(response, "usage_metadata", None)
+    actual = getattr(usage, "prompt_token_count", None)
+    if isinstance(actual, int):
+        calibrate(estimated, actual)
+
+
+# ─── Request layout ───────────────────────────────────────────────────
+
+class _Layouts:
+    """
+    request_for callback for the fallback helpers. Per model: the cached
+    prefix + delta layout when that model's prefix cache is available,
+    otherwise the full layout, built the first time a model needs it.
+    Remembers which it used, for token calibration and to drop a cache the
+    API no longer recognises.
+    """
+
+    def __init__(self, client, full: Callable[[], tuple[list[dict], int]],
+                 delta: Optional[tuple[list[dict], int]]):
+        self.client = client
+        self._build_full = full
+        self._full: Optional[tuple[list[dict], int]] = None
+        self.delta = delta
+        self.prefix_cache = get_prefix_cache() if delta is not None else None
+        self.config = _make_config()
+        self.cached_model: Optional[str] = None
+        self.estimated = 0
+
+    @property
+    def full(self) -> tuple[list[dict], int]:
+        if self._full is None:
+            self._full = self._build_full()
+        return self._full
+
+    async def __call__(self, model: str) -> tuple[list[dict], types.GenerateContentConfig]:
+        self.cached_model = None
+        if self.prefix_cache is not None:
+            name = await self.prefix_cache.cached_name(self.client, model)
+            if name:
+                contents, estimated = self.delta
+                self.cached_model = model
+                self.estimated = (estimated - estimate_tokens(SYSTEM_PROMPT)
+                                  + estimate_tokens(self.prefix_cache.prefix))
+                return contents, self.prefix_cache.apply(self.config, name)
+        self.estimated = self.full[1]
+        return self.full[0], self.config
+
+    def drop_cache(self, exc: Exception) -> bool:
+        """After a stale-cache error: forget it and go uncached. True to retry."""
+        if self.cached_model is None or not is_cache_error(exc):
+            return False
+        logger.warning("Context cache for %r rejected — retrying without it", self.cached_model)
+        self.prefix_cache.invalidate(self.cached_model)
+        self.prefix_cache = None
+        return True
+
+
+def _layouts(
+    client,
+    prompt: str,
+    conversation_history: list[dict],
+    active_file: Optional[str],
+    file_contents: Optional[dict[str, str]],
+    context_block: Union[str, Callable[[], str], None],
+    delta_block: Optional[str],
+    session_id: Optional[str],
+) -> _Layouts:
+    def full() -> tuple[list[dict], int]:
+        block = context_block() if callable(context_block) else context_block
+        return _build_contents(prompt, conversation_history, active_file, file_contents,
+                               block, session_id)
+
+    delta = None
+    prefix_cache = get_prefix_cache()
+    if prefix_cache is not None:
+        # Only with the actual files in hand — otherwise the baseline would
+        # pass for the candidate's code
+        if delta_block is None and file_contents is not None:
+            delta_block = _build_context_block(active_file, file_contents, prompt,
+                                               baseline=prefix_cache.baseline)
+        if delta_block is not None:
+            delta = _build_contents(prompt, conversation_history, None, None,
+                                    delta_block, session_id)
+    return _Layouts(client, full, delta)
+
+
+async def _generate(client, layouts: _Layouts):
+    try:
+        return await generate_with_fallback(client, request_for=layouts)
+    except Exception as exc:
+        if not layouts.drop_cache(exc):
+            raise
+        return await generate_with_fallback(client, request_for=layouts)
+
+
+async def _open_stream(client, layouts: _Layouts):
+    try:
+        return await stream_with_fallback(client, request_for=layouts)
+    except Exception as exc:
+        if not layouts.drop_cache(exc):
+            raise
+        return await stream_with_fallback(client, request_for=layouts)
+
+
+async def warm_context_cache() -> None:
+    """Create the primary model's prefix cache ahead of the first prompt."""
+    client = get_client()
+    prefix_cache = get_prefix_cache()
+    if client is not None and prefix_cache is not None:
+        await prefix_cache.cached_name(client, GEMINI_MODEL_CHAIN[0])
+
+
+# ─── Public async entry points ─────────────────────────────────────────
 
 async def call_gemini(
     prompt: str,
     conversation_history: list[dict],
     active_file: Optional[str] = None,
     file_contents: Optional[dict[str, str]] = None,
+    context_block: Union[str, Callable[[], str], None] = None,
+    session_id: Optional[str] = None,
+    delta_block: Optional[str] = None,
 ) -> str:
     """
     Send a prompt to Gemini with codebase context and conversation history.
 
+    context_block, if given, is used as the codebase context instead of
+    building one from active_file/file_contents (e.g. the session file
+    store's block); a callable is only called if a model goes uncached.
+    delta_block likewise for the edited-files-only context used with the
+    cached prefix. session_id keys the rolling
+    history summary.
+
     Uses native async (client.aio) — no thread executor needed.
     Returns the AI response text. On ANY failure, returns a user-friendly
     error message (never raises).
     """
-    client = _get_client()
+    client = get_client()
     if client is None:
         logger.error("GEMINI_API_KEY is not set")
-        return "The AI assistant is unavailable due to a configuration error."
+        return CONFIG_ERROR_MESSAGE
 
-    context_block = _build_context_block(active_file, file_contents)
-    prompt_with_context = f"{context_block}{prompt}" if context_block else prompt
-
-    # Build full contents: sanitized history + new user message
-    gemini_history = _sanitize_history(conversation_history)
-    contents = gemini_history + [{"role": "user", "parts": [{"text": prompt_with_context}]}]
+    layouts = _layouts(client, prompt, conversation_history, active_file, file_contents,
+                       context_block, delta_block, session_id)
 
     try:
-        response = await asyncio.wait_for(
-            generate_with_fallback(
-                client,
-                contents=contents,
-                config=_make_config(),
-            ),
-            timeout=GEMINI_TIMEOUT_S,
-        )
+        response = await asyncio.wait_for(_generate(client, layouts), timeout=GEMINI_TIMEOUT_S)
         if response is None:
-            return (
-                "The AI assistant is temporarily rate-limited. "
-                "Please wait a moment and try again."
-            )
+            return RATE_LIMITED_MESSAGE
+        _record_usage(response, layouts.estimated)
         return _extract_response(response)
 
     except asyncio.TimeoutError:
         logger.warning("Gemini API call timed out after %ds", GEMINI_TIMEOUT_S)
-        return (
-            "The AI assistant timed out. "
-            "Try a shorter question or try again in a moment."
-        )
+        return TIMEOUT_MESSAGE
 
     except Exception as exc:
         logger.exception("Gemini API call failed")
-        err = str(exc).lower()
+        return _error_message(exc)
+
+
+def _chunk_text(chunk) -> str:
+    """Text of one streamed chunk ("" for blocked or empty chunks)."""
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
 
-        if "quota" in err or "rate" in err or "429" in err or "resource_exhausted" in err:
-            return (
-                "The AI assistant is temporarily rate-limited. "
-                "Please wait a moment and try again."
-            )
-        if "api key" in err or "api_key" in err or "401" in err or "403" in err:
-            return "The AI assistant is unavailable due to a configuration error."
-        if "not found" in err or "404" in err:
-            return "The AI assistant is temporarily unavailable. Please try again."
-        if "block" in err or "safety" in err or "filter" in err:
-            return (
-                "Your message was flagged by content filters. "
-                "Could you rephrase your question?"
-            )
 
-        return "The AI assistant encountered an error. Please try again."
+async def stream_gemini(
+    prompt: str,
+    conversation_history: list[dict],
+    active_file: Optional[str] = None,
+    file_contents: Optional[dict[str, str]] = None,
+    context_block: Union[str, Callable[[], str], None] = None,
+    session_id: Optional[str] = None,
+    delta_block: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of call_gemini: yields response text as it arrives.
+
+    Same context, fallback chain and error messages as call_gemini, and
+    likewise never raises — a failure before any text yields the
+    user-friendly message instead; one mid-stream appends it. The whole
+    stream shares call_gemini's GEMINI_TIMEOUT_S budget.
+    """
+    client = get_client()
+    if client is None:
+        logger.error("GEMINI_API_KEY is not set")
+        yield CONFIG_ERROR_MESSAGE
+        return
+
+    layouts = _layouts(client, prompt, conversation_history, active_file, file_contents,
+                       context_block, delta_block, session_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GEMINI_TIMEOUT_S
+    produced = False
+    last_chunk = None
+
+    try:
+        stream = await asyncio.wait_for(_open_stream(client, layouts), timeout=GEMINI_TIMEOUT_S)
+        if stream is None:
+            yield RATE_LIMITED_MESSAGE
+            return
+
+        async with aclosing(stream):
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(stream), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                last_chunk = chunk
+                text = _chunk_text(chunk)
+                if not produced:
+                    # Match call_gemini, which strips the full response
+                    text = text.lstrip()
+                if text:
+                    produced = True
+                    yield text
+
+        if last_chunk is not None:
+            # Usage metadata rides on the final chunk
+            _record_usage(last_chunk, layouts.estimated)
+        if not produced:
+            # Blocked or empty — reuse call_gemini's explanations
+            yield _extract_response(last_chunk)
+
+    except asyncio.TimeoutError:
+        logger.warning("Gemini stream timed out after %ds", GEMINI_TIMEOUT_S)
+        yield ("\n\n" if produced else "") + TIMEOUT_MESSAGE
+
+    except Exception as exc:
+        logger.exception("Gemini streaming call failed")
+        yield ("\n\n" if produced else "") + _error_message(exc)
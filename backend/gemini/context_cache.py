@@ -0,0 +1,195 @@
+"""
+Provider-side caching of the stable prompt prefix.
+
+Every prompt used to re-send SYSTEM_PROMPT plus a codebase block that is
+almost entirely unchanged RQ source. With a prefix cache, requests are
+laid out as
+
+    cached prefix   system prompt + the baseline RQ sources — identical for
+                    every session, registered once per model
+    per call        rolling summary, history, the files that differ from
+                    the baseline, and the prompt
+
+The prefix is stored as a Gemini cached content object with a TTL of
+SPONGE_CONTEXT_CACHE_TTL seconds, extended shortly before it lapses. If
+caching is unavailable for a model the call uses the uncached layout
+(system_instruction + full ranked context) instead.
+
+SPONGE_CONTEXT_CACHE selects the backend:
+  gemini  (default) client.aio.caches
+  local   in-process stand-in with the same layout and bookkeeping; the
+          prefix travels as system_instruction. For offline tests and dev.
+  off     no prefix caching
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from google.genai import types
+
+from .system_prompt import SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_MODE = os.environ.get("SPONGE_CONTEXT_CACHE", "gemini")
+CONTEXT_CACHE_TTL_S = int(os.environ.get("SPONGE_CONTEXT_CACHE_TTL", "3600"))
+CONTEXT_CACHE_REFRESH_S = 300   # extend the TTL once less than this is left
+CONTEXT_CACHE_RETRY_S = 300     # after a failed create, use the uncached layout this long
+
+BASELINE_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rq-v1.0",
+)
+BASELINE_DIRS = ("rq",)         # cached: the library itself, not tests/docs
+
+
+def load_baseline(root: str = BASELINE_ROOT) -> dict[str, str]:
+    """Pristine sources keyed by the same relative paths the editor uses."""
+    baseline = {}
+    for top in BASELINE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, top)):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    path = os.path.join(dirpath, filename)
+                    with open(path, encoding="utf-8") as f:
+                        baseline[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return baseline
+
+
+def _prefix_text(baseline: dict[str, str]) -> str:
+    files = "\n".join(f"--- {path} ---\n{content}" for path, content in baseline.items())
+    return (
+        f"{SYSTEM_PROMPT}\n\n"
+        "=== BASELINE CODEBASE (RQ v1.0 as given to the candidate) ===\n"
+        "Each message shows the candidate's edited files; any file not shown "
+        "there is unchanged from this baseline.\n"
+        f"{files}\n"
+        "=== END BASELINE CODEBASE ===\n"
+    )
+
+
+# ─── Backends ─────────────────────────────────────────────────────────
+
+class GeminiCacheBackend:
+    """Cached content objects via client.aio.caches."""
+
+    async def create(self, client, model: str, prefix: str, ttl_s: int) -> str:
+        cache = await client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=prefix,
+                ttl=f"{ttl_s}s",
+                display_name="sponge-rq-baseline",
+            ),
+        )
+        return cache.name
+
+    async def extend(self, client, name: str, ttl_s: int) -> None:
+        await client.aio.caches.update(
+            name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_s}s"),
+        )
+
+    def apply(self, config: types.GenerateContentConfig, name: str, prefix: str):
+        # The system prompt lives in the cache; the API rejects both at once
+        return config.model_copy(update={"cached_content": name, "system_instruction": None})
+
+
+class LocalCacheBackend:
+    """Offline stand-in: records what would be cached, sends the prefix inline."""
+
+    def __init__(self):
+        self.created: list[tuple[str, str]] = []    # (model, name)
+        self.extended: list[str] = []
+
+    async def create(self, client, model: str, prefix: str, ttl_s: int) -> str:
+        name = f"local/{model}/{len(self.created)}"
+        self.created.append((model, name))
+        return name
+
+    async def extend(self, client, name: str, ttl_s: int) -> None:
+        self.extended.append(name)
+
+    def apply(self, config: types.GenerateContentConfig, name: str, prefix: str):
+        return config.model_copy(update={"system_instruction": prefix})
+
+
+# ─── Prefix cache ─────────────────────────────────────────────────────
+
+class PrefixCache:
+    """One cached prefix per model, shared by all sessions."""
+
+    def __init__(self, backend, baseline: dict[str, str]):
+        self.backend = backend
+        self.baseline = baseline
+        self.prefix = _prefix_text(baseline)
+        self._entries: dict[str, tuple[str, float]] = {}   # model → (name, expires)
+        self._failed_until: dict[str, float] = {}
+
+    async def cached_name(self, client, model: str) -> Optional[str]:
+        """The cache for model, created or extended as needed; None to go uncached."""
+        now = time.monotonic()
+        name, expires = self._entries.get(model, (None, 0.0))
+        if name and expires - now > CONTEXT_CACHE_REFRESH_S:
+            return name
+        if self._failed_until.get(model, 0.0) > now:
+            return None
+
+        if name and expires > now:
+            try:
+                await self.backend.extend(client, name, CONTEXT_CACHE_TTL_S)
+                self._entries[model] = (name, now + CONTEXT_CACHE_TTL_S)
+                return name
+            except Exception:
+                logger.warning("Could not extend context cache %s — recreating", name)
+
+        # Concurrent first calls may each create one; the last one wins and
+        # the others simply expire.
+        try:
+            name = await self.backend.create(client, model, self.prefix, CONTEXT_CACHE_TTL_S)
+        except Exception:
+            logger.warning("Context cache unavailable for %r — sending full context", model,
+                           exc_info=True)
+            self._entries.pop(model, None)
+            self._failed_until[model] = now + CONTEXT_CACHE_RETRY_S
+            return None
+        self._entries[model] = (name, now + CONTEXT_CACHE_TTL_S)
+        logger.info("Created context cache %s for %r", name, model)
+        return name
+
+    def invalidate(self, model: str) -> None:
+        """Forget a cache the API no longer recognises (deleted or expired early)."""
+        self._entries.pop(model, None)
+
+    def apply(self, config: types.GenerateContentConfig, name: str) -> types.GenerateContentConfig:
+        return self.backend.apply(config, name, self.prefix)
+
+
+def is_cache_error(exc: Exception) -> bool:
+    err = str(exc).lower()
+    return "cachedcontent" in err or "cached_content" in err or "cached content" in err
+
+
+_prefix_cache: Optional[PrefixCache] = None
+_prefix_cache_loaded = False
+
+
+def get_prefix_cache() -> Optional[PrefixCache]:
+    """Lazily build the process-wide prefix cache (None when disabled)."""
+    global _prefix_cache, _prefix_cache_loaded
+    if _prefix_cache_loaded:
+        return _prefix_cache
+    _prefix_cache_loaded = True
+    if CONTEXT_CACHE_MODE == "off":
+        return None
+    try:
+        baseline = load_baseline()
+    except OSError:
+        logger.exception("Could not load the RQ baseline — context caching disabled")
+        return None
+    if not baseline:
+        return None
+    backend = LocalCacheBackend() if CONTEXT_CACHE_MODE == "local" else GeminiCacheBackend()
+    _prefix_cache = PrefixCache(backend, baseline)
+    return _prefix_cache
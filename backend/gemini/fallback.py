@@ -2,20 +2,104 @@
 Shared Gemini fallback helper.
 
 generate_with_fallback() tries each model in GEMINI_MODEL_CHAIN in order.
-On 429 RESOURCE_EXHAUSTED it logs a warning and moves to the next model.
-All other exceptions propagate normally.
+On 429 RESOURCE_EXHAUSTED it logs a warning, puts the model on cooldown
+and moves to the next model. All other exceptions propagate normally.
 Returns None only if every model in the chain is exhausted.
+
+Every attempt goes through the shared GeminiService (gemini/service.py):
+models still cooling down from an earlier 429 are skipped without a
+round trip, each attempt spends a token from the model's bucket and
+holds a global concurrency slot, and — when hedging is on — a slow call
+is raced against the next available model.
+
+stream_with_fallback() does the same for streamed generation (without
+hedging). A model only counts as answering once its first chunk arrives,
+since a 429 can surface either when the stream opens or on that first
+read; the concurrency slot is held until then.
+
+Both take either fixed contents/config or request_for, an async callable
+returning (contents, config) per model — used when the request layout
+depends on the model (e.g. its cached context prefix).
 """
 
+import asyncio
 import logging
-from typing import Optional, Any
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
 from gemini.config import GEMINI_MODEL_CHAIN
+from gemini.service import GeminiService, get_service, retry_delay
 
 logger = logging.getLogger(__name__)
 
+RequestFor = Callable[[str], Awaitable[tuple[list, Any]]]
+
+_EXHAUSTED = object()   # attempt skipped or rate-limited; try the next model
+
+
+async def _request(model: str, contents, config, request_for: Optional[RequestFor]):
+    if request_for is None:
+        return contents, config
+    return await request_for(model)
+
+
+def _exhausted(service: GeminiService, model: str, e: Exception) -> None:
+    logger.warning(f"Model {model!r} quota exhausted — trying next in chain")
+    service.cooldown(model, retry_delay(e))
+
+
+async def _attempt(service: GeminiService, client, model: str, contents, config,
+                   request_for: Optional[RequestFor]):
+    """One generate_content call on model, or _EXHAUSTED."""
+    if service.cooling_down(model) or not await service.take_token(model):
+        return _EXHAUSTED
+    model_contents, model_config = await _request(model, contents, config, request_for)
+    async with service.slot():
+        started = time.monotonic()
+        try:
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=model_contents,
+                config=model_config,
+            )
+        except Exception as e:
+            if _is_quota_error(e):
+                _exhausted(service, model, e)
+                return _EXHAUSTED
+            # Non-quota errors propagate so callers can handle/log them
+            raise
+        service.record_latency(model, time.monotonic() - started)
+        return response
+
+
+async def _hedged(primary_call, backup_call, delay: float):
+    """Run primary_call; if it hasn't answered after delay, race backup_call too.
+
+    Returns (result, backup_started). The first non-exhausted result wins
+    and the other call is cancelled.
+    """
+    primary = asyncio.ensure_future(primary_call)
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        backup_call.close()
+        return primary.result(), False
+
+    pending = {primary, asyncio.ensure_future(backup_call)}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result is not _EXHAUSTED:
+                    return result, True
+        return _EXHAUSTED, True
+    finally:
+        for task in pending:
+            task.cancel()
+
 
-async def generate_with_fallback(client, *, contents, config) -> Optional[Any]:
+async def generate_with_fallback(client, *, contents=None, config=None,
+                                 request_for: Optional[RequestFor] = None) -> Optional[Any]:
     """
     Try each model in GEMINI_MODEL_CHAIN in priority order.
 
@@ -23,30 +107,84 @@ async def generate_with_fallback(client, *, contents, config) -> Optional[Any]:
         client: google.genai.Client instance
         contents: list of content dicts for generate_content
         config: types.GenerateContentConfig instance
+        request_for: per-model (contents, config) instead of the two above
 
     Returns:
         The first successful GenerateContentResponse, or None if all
         models in the chain are rate-limited.
     """
-    for model in GEMINI_MODEL_CHAIN:
-        try:
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config,
+    service = get_service()
+    models = service.available(GEMINI_MODEL_CHAIN)
+    index = 0
+    while index < len(models):
+        model = models[index]
+        index += 1
+        call = _attempt(service, client, model, contents, config, request_for)
+
+        delay = service.hedge_delay(model)
+        backup = next((m for m in models[index:] if not service.cooling_down(m)), None)
+        if delay is None or backup is None:
+            response = await call
+        else:
+            response, hedged = await _hedged(
+                call, _attempt(service, client, backup, contents, config, request_for), delay,
             )
+            if hedged:
+                logger.info("Hedged %r with %r after %.1fs", model, backup, delay)
+                index = models.index(backup) + 1
+
+        if response is not _EXHAUSTED:
             return response
-        except Exception as e:
-            err_str = str(e)
-            if "429" in err_str or "RESOURCE_EXHAUSTED" in err_str:
-                logger.warning(
-                    f"Model {model!r} quota exhausted — trying next in chain"
+
+    logger.error(
+        "All models in fallback chain exhausted: %s", GEMINI_MODEL_CHAIN
+    )
+    return None
+
+
+def _is_quota_error(e: Exception) -> bool:
+    err_str = str(e)
+    return "429" in err_str or "RESOURCE_EXHAUSTED" in err_str
+
+
+async def stream_with_fallback(client, *, contents=None, config=None,
+                               request_for: Optional[RequestFor] = None) -> Optional[AsyncIterator[Any]]:
+    """
+    Streaming counterpart of generate_with_fallback.
+
+    Returns an async iterator over the first model's response chunks that
+    starts without a quota error, or None if all models in the chain are
+    rate-limited. Errors after the first chunk propagate to the consumer.
+    """
+    service = get_service()
+    for model in service.available(GEMINI_MODEL_CHAIN):
+        if service.cooling_down(model) or not await service.take_token(model):
+            continue
+        model_contents, model_config = await _request(model, contents, config, request_for)
+        async with service.slot():
+            try:
+                stream = await client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=model_contents,
+                    config=model_config,
                 )
-                continue
-            # Non-quota errors propagate so callers can handle/log them
-            raise
+                first = await anext(stream, None)
+            except Exception as e:
+                if _is_quota_error(e):
+                    _exhausted(service, model, e)
+                    continue
+                raise
+        return _chain_first(first, stream)
 
     logger.error(
         "All models in fallback chain exhausted: %s", GEMINI_MODEL_CHAIN
     )
     return None
+
+
+async def _chain_first(first, stream) -> AsyncIterator[Any]:
+    if first is None:
+        return
+    yield first
+    async for chunk in stream:
+        yield chunk
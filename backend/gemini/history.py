@@ -0,0 +1,117 @@
+"""
+Token-budgeted conversation history with a rolling summary.
+
+The most recent turns are sent verbatim, as many as fit in HISTORY_TOKENS.
+Older turns are folded into a short summary instead of being dropped.
+Folding happens FOLD_STEP turns at a time and each turn is summarised
+exactly once: the per-session summary is cached and extended, never
+rebuilt, so the cost of a call stays flat however long the session runs.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from gemini.tokens import estimate_tokens
+
+HISTORY_TOKENS = 10_000       # summary + verbatim turns
+SUMMARY_TOKENS = 1_500        # cap on the summary itself (oldest lines go first)
+MAX_HISTORY_TURNS = 40        # never send more verbatim turns than this
+FOLD_STEP = 8                 # turns folded at a time, so the summary changes rarely
+SUMMARY_LINE_CHARS = 240      # per summarised turn
+MAX_CACHED_SUMMARIES = 1024   # sessions
+
+_CODE_BLOCK_RE = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+
+
+def _summarize_turn(turn: dict) -> Optional[str]:
+    content = (turn.get("content") or "").strip()
+    if not content:
+        return None
+    text = " ".join(_CODE_BLOCK_RE.sub(" [code] ", content).split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS].rstrip() + "…"
+    who = "User" if turn.get("role") == "user" else "Assistant"
+    return f"- {who}: {text}"
+
+
+def _turn_key(turn: dict) -> tuple:
+    return turn.get("role"), hash(turn.get("content") or "")
+
+
+class _RollingSummary:
+    __slots__ = ("folded", "last_key", "lines", "omitted", "text")
+
+    def __init__(self):
+        self.folded = 0            # history[:folded] is summarised
+        self.last_key = None       # _turn_key of history[folded - 1]
+        self.lines: list[str] = [] # newest lines, within SUMMARY_TOKENS
+        self.omitted = 0           # older lines dropped to stay within it
+        self.text = ""
+
+    def matches(self, history: list[dict], split: int) -> bool:
+        if self.folded == 0:
+            return True
+        return self.folded <= split and _turn_key(history[self.folded - 1]) == self.last_key
+
+    def fold(self, history: list[dict], split: int) -> None:
+        """Extend the summary to cover history[:split]."""
+        if split == self.folded:
+            return
+        for turn in history[self.folded:split]:
+            line = _summarize_turn(turn)
+            if line:
+                self.lines.append(line)
+        total = sum(estimate_tokens(line) for line in self.lines)
+        while total > SUMMARY_TOKENS and self.lines:
+            total -= estimate_tokens(self.lines.pop(0))
+            self.omitted += 1
+        self.folded = split
+        self.last_key = _turn_key(history[split - 1])
+        header = f"({split} earlier turns"
+        header += f"; the oldest {self.omitted} not shown)" if self.omitted else ")"
+        self.text = header + "\n" + "\n".join(self.lines)
+
+
+_summaries: "OrderedDict[str, _RollingSummary]" = OrderedDict()
+_summaries_lock = threading.Lock()
+
+
+def _summary_for(session_id: Optional[str], history: list[dict], split: int) -> _RollingSummary:
+    with _summaries_lock:
+        summary = _summaries.get(session_id) if session_id else None
+        if summary is None or not summary.matches(history, split):
+            summary = _RollingSummary()   # new session, or history was rewritten
+        if session_id:
+            _summaries[session_id] = summary
+            _summaries.move_to_end(session_id)
+            while len(_summaries) > MAX_CACHED_SUMMARIES:
+                _summaries.popitem(last=False)
+    summary.fold(history, split)
+    return summary
+
+
+def fit_history(session_id: Optional[str], history: list[dict]) -> tuple[str, list[dict]]:
+    """Split history into (summary of older turns, recent turns to send verbatim).
+
+    The summary is "" while everything fits.
+    """
+    budget = HISTORY_TOKENS - SUMMARY_TOKENS
+    split = len(history)
+    while split > 0 and len(history) - split < MAX_HISTORY_TURNS:
+        cost = estimate_tokens(history[split - 1].get("content") or "")
+        if cost > budget:
+            break
+        budget -= cost
+        split -= 1
+    if split == 0:
+        return "", history
+
+    # Fold in whole steps, and start the verbatim part on a user turn
+    stepped = -(-split // FOLD_STEP) * FOLD_STEP
+    if stepped < len(history):
+        split = stepped
+    while split < len(history) and history[split].get("role") != "user":
+        split += 1
+    return _summary_for(session_id, history, split).text, history[split:]
@@ -0,0 +1,200 @@
+"""
+Shared Gemini client service.
+
+One genai.Client for the whole process (the AIDE client and the three
+scoring evaluators used to keep their own), plus admission control that
+every call goes through via gemini/fallback.py:
+
+  - a global concurrency limit      SPONGE_GEMINI_CONCURRENCY (default 16)
+  - a token bucket per model        SPONGE_GEMINI_RPM, e.g.
+                                    "gemini-2.5-pro=5,gemini-2.5-flash=10"
+                                    or one number for every model (unset: no limit)
+  - a 429 cooldown per model        an exhausted model is skipped until its
+                                    reset time (the API's retry delay when it
+                                    gives one, else QUOTA_COOLDOWN_S), so a
+                                    call no longer pays a failed round trip
+                                    per exhausted model
+  - optional hedging                SPONGE_GEMINI_HEDGE=1: if a model hasn't
+                                    answered within its HEDGE_PERCENTILE
+                                    latency, the request also goes to the next
+                                    available model and the first answer wins
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from google import genai
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CONCURRENCY = int(os.environ.get("SPONGE_GEMINI_CONCURRENCY", "16"))
+GEMINI_RPM = os.environ.get("SPONGE_GEMINI_RPM", "")
+GEMINI_HEDGE = os.environ.get("SPONGE_GEMINI_HEDGE", "0") == "1"
+
+QUOTA_COOLDOWN_S = 60         # when a 429 doesn't say how long to wait
+MAX_COOLDOWN_S = 3600
+MAX_BUCKET_WAIT_S = 2.0       # wait this long for a model's token, else try the next
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_S = 1.0
+LATENCY_WINDOW = 200
+
+_RETRY_DELAY_RE = re.compile(
+    r"retry(?:delay)?\W{0,4}(?:in\s+)?(\d+(?:\.\d+)?)\s*s", re.IGNORECASE,
+)
+
+
+# ─── Lazy client initialization ────────────────────────────────────────
+
+_client: Optional[genai.Client] = None
+_configured_key: Optional[str] = None
+
+
+def get_client() -> Optional[genai.Client]:
+    """
+    Lazily initialize and cache the shared Gemini Client.
+    Recreates the client only if the API key changes.
+    Returns None if GEMINI_API_KEY is not set.
+    """
+    global _client, _configured_key
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+
+    if api_key != _configured_key:
+        _client = genai.Client(api_key=api_key)
+        _configured_key = api_key
+
+    return _client
+
+
+# ─── Per-model state ──────────────────────────────────────────────────
+
+def _parse_rpm(spec: str) -> dict[str, float]:
+    """'model=rpm,...' → {model: rpm}; a bare number applies to every model ('*')."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rpm = item.rpartition("=")
+        try:
+            limits[model or "*"] = float(rpm)
+        except ValueError:
+            logger.warning("Ignoring bad SPONGE_GEMINI_RPM entry %r", item)
+    return limits
+
+
+def retry_delay(exc: Exception) -> float:
+    """Seconds until a rate-limited model resets, from the 429 when it says."""
+    match = _RETRY_DELAY_RE.search(str(exc))
+    if match:
+        return min(MAX_COOLDOWN_S, max(1.0, float(match.group(1))))
+    return QUOTA_COOLDOWN_S
+
+
+class _ModelState:
+    __slots__ = ("rpm", "tokens", "refilled", "cooldown_until", "latencies")
+
+    def __init__(self, rpm: Optional[float]):
+        self.rpm = rpm                          # None: no bucket
+        self.tokens = rpm or 0.0                # bucket holds one minute's worth
+        self.refilled = time.monotonic()
+        self.cooldown_until = 0.0
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def refill(self, now: float) -> None:
+        if self.rpm:
+            self.tokens = min(self.rpm, self.tokens + (now - self.refilled) * self.rpm / 60)
+        self.refilled = now
+
+
+class GeminiService:
+    """Admission control shared by every Gemini call in the process."""
+
+    def __init__(self, concurrency: int = GEMINI_CONCURRENCY,
+                 rpm: Optional[dict[str, float]] = None, hedge: bool = GEMINI_HEDGE):
+        self.concurrency = max(1, concurrency)
+        self.hedge = hedge
+        self._rpm = _parse_rpm(GEMINI_RPM) if rpm is None else rpm
+        self._models: dict[str, _ModelState] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(self._rpm.get(model, self._rpm.get("*")))
+        return state
+
+    # ── cooldowns ──
+
+    def cooling_down(self, model: str) -> bool:
+        return self._state(model).cooldown_until > time.monotonic()
+
+    def cooldown(self, model: str, seconds: float) -> None:
+        state = self._state(model)
+        state.cooldown_until = max(state.cooldown_until, time.monotonic() + seconds)
+        logger.warning("Model %r rate-limited — skipping it for %.0fs", model, seconds)
+
+    def available(self, models: list[str]) -> list[str]:
+        """Models not currently cooling down, in priority order."""
+        return [m for m in models if not self.cooling_down(m)]
+
+    # ── token buckets ──
+
+    async def take_token(self, model: str) -> bool:
+        """Spend one request from model's bucket, waiting up to MAX_BUCKET_WAIT_S."""
+        state = self._state(model)
+        if not state.rpm:
+            return True
+        state.refill(time.monotonic())
+        wait = max(0.0, (1 - state.tokens) * 60 / state.rpm)
+        if wait > MAX_BUCKET_WAIT_S:
+            return False
+        state.tokens -= 1   # reserve now, so concurrent callers queue behind
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+    # ── concurrency ──
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the process-wide concurrent request slots."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            # Semaphores bind to one event loop (tests run several)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        async with self._semaphore:
+            yield
+
+    # ── latency ──
+
+    def record_latency(self, model: str, seconds: float) -> None:
+        self._state(model).latencies.append(seconds)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """How long to wait for model before hedging; None if not hedging."""
+        if not self.hedge:
+            return None
+        latencies = self._state(model).latencies
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return max(HEDGE_MIN_DELAY_S, ordered[int(HEDGE_PERCENTILE * (len(ordered) - 1))])
+
+
+_service: Optional[GeminiService] = None
+
+
+def get_service() -> GeminiService:
+    global _service
+    if _service is None:
+        _service = GeminiService()
+    return _service
@@ -0,0 +1,276 @@
+"""
+Symbol index used to rank codebase context for Gemini.
+
+Each Python file is parsed once per distinct content (cached by hash) into
+its classes, functions and methods — line spans plus the names each one
+references. rank_files() scores files, and rank_symbols() the definitions
+inside a file, by how well they match the prompt's identifiers and words,
+the files it mentions, and what the active file calls. The RQ sources are
+indexed at startup (warm_index), so a session only re-parses files the
+candidate has actually edited.
+"""
+
+import ast
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# ─── Limits / weights ─────────────────────────────────────────────────
+
+INDEX_CACHE_SIZE = 512      # parsed file versions kept in memory
+
+EXACT_NAME_SCORE = 4        # prompt mentions the definition by name
+NAME_PART_SCORE = 1         # per shared word (enqueue_in ↔ "enqueue")
+CALLED_SCORE = 1            # active file references the definition
+PATH_SCORE = 8              # prompt mentions the file ("worker.py")
+STEM_SCORE = 4              # prompt mentions the module ("the worker")
+TOP_SYMBOLS = 3             # file score sums its best N definitions
+MAX_CALLED_BONUS = 5        # cap on active-file reference bonus per file
+COMMON_PART_SHARE = 0.05    # words in more definitions than this ("job") don't count
+
+_STOPWORDS = frozenset("""
+    the and for are but not you your with this that these those from into
+    what when where which while who why how does did doing done can could
+    should would will have has had was were been being there here about
+    than then them they its it's just also only some any all each every
+    use using used make made need want like get got let lets please thanks
+    code file files function functions method methods class classes line
+    lines work works working implement implemented add added way help
+""".split())
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PATH_RE = re.compile(r"[\w./-]+\.py\b")
+_WORD_PART_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+# ─── Parsed file ──────────────────────────────────────────────────────
+
+class Symbol:
+    __slots__ = ("name", "qualname", "kind", "start", "end", "parts", "refs")
+
+    def __init__(self, name: str, qualname: str, kind: str, start: int, end: int,
+                 refs: frozenset[str]):
+        self.name = name
+        self.qualname = qualname      # "Queue.enqueue_call"
+        self.kind = kind              # "class" | "function" | "method"
+        self.start = start            # 1-based, decorators included
+        self.end = end                # 1-based, inclusive
+        self.parts = name_parts(name)
+        self.refs = refs              # names used in the body
+
+
+class FileSymbols:
+    __slots__ = ("symbols", "defined", "refs")
+
+    def __init__(self, symbols: list[Symbol], refs: frozenset[str]):
+        self.symbols = symbols
+        self.defined = frozenset(s.name for s in symbols)
+        self.refs = refs
+
+
+_EMPTY = FileSymbols([], frozenset())
+
+
+def name_parts(name: str) -> frozenset[str]:
+    """Lower-case words of an identifier: ScheduledJobRegistry → scheduled, job, registry."""
+    parts = set()
+    for chunk in name.split("_"):
+        for part in _WORD_PART_RE.findall(chunk):
+            part = part.lower()
+            if len(part) >= 3 and part not in _STOPWORDS:
+                parts.add(part)
+    return frozenset(parts)
+
+
+def _referenced_names(node: ast.AST) -> frozenset[str]:
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr)
+    return frozenset(names)
+
+
+def _parse(source: str) -> FileSymbols:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        # Mid-edit code — the file can still be ranked by its path
+        return _EMPTY
+
+    symbols = []
+
+    def visit(body, prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if in_class else "function"
+            else:
+                continue
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+            qualname = prefix + node.name
+            symbols.append(Symbol(node.name, qualname, kind, start, node.end_lineno,
+                                  _referenced_names(node)))
+            if kind == "class":
+                visit(node.body, qualname + ".", True)
+
+    visit(tree.body, "", False)
+    return FileSymbols(symbols, _referenced_names(tree))
+
+
+# ─── Cache ────────────────────────────────────────────────────────────
+
+_cache: "OrderedDict[str, FileSymbols]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def file_symbols(path: str, content: str) -> FileSymbols:
+    """Symbols of one file version, parsed at most once per content."""
+    if not path.endswith(".py"):
+        return _EMPTY
+    key = hashlib.sha1(content.encode("utf-8", "surrogatepass")).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    parsed = _parse(content)
+    with _cache_lock:
+        _cache[key] = parsed
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def warm_index(root: str) -> int:
+    """Index every .py file under root (the pristine RQ sources). Returns the count."""
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+        for filename in filenames:
+            if not filename.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(dirpath, filename), encoding="utf-8") as f:
+                    file_symbols(filename, f.read())
+                count += 1
+            except (OSError, UnicodeDecodeError):
+                logger.warning("Could not index %s", os.path.join(dirpath, filename))
+    return count
+
+
+# ─── Ranking ──────────────────────────────────────────────────────────
+
+class Query:
+    """What a prompt (plus the active file) asks about."""
+
+    __slots__ = ("idents", "words", "parts", "paths", "called")
+
+    def __init__(self, prompt: Optional[str], called: frozenset[str] = frozenset(),
+                 common: frozenset[str] = frozenset()):
+        text = prompt or ""
+        self.idents = frozenset(i.lower() for i in _IDENT_RE.findall(text))
+        words = set()
+        for ident in _IDENT_RE.findall(text):
+            for part in name_parts(ident):
+                words.add(part)
+                if part.endswith("s") and not part.endswith("ss") and len(part) > 3:
+                    words.add(part[:-1])   # "jobs" → "job"
+        self.words = frozenset(words)        # everything the prompt mentions
+        self.parts = self.words - common     # the words that discriminate
+        self.paths = frozenset(p.lower().lstrip("./") for p in _PATH_RE.findall(text))
+        self.called = called                 # names the active file references
+
+    def is_blank(self) -> bool:
+        """True when the prompt names nothing, so only the active file ranks."""
+        return not (self.idents or self.words or self.paths)
+
+
+def _common_parts(indexed: list[FileSymbols]) -> frozenset[str]:
+    counts: dict[str, int] = {}
+    total = 0
+    for symbols in indexed:
+        for symbol in symbols.symbols:
+            total += 1
+            for part in symbol.parts:
+                counts[part] = counts.get(part, 0) + 1
+    limit = max(1, int(total * COMMON_PART_SHARE))
+    return frozenset(part for part, n in counts.items() if n > limit)
+
+
+def query_basis(active_file: Optional[str],
+                file_contents: dict[str, str]) -> tuple[frozenset[str], frozenset[str]]:
+    """The prompt-independent part of a Query: (called, common)."""
+    indexed = [file_symbols(path, content) for path, content in file_contents.items()]
+    called = frozenset()
+    if active_file and active_file in file_contents:
+        called = file_symbols(active_file, file_contents[active_file]).refs
+    return called, _common_parts(indexed)
+
+
+def build_query(prompt: Optional[str], active_file: Optional[str],
+                file_contents: dict[str, str]) -> Query:
+    return Query(prompt, *query_basis(active_file, file_contents))
+
+
+def _prompt_score(symbol: Symbol, query: Query) -> int:
+    score = NAME_PART_SCORE * len(symbol.parts & query.parts)
+    if symbol.name.lower() in query.idents:
+        score += EXACT_NAME_SCORE
+    return score
+
+
+def symbol_score(symbol: Symbol, query: Query) -> int:
+    score = _prompt_score(symbol, query)
+    if symbol.name in query.called:
+        score += CALLED_SCORE
+    return score
+
+
+def file_score(path: str, symbols: FileSymbols, query: Query) -> int:
+    lowered = path.lower()
+    score = 0
+    if any(lowered == p or lowered.endswith("/" + p) for p in query.paths):
+        score += PATH_SCORE
+    stem = os.path.splitext(os.path.basename(lowered))[0]
+    if stem in query.words or stem in query.idents:
+        score += STEM_SCORE
+    best = sorted((symbol_score(s, query) for s in symbols.symbols), reverse=True)
+    score += sum(best[:TOP_SYMBOLS])
+    score += min(MAX_CALLED_BONUS, len(symbols.defined & query.called) // 2)
+    return score
+
+
+def rank_files(file_contents: dict[str, str], query: Query,
+               exclude: Optional[str] = None) -> list[tuple[str, int]]:
+    """(path, score) for every file but `exclude`, most relevant first, ties by path."""
+    ranked = [
+        (path, file_score(path, file_symbols(path, content), query))
+        for path, content in file_contents.items()
+        if path != exclude
+    ]
+    ranked.sort(key=lambda item: (-item[1], item[0]))
+    return ranked
+
+
+def rank_symbols(path: str, content: str, query: Query) -> list[tuple[Symbol, int]]:
+    """Definitions of one file the prompt asks about, most relevant first.
+
+    Being called from the active file only breaks ties — a common name like
+    `pop` or `empty` alone doesn't make a definition worth excerpting.
+    """
+    scored = [
+        (s, symbol_score(s, query))
+        for s in file_symbols(path, content).symbols
+        if _prompt_score(s, query) > 0
+    ]
+    scored.sort(key=lambda item: (-item[1], item[0].start))
+    return scored
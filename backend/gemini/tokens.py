@@ -0,0 +1,85 @@
+"""
+Token estimation for prompt budgeting.
+
+Gemini's tokenizer isn't available offline, so estimate_tokens() counts
+the pieces a SentencePiece-style tokenizer produces: words (long ones
+split into several tokens), single digits, punctuation, newlines and
+indentation runs. That tracks code — which is much more token-dense
+than prose — far better than a flat chars/4.
+
+Each successful call reports its real prompt_token_count; calibrate()
+folds the ratio into a scale factor (EWMA, clamped), so estimates
+converge on what the API actually bills.
+
+Raw counts are memoized by content digest, so the memo holds a hash and
+an int per text rather than the text itself.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d|\n| {2,}|\t+|[^\sA-Za-z\d]")
+
+CHARS_PER_WORD_TOKEN = 5      # a word of n letters ≈ 1 + (n-1)//5 tokens
+CALIBRATION_WEIGHT = 0.2      # EWMA weight of each new observation
+MIN_SCALE, MAX_SCALE = 0.5, 2.0
+MEMO_SIZE = 4096              # distinct texts whose raw count is kept
+
+_scale = 1.0
+_scale_lock = threading.Lock()
+
+_counts: "OrderedDict[bytes, int]" = OrderedDict()   # sha1(text) → raw count
+_counts_lock = threading.Lock()
+
+
+def _count(text: str) -> int:
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece[0].isalpha():
+            count += 1 + (len(piece) - 1) // CHARS_PER_WORD_TOKEN
+        else:
+            count += 1
+    return count
+
+
+def _raw_tokens(text: str) -> int:
+    key = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    count = _count(text)
+    with _counts_lock:
+        _counts[key] = count
+        while len(_counts) > MEMO_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated Gemini token count of text (cached per distinct string)."""
+    if not text:
+        return 0
+    return max(1, round(_raw_tokens(text) * _scale))
+
+
+def chars_for_tokens(text: str, tokens: int) -> int:
+    """How many characters of text fit in a token budget, at its own density."""
+    total = estimate_tokens(text)
+    if total <= tokens:
+        return len(text)
+    return max(0, int(len(text) * tokens / total))
+
+
+def calibrate(estimated: int, actual: int) -> None:
+    """Nudge the scale factor towards an observed prompt_token_count."""
+    global _scale
+    if estimated <= 0 or actual <= 0:
+        return
+    with _scale_lock:
+        observed = _scale * actual / estimated
+        _scale = min(MAX_SCALE, max(MIN_SCALE,
+                     (1 - CALIBRATION_WEIGHT) * _scale + CALIBRATION_WEIGHT * observed))
@@ -1,12 +1,43 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from gemini.client import warm_context_cache
+from gemini.symbol_index import warm_index
 from routes import session, prompt, submit, leaderboard, run_tests
+from scoring.test_runner import RQ_SOURCE, prepare_sandbox
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the test sandbox template up front so the first /run-tests
+    # doesn't pay for it. Failure is not fatal — the runner retries lazily.
+    try:
+        await asyncio.to_thread(prepare_sandbox)
+    except Exception:
+        logger.exception("Failed to prepare test sandbox at startup")
+    # Index the RQ sources so prompt context ranking only parses edited files
+    try:
+        await asyncio.to_thread(warm_index, os.path.join(RQ_SOURCE, "rq"))
+    except Exception:
+        logger.exception("Failed to build the symbol index at startup")
+    # Register the cached prompt prefix in the background; the first prompt
+    # creates it anyway if this hasn't finished
+    warm_cache = asyncio.create_task(warm_context_cache())
+    yield
+    warm_cache.cancel()
+
 
-app = FastAPI(title="Sponge API", version="0.1.0")
+app = FastAPI(title="Sponge API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
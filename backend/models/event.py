@@ -1,5 +1,9 @@
-from typing import Optional
+from array import array
+from sys import intern
+from typing import Any, Iterable, Iterator, Optional
+
 from pydantic import BaseModel
+from pydantic_core import core_schema
 
 
 class Event(BaseModel):
@@ -8,3 +12,214 @@ class Event(BaseModel):
     file: Optional[str] = None
     ts: int             # Unix timestamp in milliseconds
     meta: Optional[dict] = None
+
+
+# (event, ts, file, meta) — one event without the model around it
+EventRow = tuple[str, int, Optional[str], Optional[dict]]
+
+
+class EventLog:
+    """
+    A session's event log stored column-wise: an event-type code, a
+    timestamp and an interned file-path code per event, plus the rare meta
+    dicts keyed by position. Appending costs no Event model and an event
+    takes a few bytes instead of a model instance.
+
+    Behaves as a sequence of Event (len, iteration, indexing, append), built
+    on access; scoring reads the columns through rows() without building
+    any. Validates from, and dumps to, a list of events, so Session keeps
+    its JSON shape.
+    """
+
+    __slots__ = ("session_id", "latest_ts", "_kinds", "_ts", "_files", "_meta",
+                 "_kind_names", "_kind_codes", "_paths", "_path_codes")
+
+    def __init__(self, session_id: str = "", rows: Iterable[EventRow] = ()):
+        self.session_id = session_id
+        self.latest_ts: Optional[int] = None     # latest ts in the log, span ends included
+        self._kinds = array("H")
+        self._ts = array("q")
+        self._files = array("I")               # 0: no file, else index into _paths
+        self._meta: dict[int, dict] = {}
+        self._kind_names: list[str] = []
+        self._kind_codes: dict[str, int] = {}
+        self._paths: list[Optional[str]] = [None]
+        self._path_codes: dict[str, int] = {}
+        self.extend_rows(rows)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> "EventLog":
+        events = list(events)
+        session_id = events[0].session_id if events else ""
+        return cls(session_id, ((e.event, e.ts, e.file, e.meta) for e in events))
+
+    # ── writing ──
+
+    def append_row(self, kind: str, ts: int, file: Optional[str] = None,
+                   meta: Optional[dict] = None) -> None:
+        code = self._kind_codes.get(kind)
+        if code is None:
+            code = self._kind_codes[kind] = len(self._kind_names)
+            self._kind_names.append(intern(kind))
+        path = 0
+        if file is not None:
+            path = self._path_codes.get(file)
+            if path is None:
+                path = self._path_codes[file] = len(self._paths)
+                self._paths.append(intern(file))
+        if meta is not None:
+            self._meta[len(self._ts)] = meta
+        latest = row_latest_ts((kind, ts, file, meta))
+        if self.latest_ts is None or latest > self.latest_ts:
+            self.latest_ts = latest
+        self._kinds.append(code)
+        self._ts.append(ts)
+        self._files.append(path)
+
+    def extend_rows(self, rows: Iterable[EventRow]) -> None:
+        for row in rows:
+            self.append_row(*row)
+
+    def append(self, event: Event) -> None:
+        if not self.session_id:
+            self.session_id = event.session_id
+        self.append_row(event.event, event.ts, event.file, event.meta)
+
+    def extend(self, events: Iterable[Event]) -> None:
+        for event in events:
+            self.append(event)
+
+    def merge_edit(self, row: EventRow, quiet_ms: int) -> bool:
+        """Fold a file_edit row into the last row's span if coalesce_edit allows."""
+        n = len(self)
+        if not n or quiet_ms <= 0 or row[0] != "file_edit":
+            return False
+        merged = coalesce_edit(self.row(n - 2) if n > 1 else None, self.row(n - 1), row,
+                               quiet_ms, self.latest_ts)
+        if merged is None:
+            return False
+        self._meta[n - 1] = merged[3]
+        self.latest_ts = row[1]
+        return True
+
+    # ── reading ──
+
+    def row(self, i: int) -> EventRow:
+        return (self._kind_names[self._kinds[i]], self._ts[i],
+                self._paths[self._files[i]], self._meta.get(i))
+
+    def rows(self) -> Iterator[EventRow]:
+        names, paths, meta = self._kind_names, self._paths, self._meta
+        if not meta:
+            for kind, ts, path in zip(self._kinds, self._ts, self._files):
+                yield names[kind], ts, paths[path], None
+            return
+        for i, (kind, ts, path) in enumerate(zip(self._kinds, self._ts, self._files)):
+            yield names[kind], ts, paths[path], meta.get(i)
+
+    def kinds_and_ts(self) -> Iterator[tuple[str, int]]:
+        names = self._kind_names
+        for kind, ts in zip(self._kinds, self._ts):
+            yield names[kind], ts
+
+    def _event(self, row: EventRow) -> Event:
+        kind, ts, file, meta = row
+        return Event(session_id=self.session_id, event=kind, file=file, ts=ts, meta=meta)
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def __iter__(self) -> Iterator[Event]:
+        return map(self._event, self.rows())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._event(self.row(j)) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("event index out of range")
+        return self._event(self.row(i))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (EventLog, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self.rows(), event_rows(other)))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EventLog({len(self)} events)"
+
+    # ── pydantic ──
+
+    def _dump(self) -> list[dict]:
+        return [
+            {"session_id": self.session_id, "event": kind, "file": file, "ts": ts, "meta": meta}
+            for kind, ts, file, meta in self.rows()
+        ]
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+        from_list = core_schema.chain_schema([
+            core_schema.list_schema(handler.generate_schema(Event)),
+            core_schema.no_info_plain_validator_function(cls.from_events),
+        ])
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls._dump),
+        )
+
+
+def row_latest_ts(row: EventRow) -> int:
+    """A row's latest timestamp: its ts, or a span's end."""
+    meta = row[3]
+    if meta is not None and meta.keys() == {"end", "count"}:
+        return meta["end"]
+    return row[1]
+
+
+def coalesce_edit(before: Optional[EventRow], last: EventRow, row: EventRow,
+                  quiet_ms: int, latest_ts: Optional[int] = None) -> Optional[EventRow]:
+    """
+    `last` with the file_edit `row` merged into it, or None to append `row`.
+
+    A burst of edits to one file, each within quiet_ms of the previous, is
+    kept as its first edit with meta {"end": last ts, "count": edits}.
+    Scoring only asks whether some edit lies strictly between two other
+    events' timestamps. If no event ever lands inside a burst, and the
+    burst's first edit is strictly later than the row before it (no other
+    event shares its ts), the first edit answers every such question as
+    the whole burst would.
+
+    An edit earlier than latest_ts (the latest ts already stored) arrived
+    out of order and is kept as its own event. A merge can't be undone,
+    though: an event that arrives late with a ts inside a merged burst is
+    scored as if the burst happened at its first edit. That is why
+    coalescing is opt-in (SPONGE_EDIT_COALESCE_MS).
+    """
+    kind, ts, file, meta = row
+    if quiet_ms <= 0 or kind != "file_edit" or meta is not None:
+        return None
+    if latest_ts is not None and ts < latest_ts:
+        return None
+    last_kind, start, last_file, last_meta = last
+    if last_kind != "file_edit" or last_file != file:
+        return None
+    if last_meta is None:
+        if before is not None and before[1] >= start:
+            return None      # tied with (or behind) the row before it
+        end, count = start, 1
+    elif last_meta.keys() == {"end", "count"}:
+        end, count = last_meta["end"], last_meta["count"]
+    else:
+        return None
+    if not 0 <= ts - end <= quiet_ms:
+        return None
+    return (kind, start, file, {"end": ts, "count": count + 1})
+
+
+def event_rows(events) -> Iterator[EventRow]:
+    """(event, ts, file, meta) rows of an EventLog or of a plain list of Event."""
+    if isinstance(events, EventLog):
+        return events.rows()
+    return ((e.event, e.ts, e.file, e.meta) for e in events)
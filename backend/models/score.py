@@ -90,3 +90,7 @@ class Score(BaseModel):
     test_suite: Optional[TestSuiteResult] = None
     insights: Optional[list[Insight]] = None
     user_prompts: Optional[list[str]] = None
+    degraded_stages: Optional[list[str]] = None  # submit stages that missed their budget
+    # Leaderboard standing, filled in on /submit responses (not stored)
+    rank: Optional[int] = None
+    percentile: Optional[float] = None           # % of leaderboard entries scoring lower
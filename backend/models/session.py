@@ -1,8 +1,8 @@
 from datetime import datetime, timezone
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Any, Optional, Union
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
-from models.event import Event
+from models.event import EventLog
 from models.score import Score
 
 
@@ -15,7 +15,18 @@ class Session(BaseModel):
     username: Optional[str] = None
     started_at: datetime = Field(default_factory=_utcnow)
     completed_at: Optional[datetime] = None
-    events: list[Event] = Field(default_factory=list)
+    events: EventLog = Field(default_factory=EventLog)     # validates from / dumps to list[Event]
     conversation_history: list[dict] = Field(default_factory=list)
-    final_code: Optional[str] = None
+    # Submitted files by path; a str is the legacy concatenated `// --- path ---` blob
+    final_code: Optional[Union[dict[str, str], str]] = None
     score: Optional[Score] = None
+
+    # Running metric accumulators (scoring/live.py) — process-local, never serialized
+    _live: Any = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _own_events(self):
+        # The log stores no per-event session_id; its events belong to this session
+        if isinstance(self.events, EventLog):
+            self.events.session_id = self.session_id
+        return self
@@ -0,0 +1,249 @@
+"""
+Leaderboard index, updated as /submit stores scores.
+
+GET /leaderboard used to walk every session and sort the scored ones on
+each request. The index keeps scored sessions already in leaderboard
+order — score descending, then earliest completion — so a page costs
+O(log n + page), and answers a score's rank and percentile in O(log n)
+for the submit response.
+
+It follows SPONGE_SESSION_STORE:
+  memory  a sorted key list and a Fenwick tree of entries per score
+          (0–100), process-local; rebuilt from store.sessions at startup
+  redis   a lexicographic sorted set plus a hash of entries at
+          SPONGE_REDIS_URL, shared by every worker
+
+Pages are addressed by an opaque cursor naming the last entry seen, so
+they stay consistent while new scores arrive between requests.
+"""
+
+import base64
+import json
+import logging
+import threading
+from bisect import bisect_right, insort
+from typing import Optional
+
+import store
+from models.session import Session
+
+logger = logging.getLogger(__name__)
+
+MAX_SCORE = 100
+REDIS_KEY = "sponge:leaderboard:lex"   # rebuilt from the store if missing
+REDIS_ENTRIES_KEY = REDIS_KEY + ":entries"
+_SCORE_DIGITS = 3             # zero-padded so members sort by score
+_MS_DIGITS = 13               # ...then by completion time
+
+
+def _entry(session: Session) -> dict:
+    return {
+        "username": session.username or "Anonymous",
+        "score": session.score.total_score,
+        "badge": session.score.badge,
+        "time_completed": (session.completed_at or session.started_at).isoformat() + "Z",
+    }
+
+
+def _completed_ms(session: Session) -> int:
+    return int((session.completed_at or session.started_at).timestamp() * 1000)
+
+
+def encode_cursor(after: tuple[int, int, str]) -> str:
+    """Opaque cursor for the entry (score, completed ms, session_id)."""
+    return base64.urlsafe_b64encode(json.dumps(after, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int, str]:
+    """The entry a cursor names; ValueError if it isn't one of ours."""
+    try:
+        score, completed_ms, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Malformed leaderboard cursor") from exc
+    if not (isinstance(score, int) and isinstance(completed_ms, int) and isinstance(session_id, str)):
+        raise ValueError("Malformed leaderboard cursor")
+    return score, completed_ms, session_id
+
+
+# ---------- Memory ----------
+
+class _Fenwick:
+    """Counts per integer score with O(log n) prefix sums."""
+
+    __slots__ = ("tree",)
+
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    def add(self, score: int, delta: int) -> None:
+        i = score + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, score: int) -> int:
+        """Entries with a score <= score."""
+        total = 0
+        i = min(score + 1, len(self.tree) - 1)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class LeaderboardIndex:
+    """Process-local index: entries kept sorted by (-score, completed, session_id)."""
+
+    def __init__(self):
+        self._keys: list[tuple[int, int, str]] = []
+        self._entries: dict[str, tuple[tuple[int, int, str], dict]] = {}
+        self._counts = _Fenwick(MAX_SCORE + 1)
+        self._lock = threading.Lock()
+
+    def record(self, session: Session) -> None:
+        """Add or move the session's entry for its current score."""
+        entry = _entry(session)
+        score = max(0, min(MAX_SCORE, entry["score"]))
+        key = (-score, _completed_ms(session), session.session_id)
+        with self._lock:
+            old = self._entries.get(session.session_id)
+            if old is not None:
+                old_key = old[0]
+                del self._keys[bisect_right(self._keys, old_key) - 1]
+                self._counts.add(-old_key[0], -1)
+            insort(self._keys, key)
+            self._counts.add(score, 1)
+            self._entries[session.session_id] = (key, entry)
+
+    def page(self, limit: Optional[int] = None, after: Optional[tuple[int, int, str]] = None,
+             ) -> tuple[list[dict], Optional[tuple[int, int, str]]]:
+        """(entries, the last one's cursor position) — None on the last page."""
+        with self._lock:
+            start = 0
+            if after is not None:
+                score, completed_ms, session_id = after
+                start = bisect_right(self._keys, (-score, completed_ms, session_id))
+            end = len(self._keys) if limit is None else start + limit
+            keys = self._keys[start:end]
+            entries = [self._entries[k[2]][1] for k in keys]
+            more = end < len(self._keys)
+        if not (more and keys):
+            return entries, None
+        last = keys[-1]
+        return entries, (-last[0], last[1], last[2])
+
+    def standing(self, score: int) -> tuple[int, float, int]:
+        """(rank, percentile, total) of a score: rank 1 is the top (ties share
+        it); percentile is the share of entries scoring lower."""
+        score = max(0, min(MAX_SCORE, score))
+        with self._lock:
+            total = self._counts.prefix(MAX_SCORE)
+            below = self._counts.prefix(score - 1) if score > 0 else 0
+            higher = total - self._counts.prefix(score)
+        percentile = round(100 * below / total, 1) if total else 0.0
+        return higher + 1, percentile, total
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# ---------- Redis ----------
+
+class RedisLeaderboardIndex:
+    """Sorted set of "<100 - score>|<completion ms>|<session_id>" members,
+    all with score 0, so lexicographic order is leaderboard order and pages
+    and counts use ZRANGEBYLEX / ZLEXCOUNT (only defined when every member
+    has the same score); the entries live in a hash."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _prefix(score: int) -> str:
+        return f"{MAX_SCORE - max(0, min(MAX_SCORE, score)):0{_SCORE_DIGITS}d}"
+
+    @classmethod
+    def _member(cls, score: int, completed_ms: int, session_id: str) -> str:
+        return f"{cls._prefix(score)}|{completed_ms:0{_MS_DIGITS}d}|{session_id}"
+
+    def record(self, session: Session) -> None:
+        """Move the session's member, retried if another record of it
+        lands in between."""
+        from redis.exceptions import WatchError
+
+        entry = _entry(session)
+        member = self._member(entry["score"], _completed_ms(session), session.session_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(REDIS_ENTRIES_KEY)
+                    old = pipe.hget(REDIS_ENTRIES_KEY, session.session_id)
+                    pipe.multi()
+                    if old is not None:
+                        pipe.zrem(REDIS_KEY, json.loads(old)["member"])
+                    pipe.zadd(REDIS_KEY, {member: 0})
+                    pipe.hset(REDIS_ENTRIES_KEY, session.session_id,
+                              json.dumps({"member": member, **entry}))
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def page(self, limit: Optional[int] = None, after: Optional[tuple[int, int, str]] = None,
+             ) -> tuple[list[dict], Optional[tuple[int, int, str]]]:
+        low = "-" if after is None else "(" + self._member(*after)
+        if limit is None:
+            members = self.client.zrangebylex(REDIS_KEY, low, "+")
+        else:
+            members = self.client.zrangebylex(REDIS_KEY, low, "+", start=0, num=limit + 1)
+        more = limit is not None and len(members) > limit
+        members = [m.decode() for m in members[:limit]]
+        if not members:
+            return [], None
+        entries = []
+        for raw in self.client.hmget(REDIS_ENTRIES_KEY, [m.split("|", 2)[2] for m in members]):
+            entry = json.loads(raw)
+            entry.pop("member")
+            entries.append(entry)
+        if not more:
+            return entries, None
+        inverted, completed_ms, session_id = members[-1].split("|", 2)
+        return entries, (MAX_SCORE - int(inverted), int(completed_ms), session_id)
+
+    def standing(self, score: int) -> tuple[int, float, int]:
+        prefix = self._prefix(score)
+        below = f"{int(prefix) + 1:0{_SCORE_DIGITS}d}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(REDIS_KEY)
+        pipe.zlexcount(REDIS_KEY, "-", "(" + prefix)
+        pipe.zlexcount(REDIS_KEY, "[" + below, "+")
+        total, higher, below = pipe.execute()
+        percentile = round(100 * below / total, 1) if total else 0.0
+        return higher + 1, percentile, total
+
+    def __len__(self) -> int:
+        return self.client.zcard(REDIS_KEY)
+
+
+# ---------- Public API ----------
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_leaderboard_index():
+    """Lazily open the index for the session store's mode, backfilled from
+    the store's scored sessions when it starts out empty."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            if isinstance(store.sessions, store.RedisSessionStore):
+                index = RedisLeaderboardIndex(store.sessions.client)
+            else:
+                index = LeaderboardIndex()
+            if not len(index):
+                for session in store.sessions.values():
+                    if session.score is not None:
+                        index.record(session)
+            _index = index
+        return _index
@@ -1,7 +1,11 @@
-from fastapi import APIRouter
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 
-import store
+from ranking import decode_cursor, encode_cursor, get_leaderboard_index
 
 router = APIRouter(tags=["leaderboard"])
 
@@ -18,25 +22,38 @@ class LeaderboardEntry(BaseModel):
 # ---------- Endpoint ----------
 
 @router.get("/leaderboard", response_model=list[LeaderboardEntry])
-async def get_leaderboard():
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
     """
-    Returns all completed sessions sorted by total_score descending.
+    Returns completed sessions sorted by total_score descending (earliest
+    completion first among equal scores), read from the leaderboard index.
     Only sessions that have been submitted (i.e. have a score) appear here.
+
+    Without `limit` the whole board is returned, as before. With it, a page
+    of that many entries; the X-Next-Cursor header carries the `cursor` for
+    the next page. Every page has an ETag of its content, so a poll with a
+    matching If-None-Match gets an empty 304.
     """
-    entries: list[LeaderboardEntry] = []
-
-    for session in store.sessions.values():
-        if session.score is None:
-            continue
-
-        entries.append(
-            LeaderboardEntry(
-                username=session.username or "Anonymous",
-                score=session.score.total_score,
-                badge=session.score.badge,
-                time_completed=(session.completed_at or session.started_at).isoformat() + "Z",
-            )
-        )
-
-    entries.sort(key=lambda e: e.score, reverse=True)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    entries, next_after = get_leaderboard_index().page(limit, after)
+    next_cursor = encode_cursor(next_after) if next_after is not None else None
+
+    digest = hashlib.sha1(json.dumps([entries, next_cursor], separators=(",", ":")).encode())
+    headers = {"ETag": f'"{digest.hexdigest()[:20]}"'}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
     return entries
@@ -1,11 +1,18 @@
+import json
+from contextlib import aclosing
+from functools import partial
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 import store
-from gemini.client import call_gemini
+from file_store import sync_files
+from gemini.client import call_gemini, stream_gemini
+from gemini.context_cache import get_prefix_cache
 from models.session import Session
+from scoring.live import record_history
 
 router = APIRouter(tags=["prompt"])
 
@@ -23,13 +30,58 @@ class PromptRequest(BaseModel):
     conversation_history: list[ConversationMessage] = []
     active_file: Optional[str] = None
     file_contents: Optional[dict[str, str]] = None
+    # Manifest of {path: sha256(content)} for every open file. When sent,
+    # file_contents only needs the files the server doesn't have yet
+    # (see file_store.py); a 409 lists any it is still missing.
+    file_hashes: Optional[dict[str, str]] = None
 
 
 class PromptResponse(BaseModel):
     response_text: str
 
 
-# ---------- Endpoint ----------
+# ---------- Helpers ----------
+
+def _get_session(session_id: str) -> Session:
+    # Auto-create so the prompt flow works even if the session was lost or expired
+    return store.sessions.get_or_create(session_id)
+
+
+def _context_blocks(body: PromptRequest) -> dict:
+    """Sync the session's file store with the request and return its
+    codebase context — the edited-files-only block when the prompt prefix
+    is cached, and the full block, built only if a model goes uncached
+    (none when the request carries no files)."""
+    if body.file_hashes is None and body.file_contents is None:
+        return {}
+    files = sync_files(body.session_id, body.file_hashes, body.file_contents)
+    blocks = {"context_block": partial(files.context_block, body.active_file, body.prompt_text)}
+    prefix_cache = get_prefix_cache()
+    if prefix_cache is not None:
+        blocks["delta_block"] = files.context_block(
+            body.active_file, body.prompt_text, baseline=prefix_cache.baseline,
+        )
+    return blocks
+
+
+def _record_turn(session: Session, history: list[dict], prompt_text: str, response_text: str) -> None:
+    """Persist the exchange for the scoring engine.
+
+    The frontend includes the current user message in conversation_history,
+    so strip it to avoid duplication before appending the full exchange.
+    """
+    prior_history = history
+    if history and history[-1].get("role") == "user":
+        prior_history = history[:-1]
+
+    record_history(session, prior_history + [
+        {"role": "user", "content": prompt_text},
+        {"role": "assistant", "content": response_text},
+    ])
+    store.sessions.save(session, "conversation_history")
+
+
+# ---------- Endpoints ----------
 
 @router.post("/prompt", response_model=PromptResponse)
 async def handle_prompt(body: PromptRequest):
@@ -37,32 +89,59 @@ async def handle_prompt(body: PromptRequest):
     Forwards the user prompt to Gemini with conversation history and codebase context.
     Persists the new turn to the session and returns the AI response.
     """
-    session = store.sessions.get(body.session_id)
-    if session is None:
-        # Serverless (Vercel): session may not survive across invocations.
-        # Auto-create so the prompt flow works even if the container restarted.
-        session = Session(session_id=body.session_id)
-        store.sessions[body.session_id] = session
-
+    session = _get_session(body.session_id)
     history = [msg.model_dump() for msg in body.conversation_history]
+    context_blocks = _context_blocks(body)
 
     response_text = await call_gemini(
         prompt=body.prompt_text,
         conversation_history=history,
-        active_file=body.active_file,
-        file_contents=body.file_contents,
+        session_id=body.session_id,
+        **context_blocks,
     )
 
-    # Persist the exchange for the scoring engine.
-    # The frontend includes the current user message in conversation_history,
-    # so strip it to avoid duplication before appending the full exchange.
-    prior_history = history
-    if history and history[-1].get("role") == "user":
-        prior_history = history[:-1]
+    _record_turn(session, history, body.prompt_text, response_text)
+    return PromptResponse(response_text=response_text)
 
-    session.conversation_history = prior_history + [
-        {"role": "user", "content": body.prompt_text},
-        {"role": "assistant", "content": response_text},
-    ]
 
-    return PromptResponse(response_text=response_text)
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/prompt/stream")
+async def handle_prompt_stream(body: PromptRequest):
+    """
+    Streaming variant of /prompt (Server-Sent Events).
+
+    Emits a `delta` event per chunk of response text as Gemini generates it,
+    then a `done` event carrying the full response_text (the /prompt
+    response). The turn is persisted when the stream ends — with whatever
+    was generated if the client disconnects first.
+    """
+    session = _get_session(body.session_id)
+    history = [msg.model_dump() for msg in body.conversation_history]
+    context_blocks = _context_blocks(body)
+
+    async def events():
+        chunks = []
+        try:
+            async with aclosing(stream_gemini(
+                prompt=body.prompt_text,
+                conversation_history=history,
+                session_id=body.session_id,
+                **context_blocks,
+            )) as stream:
+                async for text in stream:
+                    chunks.append(text)
+                    yield _sse("delta", {"text": text})
+            response_text = "".join(chunks).rstrip()
+            yield _sse("done", PromptResponse(response_text=response_text).model_dump())
+        finally:
+            if chunks:
+                _record_turn(session, history, body.prompt_text, "".join(chunks).rstrip())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,25 +1,47 @@
 import asyncio
+import json
 import os
 import shutil
 import subprocess
 import sys
 import traceback
-from typing import Optional
+from typing import Optional, Union
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 import store
-from models.score import TestSuiteResult
-from models.session import Session
-from scoring.test_runner import run_correctness_tests_verbose, RQ_SOURCE, BACKEND_ROOT
+from file_store import get_files, sync_files
+from models.score import TestResult, TestSuiteResult
+from scoring.scheduler import RunSuperseded, SchedulerBusy, get_scheduler
+from scoring.test_runner import (
+    SubmittedCode, parse_final_code, run_correctness_tests_verbose, stream_correctness_tests,
+    submitted_files, RQ_SOURCE, BACKEND_ROOT,
+)
 
 router = APIRouter(tags=["run-tests"])
 
 
 class RunTestsRequest(BaseModel):
     session_id: str
-    file_contents: str  # concatenated // --- path --- format, same as submit
+    # Either the files by path (or the legacy concatenated // --- path --- blob, same as submit) …
+    file_contents: Optional[Union[dict[str, str], str]] = None
+    # … or a file_store manifest plus only the files that changed
+    file_hashes: Optional[dict[str, str]] = None
+    changed_files: Optional[dict[str, str]] = None
+
+
+NO_CODE_ERROR = "No code to test — send file_contents or file_hashes"
+
+
+def _final_code(body: RunTestsRequest) -> SubmittedCode:
+    """The files to test, kept in the session's file store either way."""
+    if body.file_contents is not None:
+        files = submitted_files(body.file_contents)
+        get_files(body.session_id).replace_all(files)
+        return files or body.file_contents    # a blob naming no files fails in the runner as before
+    return sync_files(body.session_id, body.file_hashes, body.changed_files).contents()
 
 
 @router.post("/run-tests")
@@ -30,13 +52,26 @@ async def run_tests(body: RunTestsRequest):
     results immediately without triggering scoring or Gemini evaluation.
     """
     # Ensure session exists (serverless: auto-create across cold starts)
-    session = store.sessions.get(body.session_id)
-    if session is None:
-        session = Session(session_id=body.session_id)
-        store.sessions[body.session_id] = session
+    store.sessions.get_or_create(body.session_id)
+
+    final_code = _final_code(body)
+    if not final_code:
+        return {"error": NO_CODE_ERROR}
 
     try:
-        return await run_correctness_tests_verbose(body.file_contents)
+        return await run_correctness_tests_verbose(final_code, session_id=body.session_id)
+    except SchedulerBusy as e:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"error": "Test runner is busy — try again shortly", "queued": e.queued,
+                     "retry_after": e.retry_after},
+        )
+    except RunSuperseded:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Superseded by a newer test run for this session"},
+        )
     except Exception as e:
         tb = traceback.format_exc()
         return {
@@ -45,12 +80,74 @@ async def run_tests(body: RunTestsRequest):
         }
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/run-tests/stream")
+async def run_tests_stream(body: RunTestsRequest):
+    """Streaming variant of /run-tests (Server-Sent Events).
+
+    Emits one `result` event per TestResult as each test finishes (core
+    tests first), then a `summary` event with the full TestSuiteResult.
+    Failures arrive as a single `error` event instead.
+    """
+    store.sessions.get_or_create(body.session_id)
+
+    final_code = _final_code(body)
+
+    async def events():
+        if not final_code:
+            yield _sse("error", {"error": NO_CODE_ERROR})
+            return
+        try:
+            async for item in stream_correctness_tests(final_code, session_id=body.session_id):
+                if isinstance(item, TestResult):
+                    yield _sse("result", item.model_dump())
+                else:
+                    yield _sse("summary", item.model_dump())
+        except SchedulerBusy as e:
+            yield _sse("error", {"error": "Test runner is busy — try again shortly", "status": 429,
+                                 "queued": e.queued, "retry_after": e.retry_after})
+        except RunSuperseded:
+            yield _sse("error", {"error": "Superseded by a newer test run for this session", "status": 409})
+        except Exception as e:
+            tb = traceback.format_exc()
+            yield _sse("error", {"error": f"{type(e).__name__}: {e}", "traceback": tb[-1500:]})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/run-tests/queue/{session_id}")
+async def run_tests_queue(session_id: str):
+    """Where this session's test run stands in the sandbox queue."""
+    scheduler = get_scheduler()
+    position = scheduler.position(session_id)
+    if position is not None:
+        state = "queued"
+    elif scheduler.is_running(session_id):
+        state = "running"
+    else:
+        state = "idle"
+    return {
+        "state": state,
+        "position": position,
+        "active": scheduler.active,
+        "queued": scheduler.queued,
+        "concurrency": scheduler.concurrency,
+    }
+
+
 @router.get("/run-tests/debug")
 async def debug_test_runner():
     """Temporary debug endpoint — runs actual test flow and reports errors."""
-    import tempfile
     from scoring.test_runner import (
-        parse_final_code, CONFTEST_CONTENT, TEST_SUITE_PATH, PYTEST_TIMEOUT,
+        PYTEST_TIMEOUT, SANDBOX_RQ_DIRNAME,
+        _create_run_view, _overlay_files, _pytest_command, _pytest_env,
     )
 
     info = {"python": sys.executable, "version": sys.version}
@@ -72,42 +169,18 @@ async def debug_test_runner():
         info["error"] = "parse_final_code returned empty"
         return info
 
-    # Step 2: copy rq-v1.0
-    tmpdir = tempfile.mkdtemp(prefix="sponge_debug_")
+    # Step 2: build the per-run sandbox view
+    tmpdir = None
     try:
-        rq_copy = os.path.join(tmpdir, "rq-v1.0")
-        shutil.copytree(RQ_SOURCE, rq_copy)
-        info["copytree"] = "ok"
-
-        # Step 3: write conftest
-        with open(os.path.join(tmpdir, "conftest.py"), "w") as f:
-            f.write(CONFTEST_CONTENT)
-
-        # Step 4: overlay user files
-        for rel_path, content in user_files.items():
-            dest = os.path.join(rq_copy, rel_path)
-            os.makedirs(os.path.dirname(dest), exist_ok=True)
-            with open(dest, "w") as f:
-                f.write(content)
-
-        # Step 5: copy test suite
-        test_dest = os.path.join(tmpdir, "test_submission.py")
-        shutil.copy2(TEST_SUITE_PATH, test_dest)
-
-        # Step 6: run pytest
-        env = os.environ.copy()
-        env["RQ_CODEBASE_PATH"] = rq_copy
-        runtime_paths = os.pathsep.join(p for p in sys.path if p)
-        extra_paths = rq_copy + os.pathsep + os.path.join(rq_copy, "tests")
-        env["PYTHONPATH"] = extra_paths + os.pathsep + runtime_paths
+        tmpdir = _create_run_view(_overlay_files(user_files))
+        rq_copy = os.path.join(tmpdir, SANDBOX_RQ_DIRNAME)
+        info["sandbox"] = tmpdir
 
+        # Step 3: run pytest
+        test_dest = os.path.join(tmpdir, "test_submission.py")
         xml_path = os.path.join(tmpdir, "results.xml")
-        cmd = [
-            sys.executable, "-m", "pytest", test_dest,
-            f"--junitxml={xml_path}", "-q", "--no-header",
-            f"--ignore={os.path.join(rq_copy, 'tests')}",
-            f"--rootdir={tmpdir}",
-        ]
+        cmd = _pytest_command(tmpdir, [test_dest], xml_path)
+        env = _pytest_env(rq_copy)
 
         result = subprocess.run(
             cmd, capture_output=True, text=True,
@@ -121,6 +194,7 @@ async def debug_test_runner():
     except Exception as e:
         info["error"] = f"{type(e).__name__}: {e}"
     finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
     return info
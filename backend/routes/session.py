@@ -2,14 +2,20 @@ import uuid
 from typing import Optional
 
 from fastapi import APIRouter, Body, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing_extensions import NotRequired, TypedDict
 
 import store
 from models.event import Event
+from models.score import HeadlineMetrics, PenaltyDetail, RubricBreakdown, SubCriteriaDetail
 from models.session import Session
+from scoring.engine import compute_score
+from scoring.live import LiveTimeline, session_timeline
 
 router = APIRouter(tags=["session"])
 
+MAX_EVENT_BATCH = 1000
+
 
 # ---------- Request / Response schemas ----------
 
@@ -28,6 +34,29 @@ class LogEventRequest(BaseModel):
     ts: int             # Unix timestamp in milliseconds
 
 
+class BatchEvent(TypedDict):
+    # A TypedDict, not a model: a batch validates to plain dicts in one pass
+    event: str
+    ts: int
+    file: NotRequired[Optional[str]]
+
+
+class LogEventsRequest(BaseModel):
+    session_id: str
+    events: list[BatchEvent] = Field(max_length=MAX_EVENT_BATCH)   # in the order they happened
+
+
+class LiveScoreResponse(BaseModel):
+    session_id: str
+    event_count: int
+    prompt_count: int
+    incremental: bool    # read from the live accumulators (False: replayed the log)
+    headline_metrics: HeadlineMetrics
+    rubric_breakdown: RubricBreakdown
+    sub_criteria: SubCriteriaDetail
+    penalty_detail: PenaltyDetail
+
+
 # ---------- Endpoints ----------
 
 @router.post("/session/start", response_model=StartSessionResponse)
@@ -51,18 +80,51 @@ async def log_event(body: LogEventRequest):
     Logs a frontend event (file_open, file_edit, prompt_sent, test_run).
     Events are stored on the session and consumed later by the scoring engine.
     """
-    session = store.sessions.get(body.session_id)
-    if session is None:
-        # Serverless: auto-create so events aren't lost
-        session = Session(session_id=body.session_id)
-        store.sessions[body.session_id] = session
-
     event = Event(
         session_id=body.session_id,
         event=body.event,
         file=body.file,
         ts=body.ts,
     )
-    session.events.append(event)
+    # Appends to the log (creating the session if it was lost) without rewriting it
+    store.sessions.append_event(body.session_id, event)
 
     return {}
+
+
+@router.post("/session/events", status_code=200)
+async def log_events(body: LogEventsRequest):
+    """
+    Logs a batch of frontend events in one request, appended in list order.
+    Same effect as one /session/event call per event; no Event models are
+    built on the way into the session's log.
+    """
+    rows = [(e["event"], e["ts"], e.get("file"), None) for e in body.events]
+    store.sessions.append_events(body.session_id, rows)
+
+    return {"logged": len(rows)}
+
+
+@router.get("/session/{session_id}/live-score", response_model=LiveScoreResponse)
+async def live_score(session_id: str):
+    """
+    Cheap metric-only preview of the session's score so far.
+    No Gemini evaluations and no test run: semantic sub-criteria score 0 and
+    test accuracy isn't included, so this is a trend, not the final grade.
+    """
+    session = store.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    incremental = isinstance(session_timeline(session), LiveTimeline)
+    score = compute_score(session)
+    return LiveScoreResponse(
+        session_id=session_id,
+        event_count=len(session.events),
+        prompt_count=sum(1 for t in session.conversation_history if t.get("role") == "user"),
+        incremental=incremental,
+        headline_metrics=score.headline_metrics,
+        rubric_breakdown=score.rubric_breakdown,
+        sub_criteria=score.sub_criteria,
+        penalty_detail=score.penalty_detail,
+    )
@@ -1,18 +1,20 @@
 import asyncio
+import json
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, Union
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 import store
+from file_store import get_files, sync_files
 from models.score import Score
 from models.session import Session
-from scoring.engine import compute_score
-from scoring.semantic import evaluate_conversation
-from scoring.code_analysis import analyze_final_code
-from scoring.test_runner import run_correctness_tests
-from scoring.insights import generate_insights
+from ranking import get_leaderboard_index
+from scoring.jobs import JobStatus, enqueue_submission, job_state
+from scoring.pipeline import score_session
+from scoring.test_runner import submitted_files
 
 router = APIRouter(tags=["submit"])
 
@@ -21,8 +23,17 @@ router = APIRouter(tags=["submit"])
 
 class SubmitRequest(BaseModel):
     session_id: str
-    final_code: str             # all edited file contents concatenated / serialised
+    # The files by path, or the legacy concatenated `// --- path ---` blob
+    final_code: Optional[Union[dict[str, str], str]] = None
     username: Optional[str] = None
+    # Alternative to final_code: file_store manifest + only the changed files
+    file_hashes: Optional[dict[str, str]] = None
+    changed_files: Optional[dict[str, str]] = None
+    # Score on the RQ submit queue: answer 202 with a job id straight away
+    background: bool = False
+
+
+JOB_POLL_S = 0.5
 
 
 # ---------- Endpoint ----------
@@ -38,53 +49,108 @@ async def submit_session(body: SubmitRequest):
       3. Correctness tests (12 synthesized tests via sandbox)
 
     All three return None on failure — engine falls back to metrics.
+    With SPONGE_FUSED_EVAL=1 the two Gemini evals and the insight
+    candidates come from a single call instead (scoring/fused_eval.py).
+
+    Every stage runs under a latency budget (scoring/pipeline.py); stages
+    that miss it are reported in score.degraded_stages.
     """
-    session = store.sessions.get(body.session_id)
-    if session is None:
-        # Serverless: auto-create so submission works across cold starts
-        session = Session(session_id=body.session_id)
-        store.sessions[body.session_id] = session
+    # Auto-create so submission works even if the session was lost or expired
+    session = store.sessions.get_or_create(body.session_id)
 
     if session.score is not None:
         # Already scored — return cached result
-        return session.score
-
-    session.final_code = body.final_code
+        return _with_standing(session.score)
+
+    if body.final_code is not None:
+        files = submitted_files(body.final_code)
+        get_files(body.session_id).replace_all(files)
+        final_code = files or body.final_code   # a blob naming no files is scored as text
+    elif body.file_hashes is not None:
+        final_code = sync_files(body.session_id, body.file_hashes, body.changed_files).contents()
+    else:
+        raise HTTPException(status_code=400, detail="No code submitted — send final_code or file_hashes")
+
+    session.final_code = final_code
     session.completed_at = datetime.now(timezone.utc)
     if body.username:
         session.username = body.username
+    store.sessions.save(session, "final_code", "completed_at", "username")
 
-    # Fire all three evals concurrently — each returns None on failure
-    conv_eval, code_eval, test_results = await asyncio.gather(
-        evaluate_conversation(session.conversation_history),
-        analyze_final_code(session.final_code),
-        run_correctness_tests(session.final_code, include_hidden=True),
-    )
+    if body.background:
+        job = enqueue_submission(session)
+        return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.get_status()})
 
-    score = compute_score(
-        session,
-        semantic_eval=conv_eval,
-        conv_eval=conv_eval,
-        code_eval=code_eval,
-        test_results=test_results,
-    )
+    score = await score_session(session, on_late_score=_save_score)
+    session.score = score
+    _save_score(session)
+    return _with_standing(score)
 
-    # Generate personalised insights from the scoring data
-    user_prompts = [
-        t["content"] for t in session.conversation_history
-        if t.get("role") == "user"
-    ]
-    insights = await generate_insights(
-        user_prompts=user_prompts,
-        total_score=score.total_score,
-        rubric=score.rubric_breakdown,
-        sub_criteria=score.sub_criteria,
-        metrics=score.headline_metrics,
-        penalties=score.penalty_detail,
-        test_suite=score.test_suite,
-    )
-    score.insights = insights
-    score.user_prompts = user_prompts
 
-    session.score = score
-    return score
+def _save_score(session: Session) -> None:
+    store.sessions.save(session, "score")
+    get_leaderboard_index().record(session)
+
+
+def _with_standing(score: Score) -> Score:
+    """The score with its current leaderboard rank and percentile."""
+    rank, percentile, _ = get_leaderboard_index().standing(score.total_score)
+    return score.model_copy(update={"rank": rank, "percentile": percentile})
+
+
+# ---------- Background jobs ----------
+
+def _job_state(job_id: str) -> dict:
+    """Job state as JSON, with a finished score's current standing."""
+    state = job_state(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown submit job")
+    if state["score"] is not None:
+        state["score"] = _with_standing(state["score"]).model_dump(mode="json")
+    return state
+
+
+@router.get("/submit/jobs/{job_id}")
+async def submit_job_status(job_id: str):
+    """Status of a background submit: queued → started → finished (with score) or failed."""
+    return await asyncio.to_thread(_job_state, job_id)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/submit/jobs/{job_id}/events")
+async def submit_job_events(job_id: str):
+    """Server-Sent Events for a background submit.
+
+    Emits a `status` event whenever the job's status or stage changes,
+    then `done` with the Score or `error`.
+    """
+    first = await asyncio.to_thread(_job_state, job_id)   # 404 before streaming
+
+    async def events():
+        state, last = first, None
+        while True:
+            current = (state["status"], state["stage"])
+            if current != last:
+                yield _sse("status", {"status": state["status"], "stage": state["stage"]})
+                last = current
+            if state["status"] == JobStatus.FINISHED:
+                yield _sse("done", state["score"] or {})
+                return
+            if state["status"] == JobStatus.FAILED:
+                yield _sse("error", {"error": state["error"]})
+                return
+            await asyncio.sleep(JOB_POLL_S)
+            try:
+                state = await asyncio.to_thread(_job_state, job_id)
+            except HTTPException:
+                yield _sse("error", {"error": "Submit job expired"})
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
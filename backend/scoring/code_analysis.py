@@ -1,6 +1,9 @@
 """
 Code analysis module — evaluates final_code via Gemini.
 
+The model reviews only the submitted files that differ from RQ v1.0
+(submission_text); a legacy concatenated final_code is sent as is.
+
 Scores:
   B1: Clarity/Readability (0-8)
   B2: Correctness-Oriented Design (0-7)
@@ -12,32 +15,20 @@ Returns CodeSemanticEval or None on any failure.
 
 import json
 import logging
-import os
+import threading
 from typing import Optional
 
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
+from gemini.context_cache import load_baseline
 from gemini.fallback import generate_with_fallback
+from gemini.service import get_client
+from scoring.eval_cache import cache_get, cache_put, eval_key
+from scoring.test_runner import SubmittedCode
 
 logger = logging.getLogger(__name__)
 
-_client: Optional[genai.Client] = None
-_configured_key: Optional[str] = None
-
-
-def _get_client() -> Optional[genai.Client]:
-    global _client, _configured_key
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    if api_key != _configured_key:
-        _client = genai.Client(api_key=api_key)
-        _configured_key = api_key
-    return _client
-
-
 # ── Output model ──────────────────────────────────────────────────────────
 
 class CodeSemanticEval(BaseModel):
@@ -136,24 +127,74 @@ def _clamp(val, lo, hi) -> float:
     return float(max(lo, min(hi, val)))
 
 
+def code_eval_from_data(data: dict) -> CodeSemanticEval:
+    """Clamp a parsed model response into a CodeSemanticEval."""
+    return CodeSemanticEval(
+        b1_clarity=_clamp(data.get("b1_clarity", 4), 0, 8),
+        b2_correctness=_clamp(data.get("b2_correctness", 3.5), 0, 7),
+        b3_efficiency_code=_clamp(data.get("b3_efficiency_code", 2.5), 0, 5),
+        p3_critical_miss=bool(data.get("p3_critical_miss", False)),
+        p3_details=str(data.get("p3_details", "")).strip(),
+        code_feedback=str(data.get("code_feedback", "")).strip(),
+    )
+
+
+# ── Submission text ───────────────────────────────────────────────────────
+
+_baseline: Optional[dict[str, str]] = None
+_baseline_lock = threading.Lock()
+
+
+def _get_baseline() -> dict[str, str]:
+    global _baseline
+    with _baseline_lock:
+        if _baseline is None:
+            _baseline = load_baseline()
+        return _baseline
+
+
+def submission_text(final_code: SubmittedCode) -> str:
+    """The code the model reviews, in the `// --- path ---` format.
+
+    From a file mapping, only the files that differ from RQ v1.0 (all of
+    them if none do); a legacy blob is passed through unchanged.
+    """
+    if isinstance(final_code, str):
+        return final_code
+    baseline = _get_baseline()
+    edited = {path: content for path, content in final_code.items() if baseline.get(path) != content}
+    edited = edited or final_code
+    text = "\n\n".join(f"// --- {path} ---\n{content}" for path, content in sorted(edited.items()))
+    unchanged = len(final_code) - len(edited)
+    if unchanged:
+        text += f"\n\n({unchanged} other submitted files are unchanged from RQ v1.0 and not shown.)"
+    return text
+
+
 # ── Public entry point ────────────────────────────────────────────────────
 
-async def analyze_final_code(final_code: str) -> Optional[CodeSemanticEval]:
+async def analyze_final_code(final_code: SubmittedCode) -> Optional[CodeSemanticEval]:
     """
     Evaluate the submitted code via Gemini for code quality and P3 detection.
 
     Returns CodeSemanticEval with B1/B2/B3 scores, P3 critical miss flag,
     and code feedback. Returns None if the call fails.
     """
-    client = _get_client()
-    if client is None:
-        logger.warning("CodeAnalysis skipped — GEMINI_API_KEY not set")
+    code = submission_text(final_code) if final_code else ""
+    if not code.strip():
         return None
 
-    if not final_code or not final_code.strip():
-        return None
+    prompt = f"Here is the developer's submitted code:\n\n{code}"
+
+    cache_key = eval_key("code", _CODE_EVAL_SYSTEM_PROMPT, prompt)
+    cached = await cache_get(cache_key, CodeSemanticEval.model_validate)
+    if cached is not None:
+        return cached
 
-    prompt = f"Here is the developer's submitted code:\n\n{final_code}"
+    client = get_client()
+    if client is None:
+        logger.warning("CodeAnalysis skipped — GEMINI_API_KEY not set")
+        return None
 
     try:
         response = await generate_with_fallback(
@@ -172,14 +213,9 @@ async def analyze_final_code(final_code: str) -> Optional[CodeSemanticEval]:
             logger.warning("CodeAnalysis: could not parse JSON from response")
             return None
 
-        return CodeSemanticEval(
-            b1_clarity=_clamp(data.get("b1_clarity", 4), 0, 8),
-            b2_correctness=_clamp(data.get("b2_correctness", 3.5), 0, 7),
-            b3_efficiency_code=_clamp(data.get("b3_efficiency_code", 2.5), 0, 5),
-            p3_critical_miss=bool(data.get("p3_critical_miss", False)),
-            p3_details=str(data.get("p3_details", "")).strip(),
-            code_feedback=str(data.get("code_feedback", "")).strip(),
-        )
+        result = code_eval_from_data(data)
+        await cache_put(cache_key, result.model_dump())
+        return result
 
     except Exception as exc:
         logger.warning("CodeAnalysis failed — falling back to defaults: %s", exc)
@@ -24,13 +24,10 @@ from models.score import (
     RubricBreakdown, SubCriteriaDetail, PenaltyDetail,
 )
 from models.session import Session
-from scoring.vocabulary import (
-    _is_grounded, _has_tradeoff_language, _has_edge_case_language, _word_overlap,
-)
-from scoring.metrics import (
-    compute_headline_metrics,
-    _user_prompts, _ai_responses, _events_of, _session_start_ms,
-)
+from scoring.vocabulary import _is_grounded
+from scoring.live import session_timeline
+from scoring.metrics import compute_headline_metrics
+from scoring.timeline import SessionTimeline
 
 
 def _clamp(value: float, lo: float, hi: float) -> float:
@@ -52,17 +49,18 @@ def _compute_test_accuracy(test_results) -> int:
 
 # ---------- Category A: Problem Solving (0-12) ----------
 
-def _score_problem_solving(session: Session, conv_eval=None) -> dict:
+def _score_problem_solving(session: Session, conv_eval=None,
+                           timeline: Optional[SessionTimeline] = None) -> dict:
     """
     A1: Understanding & Restatement (0-3) — semantic + metric floor
     A2: Decomposition / Plan (0-4) — semantic + metric floor
     A3: Algorithm/Approach Justification (0-3) — pure semantic
     A4: Edge Cases Before Coding (0-2) — blended 50/50
     """
-    prompts = _user_prompts(session)
-    prompt_events = _events_of(session, "prompt_sent")
-    file_open_events = _events_of(session, "file_open")
-    start_ms = _session_start_ms(session)
+    timeline = timeline or SessionTimeline(session)
+    prompts = timeline.prompts
+    prompt_ts = timeline.timestamps("prompt_sent")
+    start_ms = timeline.start_ms
 
     # ── A1 — Problem Understanding (0-3) ──
     a1_metric = 0.0
@@ -89,9 +87,9 @@ def _score_problem_solving(session: Session, conv_eval=None) -> dict:
     # ── A2 — Decomposition / Plan (0-4) ──
     a2_metric = 0.0
     a2_floor = 0.0
-    if prompt_events:
-        first_prompt_ts = prompt_events[0].ts
-        files_before = sum(1 for e in file_open_events if e.ts < first_prompt_ts)
+    if prompt_ts:
+        first_prompt_ts = prompt_ts[0]
+        files_before = timeline.count_before("file_open", first_prompt_ts)
         minutes_to_first = (first_prompt_ts - start_ms) / 60_000
 
         if files_before >= 3:
@@ -129,7 +127,7 @@ def _score_problem_solving(session: Session, conv_eval=None) -> dict:
             a3 = 0.0
 
     # ── A4 — Edge Cases (0-2) — blended 50/50 ──
-    edge_count = sum(1 for p in prompts if _has_edge_case_language(p))
+    edge_count = timeline.prompts_with("edge_case")
     if edge_count >= 4:
         a4_metric = 1.5
     elif edge_count >= 2:
@@ -149,17 +147,18 @@ def _score_problem_solving(session: Session, conv_eval=None) -> dict:
 
 # ---------- Category B: Code Quality (0-13) ----------
 
-def _score_code_quality(session: Session, conv_eval=None, code_eval=None, test_results=None) -> dict:
+def _score_code_quality(session: Session, conv_eval=None, code_eval=None, test_results=None,
+                        timeline: Optional[SessionTimeline] = None) -> dict:
     """
     B1: Clarity/Readability (0-5) — pure semantic (code analysis)
     B2: Correctness — REMOVED (now handled by T: Test Accuracy), always 0
     B3: Efficiency (0-4) — blended conv+code semantic
     B4: AI Code Ownership (0-4) — blended metric+semantic
     """
-    prompts = _user_prompts(session)
-    responses = _ai_responses(session)
-    prompt_events = _events_of(session, "prompt_sent")
-    edit_events = _events_of(session, "file_edit")
+    timeline = timeline or SessionTimeline(session)
+    prompts = timeline.prompts
+    responses = timeline.responses
+    n_prompt_events = timeline.count("prompt_sent")
 
     # ── B1 — Clarity (0-5) — pure semantic code analysis ──
     if code_eval is not None:
@@ -185,15 +184,8 @@ def _score_code_quality(session: Session, conv_eval=None, code_eval=None, test_r
 
     # ── B4 — AI Code Ownership (0-4) — blended metric + semantic ──
     b4_metric = 0.0
-    if prompt_events:
-        mod_count = 0
-        for i, p_event in enumerate(prompt_events):
-            window_start = p_event.ts
-            window_end = prompt_events[i + 1].ts if i + 1 < len(prompt_events) else float("inf")
-            if any(window_start < e.ts < window_end for e in edit_events):
-                mod_count += 1
-
-        mod_rate = mod_count / len(prompt_events)
+    if n_prompt_events:
+        mod_rate = timeline.prompt_windows_with("file_edit") / n_prompt_events
         if mod_rate >= 0.75:
             b4_metric = 2.5
         elif mod_rate >= 0.5:
@@ -202,29 +194,15 @@ def _score_code_quality(session: Session, conv_eval=None, code_eval=None, test_r
             b4_metric = 0.5
 
         # ai_apply_without_edit_rate bonus
-        ai_apply_events = _events_of(session, "ai_apply")
-        if ai_apply_events:
-            apply_no_edit = 0
-            for ae in ai_apply_events:
-                has_edit_after = any(
-                    e.ts > ae.ts and e.ts < ae.ts + 30_000
-                    for e in edit_events
-                )
-                if not has_edit_after:
-                    apply_no_edit += 1
-            apply_no_edit_rate = apply_no_edit / len(ai_apply_events)
+        n_applies = timeline.count("ai_apply")
+        if n_applies:
+            apply_no_edit_rate = timeline.applies_without_edit() / n_applies
             if apply_no_edit_rate < 0.3:
                 b4_metric += 0.5
 
         # Evidence-grounded follow-ups as ownership signal
         if len(prompts) >= 2 and responses:
-            followups = prompts[1:]
-            preceding = responses[:len(followups)]
-            evidence_count = sum(
-                1 for p, r in zip(followups, preceding)
-                if _word_overlap(p, r) > 0.15
-            )
-            evidence_frac = evidence_count / len(followups)
+            evidence_frac = timeline.echoing_followups() / (len(prompts) - 1)
             if evidence_frac >= 0.5:
                 b4_metric += 1.0
             elif evidence_frac >= 0.25:
@@ -247,19 +225,18 @@ def _score_code_quality(session: Session, conv_eval=None, code_eval=None, test_r
 
 # ---------- Category C: Verification (0-12) ----------
 
-def _score_verification(session: Session, conv_eval=None) -> dict:
+def _score_verification(session: Session, conv_eval=None,
+                        timeline: Optional[SessionTimeline] = None) -> dict:
     """
     C1: Execution Frequency (0-4) — pure metric
     C2: Test Coverage (0-4) — semantic + metric floor
     C3: AI Output Validation (0-2) — blended 50/50
     C4: Debug Discipline (0-2) — pure metric
     """
-    test_events = _events_of(session, "test_run")
-    prompt_events = _events_of(session, "prompt_sent")
-    edit_events = _events_of(session, "file_edit")
-    ai_apply_events = _events_of(session, "ai_apply")
-
-    n_tests = len(test_events)
+    timeline = timeline or SessionTimeline(session)
+    n_tests = timeline.count("test_run")
+    n_prompt_events = timeline.count("prompt_sent")
+    n_applies = timeline.count("ai_apply")
 
     # ── C1 — Execution Frequency (0-4) — pure metric ──
     if n_tests >= 4:
@@ -282,30 +259,16 @@ def _score_verification(session: Session, conv_eval=None) -> dict:
 
     # ── C3 — AI Output Validation (0-2) — blended 50/50 ──
     c3_metric = 0.0
-    if prompt_events and test_events:
-        tests_after_ai = 0
-        for i, p_event in enumerate(prompt_events):
-            window_start = p_event.ts
-            window_end = prompt_events[i + 1].ts if i + 1 < len(prompt_events) else float("inf")
-            if any(window_start < t.ts < window_end for t in test_events):
-                tests_after_ai += 1
-        rate = tests_after_ai / len(prompt_events) if prompt_events else 0
+    if n_prompt_events and n_tests:
+        rate = timeline.prompt_windows_with("test_run") / n_prompt_events
         if rate >= 0.5:
             c3_metric = 1.0
         elif rate >= 0.25:
             c3_metric = 0.5
 
     # ai_apply_without_edit_rate bonus for C3
-    if ai_apply_events and edit_events:
-        apply_no_edit = 0
-        for ae in ai_apply_events:
-            has_edit_after = any(
-                e.ts > ae.ts and e.ts < ae.ts + 30_000
-                for e in edit_events
-            )
-            if not has_edit_after:
-                apply_no_edit += 1
-        if len(ai_apply_events) > 0 and (apply_no_edit / len(ai_apply_events)) < 0.3:
+    if n_applies and timeline.count("file_edit"):
+        if timeline.applies_without_edit() / n_applies < 0.3:
             c3_metric += 0.5
 
     if conv_eval is not None:
@@ -314,19 +277,10 @@ def _score_verification(session: Session, conv_eval=None) -> dict:
         c3 = _clamp(c3_metric, 0, 2)
 
     # ── C4 — Debug Discipline (0-2) — pure metric ──
-    all_events = sorted(session.events, key=lambda e: e.ts)
+    # Only the first test run matters: anything after a later run is also after it
     c4 = 0.0
-    for i, ev in enumerate(all_events):
-        if ev.event == "test_run":
-            subsequent = all_events[i + 1:]
-            has_edit = any(e.event == "file_edit" for e in subsequent)
-            has_retest = any(e.event == "test_run" for e in subsequent)
-            if has_edit and has_retest:
-                c4 = 2.0
-                break
-            elif has_edit:
-                c4 = 1.0
-                break
+    if timeline.after_first("test_run", "file_edit"):
+        c4 = 2.0 if timeline.after_first("test_run", "test_run") else 1.0
 
     return {
         "c1": round(c1, 1),
@@ -338,14 +292,16 @@ def _score_verification(session: Session, conv_eval=None) -> dict:
 
 # ---------- Category D: Communication (0-13) ----------
 
-def _score_communication(session: Session, conv_eval=None) -> dict:
+def _score_communication(session: Session, conv_eval=None,
+                         timeline: Optional[SessionTimeline] = None) -> dict:
     """
     D1: Continuous Narration (0-4) — semantic + metric floor
     D2: Tradeoffs and Decisions (0-4) — pure semantic
     D3: AI Collaboration Balance (0-3) — blended 40/60
     D4: Status Summaries (0-2) — pure semantic
     """
-    prompts = _user_prompts(session)
+    timeline = timeline or SessionTimeline(session)
+    prompts = timeline.prompts
     if not prompts:
         return {"d1": 0.0, "d2": 0.0, "d3": 0.0, "d4": 0.0}
 
@@ -377,7 +333,7 @@ def _score_communication(session: Session, conv_eval=None) -> dict:
     if conv_eval is not None:
         d2 = _clamp(conv_eval.d2_tradeoffs * (4 / 7), 0, 4)
     else:
-        tradeoff_count = sum(1 for p in prompts if _has_tradeoff_language(p))
+        tradeoff_count = timeline.prompts_with("tradeoff")
         if tradeoff_count >= 3:
             d2 = 1.5
         elif tradeoff_count >= 2:
@@ -389,7 +345,7 @@ def _score_communication(session: Session, conv_eval=None) -> dict:
 
     # ── D3 — AI Collaboration Balance (0-3) — blended 40/60 ──
     d3_metric = 0.0
-    grounded_count = sum(1 for p in prompts if _is_grounded(p))
+    grounded_count = timeline.prompts_with("rq")
     grounded_frac = grounded_count / n
     if grounded_frac >= 0.6:
         d3_metric += 1.0
@@ -397,11 +353,7 @@ def _score_communication(session: Session, conv_eval=None) -> dict:
         d3_metric += 0.5
 
     if n >= 2:
-        similar_pairs = sum(
-            1 for a, b in zip(prompts, prompts[1:])
-            if _word_overlap(a, b) > 0.6
-        )
-        passive_rate = similar_pairs / (n - 1)
+        passive_rate = timeline.similar_prompt_pairs() / (n - 1)
         if passive_rate <= 0.1:
             d3_metric += 1.0
         elif passive_rate <= 0.3:
@@ -434,13 +386,14 @@ def _score_communication(session: Session, conv_eval=None) -> dict:
 # ---------- Penalties ----------
 
 def _compute_penalties(session: Session, metrics: HeadlineMetrics,
-                       conv_eval=None, code_eval=None, test_results=None) -> dict:
+                       conv_eval=None, code_eval=None, test_results=None,
+                       timeline: Optional[SessionTimeline] = None) -> dict:
     """
     P1: Over-reliance on AI (0, -3, -5, or -8) — metric + semantic modifier
     P2: No-run (-5 if zero test_run events) — pure metric
     P3: REMOVED — core test failures already penalized heavily via T (50 pts)
     """
-    test_events = _events_of(session, "test_run")
+    timeline = timeline or SessionTimeline(session)
 
     # ── P1 — Over-reliance on AI (scaled for 50-pt non-test portion) ──
     if metrics.blind_adoption_rate > 0.8:
@@ -459,8 +412,7 @@ def _compute_penalties(session: Session, metrics: HeadlineMetrics,
     # ── P2 — No-run ──
     # Only penalise if the user actually edited code but never ran tests.
     # Zero-effort sessions (no edits) are already punished by low T and B scores.
-    edit_events = _events_of(session, "file_edit")
-    p2 = -5 if (edit_events and not test_events) else 0
+    p2 = -5 if (timeline.count("file_edit") and not timeline.count("test_run")) else 0
 
     # ── P3 — Removed (redundant with T: test accuracy) ──
     p3 = 0
@@ -482,21 +434,14 @@ def _assign_badge(total: int) -> str:
 
 # ---------- Compute ai_apply_without_edit_rate ----------
 
-def _compute_ai_apply_without_edit_rate(session: Session) -> float:
+def _compute_ai_apply_without_edit_rate(session: Session,
+                                        timeline: Optional[SessionTimeline] = None) -> float:
     """Fraction of ai_apply events with no file_edit within 30 seconds."""
-    ai_apply_events = _events_of(session, "ai_apply")
-    edit_events = _events_of(session, "file_edit")
-    if not ai_apply_events:
+    timeline = timeline or SessionTimeline(session)
+    n_applies = timeline.count("ai_apply")
+    if not n_applies:
         return 0.0
-    no_edit_count = 0
-    for ae in ai_apply_events:
-        has_edit = any(
-            e.ts > ae.ts and e.ts < ae.ts + 30_000
-            for e in edit_events
-        )
-        if not has_edit:
-            no_edit_count += 1
-    return round(no_edit_count / len(ai_apply_events), 2)
+    return round(timeline.applies_without_edit() / n_applies, 2)
 
 
 # ---------- Public entry point ----------
@@ -523,10 +468,13 @@ def compute_score(
     # If conv_eval not provided but semantic_eval is, use it for legacy compat
     effective_conv_eval = conv_eval or semantic_eval
 
-    metrics = compute_headline_metrics(session)
+    # The live accumulators when in sync, else the log indexed once;
+    # every category below reads from it
+    timeline = session_timeline(session)
+    metrics = compute_headline_metrics(session, timeline)
 
     # Populate new headline metrics
-    metrics.ai_apply_without_edit_rate = _compute_ai_apply_without_edit_rate(session)
+    metrics.ai_apply_without_edit_rate = _compute_ai_apply_without_edit_rate(session, timeline)
     if test_results is not None:
         metrics.test_pass_rate = test_results.pass_rate
     else:
@@ -536,14 +484,16 @@ def compute_score(
     test_accuracy = _compute_test_accuracy(test_results)
 
     # Score each category with eval sources
-    a = _score_problem_solving(session, conv_eval=effective_conv_eval)
-    b = _score_code_quality(session, conv_eval=effective_conv_eval, code_eval=code_eval, test_results=test_results)
-    c = _score_verification(session, conv_eval=effective_conv_eval)
-    d = _score_communication(session, conv_eval=effective_conv_eval)
+    a = _score_problem_solving(session, conv_eval=effective_conv_eval, timeline=timeline)
+    b = _score_code_quality(session, conv_eval=effective_conv_eval, code_eval=code_eval,
+                            test_results=test_results, timeline=timeline)
+    c = _score_verification(session, conv_eval=effective_conv_eval, timeline=timeline)
+    d = _score_communication(session, conv_eval=effective_conv_eval, timeline=timeline)
     penalties = _compute_penalties(session, metrics,
                                   conv_eval=effective_conv_eval,
                                   code_eval=code_eval,
-                                  test_results=test_results)
+                                  test_results=test_results,
+                                  timeline=timeline)
 
     # Category totals (A:0-12, B:0-13, C:0-12, D:0-13)
     cat_a = round(a["a1"] + a["a2"] + a["a3"] + a["a4"], 1)
@@ -0,0 +1,234 @@
+"""
+Evaluation cache for the Gemini-backed scorers.
+
+evaluate_conversation, analyze_final_code and generate_insights are pure
+functions of the text they send (system prompt + transcript / final code /
+insights prompt), so a retried or replayed submission — e.g. after a cold
+start lost store.sessions — can reuse the earlier answer instead of paying
+for three model calls again. Results are keyed by a sha256 of that text
+and kept for SPONGE_EVAL_CACHE_TTL seconds.
+
+SPONGE_EVAL_CACHE selects the store:
+  memory  (default) in-process LRU of SPONGE_EVAL_CACHE_SIZE entries
+  disk    one JSON file per entry under SPONGE_EVAL_CACHE_DIR, shared by
+          every worker on the machine; oldest files pruned past the size
+  redis   keys with an expiry at SPONGE_EVAL_CACHE_URL, shared by every
+          instance; eviction is left to the TTL and the server's
+          maxmemory policy
+  off     no caching
+
+Only successful evaluations are stored. A cache that fails to read or
+write, or an entry that no longer parses, logs and behaves as a miss —
+it never fails a submission. Disk and Redis I/O runs on a worker thread,
+off the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+EVAL_CACHE_MODE = os.environ.get("SPONGE_EVAL_CACHE", "memory")
+EVAL_CACHE_TTL_S = int(os.environ.get("SPONGE_EVAL_CACHE_TTL", "86400"))
+EVAL_CACHE_SIZE = int(os.environ.get("SPONGE_EVAL_CACHE_SIZE", "1024"))
+EVAL_CACHE_DIR = os.environ.get(
+    "SPONGE_EVAL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sponge-eval-cache"),
+)
+EVAL_CACHE_URL = os.environ.get("SPONGE_EVAL_CACHE_URL", "redis://localhost:6379/0")
+EVAL_CACHE_VERSION = "1"     # bump when a cached result's shape changes
+
+REDIS_KEY_PREFIX = "sponge:eval:"
+REDIS_TIMEOUT_S = 0.5
+
+T = TypeVar("T")
+
+
+def eval_key(kind: str, system_prompt: str, prompt: str) -> str:
+    """Content hash of everything that determines an evaluation's result."""
+    h = hashlib.sha256()
+    for part in (EVAL_CACHE_VERSION, kind, system_prompt, prompt):
+        h.update(part.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return f"{kind}:{h.hexdigest()}"
+
+
+# ---------- Backends ----------
+
+class MemoryEvalCache:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, size: int = EVAL_CACHE_SIZE, ttl_s: int = EVAL_CACHE_TTL_S):
+        self.size = size
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class DiskEvalCache:
+    """One JSON file per entry; survives restarts and is shared across workers."""
+
+    def __init__(self, root: str = EVAL_CACHE_DIR, size: int = EVAL_CACHE_SIZE,
+                 ttl_s: int = EVAL_CACHE_TTL_S):
+        self.root = root
+        self.size = size
+        self.ttl_s = ttl_s
+        self._writes = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key.replace(":", "-") + ".json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry["expires"] <= time.time():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"expires": time.time() + self.ttl_s, "value": value}, f)
+        os.replace(tmp, path)   # atomic: readers never see a partial entry
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.size)]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class RedisEvalCache:
+    """Keys with an expiry in any Redis-compatible server."""
+
+    def __init__(self, url: str = EVAL_CACHE_URL, ttl_s: int = EVAL_CACHE_TTL_S, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(
+                url, socket_timeout=REDIS_TIMEOUT_S, socket_connect_timeout=REDIS_TIMEOUT_S,
+            )
+        self.client = client
+        self.ttl_s = ttl_s
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(REDIS_KEY_PREFIX + key)
+        return None if raw is None else json.loads(raw)
+
+    def put(self, key: str, value: Any) -> None:
+        self.client.set(REDIS_KEY_PREFIX + key, json.dumps(value), ex=self.ttl_s)
+
+
+# ---------- Public API ----------
+
+_cache = None
+_cache_loaded = False
+
+
+def get_eval_cache():
+    """Lazily build the configured cache (None when disabled or unavailable)."""
+    global _cache, _cache_loaded
+    if _cache_loaded:
+        return _cache
+    _cache_loaded = True
+    try:
+        if EVAL_CACHE_MODE == "memory":
+            _cache = MemoryEvalCache()
+        elif EVAL_CACHE_MODE == "disk":
+            _cache = DiskEvalCache()
+        elif EVAL_CACHE_MODE == "redis":
+            _cache = RedisEvalCache()
+        elif EVAL_CACHE_MODE != "off":
+            logger.warning("Unknown SPONGE_EVAL_CACHE=%r — evaluation cache disabled",
+                           EVAL_CACHE_MODE)
+    except Exception:
+        logger.exception("Could not open the %s evaluation cache — disabled", EVAL_CACHE_MODE)
+        _cache = None
+    return _cache
+
+
+async def _run(cache, method: Callable, *args):
+    """Call a cache method; blocking stores run on a worker thread."""
+    if isinstance(cache, MemoryEvalCache):
+        return method(*args)
+    return await asyncio.to_thread(method, *args)
+
+
+async def cache_get(key: str, parse: Callable[[Any], T]) -> Optional[T]:
+    """parse(cached value) for key, or None on a miss, a cache error or an
+    entry parse rejects (e.g. a pydantic ValidationError)."""
+    cache = get_eval_cache()
+    if cache is None:
+        return None
+    try:
+        value = await _run(cache, cache.get, key)
+    except Exception as exc:
+        logger.warning("Evaluation cache read failed: %s", exc)
+        return None
+    if value is None:
+        return None
+    try:
+        result = parse(value)
+    except Exception as exc:
+        logger.warning("Evaluation cache entry %s unusable, treated as a miss: %s", key[:24], exc)
+        return None
+    logger.info("Evaluation cache hit %s", key[:24])
+    return result
+
+
+async def cache_put(key: str, value: Any) -> None:
+    """Store a JSON-serialisable value; errors are logged and ignored."""
+    cache = get_eval_cache()
+    if cache is None:
+        return
+    try:
+        await _run(cache, cache.put, key, value)
+    except Exception as exc:
+        logger.warning("Evaluation cache write failed: %s", exc)
@@ -0,0 +1,246 @@
+"""
+Pre-warmed pytest fork server for the sandbox test runner.
+
+Started once by scoring/test_runner.py with the sandbox template on its
+path. It imports pytest, redis, fakeredis and the baseline rq modules,
+applies the template conftest patches, then forks one child per request so
+each run skips interpreter startup and those imports.
+
+Protocol (JSON lines over a Unix socket, one connection per run):
+    client → {"run_dir": str, "args": [pytest args], "overlaid": [paths]}
+    child  → {"pid": int}
+    child  → {"returncode": int}      (or {"error": str})
+
+"overlaid" lists the files that differ from the template, relative to the
+sandbox root (e.g. "rq-v1.0/rq/queue.py"). The child drops those modules —
+plus everything that imports them — from sys.modules, so the run imports
+the user's code from its own sandbox view.
+
+Usage: python fork_server.py <socket_path> <template_dir>
+"""
+
+import ast
+import json
+import os
+import runpy
+import signal
+import socket
+import sys
+from typing import Optional
+
+SANDBOX_RQ_DIRNAME = "rq-v1.0"
+
+# Modules pytest imports from the run directory itself.
+RUN_DIR_MODULES = ("conftest", "test_submission", "test_hidden")
+
+# How often the accept loop wakes up to check the parent is still alive.
+PARENT_CHECK_INTERVAL_S = 1.0
+
+
+# ---------- Import graph ----------
+
+def _module_name(rel_path: str) -> Optional[str]:
+    """Map "rq/cli/__init__.py" → "rq.cli", "rq/queue.py" → "rq.queue"."""
+    if not rel_path.endswith(".py"):
+        return None
+    parts = rel_path[:-3].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts) or None
+
+
+def _build_dependents(rq_root: str) -> dict[str, set[str]]:
+    """Reverse import graph over the template sources: module → importers.
+
+    Imports anywhere in a file count (including function-level ones), which
+    over-approximates but never leaves a stale reference behind.
+    """
+    modules = {}
+    for dirpath, _, filenames in os.walk(rq_root):
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            mod = _module_name(os.path.relpath(full, rq_root))
+            if mod:
+                modules[mod] = full
+
+    dependents: dict[str, set[str]] = {}
+    for mod, path in modules.items():
+        is_package = path.endswith("__init__.py")
+        package = mod if is_package else mod.rpartition(".")[0]
+        try:
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError):
+            continue
+
+        for node in ast.walk(tree):
+            targets = []
+            if isinstance(node, ast.Import):
+                targets = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    anchor = package.split(".")
+                    anchor = anchor[:len(anchor) - (node.level - 1)]
+                    base = ".".join(anchor + ([base] if base else []))
+                targets = [base] + [f"{base}.{alias.name}" for alias in node.names]
+            for target in targets:
+                if target in modules and target != mod:
+                    dependents.setdefault(target, set()).add(mod)
+
+    # A package keeps attributes pointing at its imported submodules
+    for mod in modules:
+        parent = mod.rpartition(".")[0]
+        if parent in modules:
+            dependents.setdefault(mod, set()).add(parent)
+
+    return dependents
+
+
+def _stale_modules(overlaid: list[str], dependents: dict[str, set[str]]) -> set[str]:
+    """Modules that must be re-imported for a run with these overlaid files."""
+    prefix = SANDBOX_RQ_DIRNAME + os.sep
+    pending = []
+    for path in overlaid:
+        if path.startswith(prefix):
+            mod = _module_name(path[len(prefix):])
+            if mod:
+                pending.append(mod)
+
+    stale = set(RUN_DIR_MODULES)
+    while pending:
+        mod = pending.pop()
+        if mod in stale:
+            continue
+        stale.add(mod)
+        pending.extend(dependents.get(mod, ()))
+    return stale
+
+
+# ---------- Warm-up ----------
+
+def _warm_up(template: str) -> None:
+    """Import everything a run needs that doesn't depend on user code."""
+    import pytest  # noqa: F401
+    from _pytest.config import default_plugins
+    import importlib
+
+    for name in default_plugins:
+        try:
+            importlib.import_module(f"_pytest.{name}")
+        except ImportError:
+            pass
+
+    # Installs the virtual clock, applies the redis → fakeredis and
+    # Worker → SimpleWorker patches and imports the baseline rq package.
+    sys.path.insert(0, template)
+    runpy.run_path(os.path.join(template, "conftest.py"))
+    import result_stream  # noqa: F401  (the -p plugin every run loads)
+    sys.path.remove(template)
+    import tests  # noqa: F401
+    import tests.fixtures  # noqa: F401
+
+
+# ---------- Per-run child ----------
+
+def _send(conn: socket.socket, message: dict) -> None:
+    conn.sendall((json.dumps(message) + "\n").encode())
+
+
+def _run_child(conn: socket.socket, request: dict, template_rq: str,
+               dependents: dict[str, set[str]]) -> None:
+    """Body of a forked child: isolate the user's modules and run pytest."""
+    run_dir = request["run_dir"]
+    run_rq = os.path.join(run_dir, SANDBOX_RQ_DIRNAME)
+
+    # Output goes to a file in the run directory for diagnostics
+    out_fd = os.open(os.path.join(run_dir, "pytest-output.txt"),
+                     os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(out_fd, 1)
+    os.dup2(out_fd, 2)
+    os.close(out_fd)
+
+    for mod in _stale_modules(request.get("overlaid", []), dependents):
+        sys.modules.pop(mod, None)
+
+    template_paths = {template_rq, os.path.join(template_rq, "tests")}
+    sys.path[:] = [p for p in sys.path if p not in template_paths]
+    sys.path[:0] = [run_rq, os.path.join(run_rq, "tests")]
+    os.environ["RQ_CODEBASE_PATH"] = run_rq
+    os.chdir(run_dir)
+
+    import pytest
+    returncode = pytest.main(request["args"])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send(conn, {"returncode": int(returncode)})
+
+
+def _handle(conn: socket.socket, listener: socket.socket, template_rq: str,
+            dependents: dict[str, set[str]]) -> None:
+    with conn.makefile("r") as reader:
+        line = reader.readline()
+    if not line:
+        conn.close()
+        return
+
+    pid = os.fork()
+    if pid:
+        conn.close()
+        return
+
+    # Child
+    status = 0
+    try:
+        listener.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        _send(conn, {"pid": os.getpid()})
+        _run_child(conn, json.loads(line), template_rq, dependents)
+    except BaseException as exc:
+        status = 1
+        try:
+            _send(conn, {"error": f"{type(exc).__name__}: {exc}"})
+        except OSError:
+            pass
+    finally:
+        os._exit(status)
+
+
+def main(socket_path: str, template: str) -> None:
+    template_rq = os.path.join(template, SANDBOX_RQ_DIRNAME)
+    _warm_up(template)
+    dependents = _build_dependents(template_rq)
+
+    # Children are never waited on — let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    listener.settimeout(PARENT_CHECK_INTERVAL_S)
+
+    parent = os.getppid()
+    print("ready", flush=True)
+
+    try:
+        while os.getppid() == parent:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            _handle(conn, listener, template_rq, dependents)
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    # Running as a script puts scoring/ first on sys.path, where scoring/tests
+    # would shadow the rq "tests" package the suites import.
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,195 @@
+"""
+Fused single-call evaluation for /submit (opt-in: SPONGE_FUSED_EVAL=1).
+
+The default pipeline makes two rounds of Gemini calls: conversation and code
+evaluation in parallel, then generate_insights once the score is known. In
+fused mode one call returns all three:
+
+  conversation         the 12 sub-criteria + interpretation (semantic.py rubric)
+  code                 B1/B2/B3 + P3 + feedback (code_analysis.py rubric)
+  insight_candidates   observations tagged positive/negative, tiered locally
+                       by insights.derive_insights() from the computed score
+
+Each part is validated with the same clamping as the separate evaluators
+and is None when missing or malformed, so the engine's metric fallbacks
+apply per part exactly as before.
+"""
+
+import logging
+import os
+from typing import Optional
+
+from google.genai import types
+
+from gemini.fallback import generate_with_fallback
+from gemini.service import get_client
+from scoring.code_analysis import (
+    CodeSemanticEval, _CODE_EVAL_SYSTEM_PROMPT, code_eval_from_data, submission_text,
+)
+from scoring.eval_cache import cache_get, cache_put, eval_key
+from scoring.semantic import (
+    ConversationSemanticEval, _EVAL_SYSTEM_PROMPT, _format_transcript, _parse_response,
+    conversation_eval_from_data,
+)
+from scoring.test_runner import SubmittedCode
+
+logger = logging.getLogger(__name__)
+
+FUSED_EVAL = os.environ.get("SPONGE_FUSED_EVAL", "0") == "1"
+
+MAX_PROMPTS_IN_CANDIDATES = 15   # same cap as the insights prompt
+
+
+def _rubric_section(system_prompt: str) -> str:
+    """The rubric part of an evaluator's system prompt (after its JSON schema)."""
+    return system_prompt.split("── SCORING RUBRIC ──", 1)[1].strip()
+
+
+_FUSED_SYSTEM_PROMPT = f"""
+You are an expert evaluator reviewing a developer's 60-minute coding exercise: implementing delayed job execution (enqueue_in / enqueue_at) in the RQ (Redis Queue) Python library with an AI assistant.
+
+You will receive the numbered conversation transcript, the developer's prompts indexed from 0, and their final code. Evaluate the conversation, evaluate the code, and list insight candidates — all in ONE response.
+
+Return ONLY valid JSON — no markdown fences, no explanation:
+{{
+  "conversation": {{
+    "a1_understanding": <float>, "a2_decomposition": <float>, "a3_justification": <float>,
+    "a4_edge_cases": <float>, "b3_efficiency_discussion": <float>, "b4_ownership_dialogue": <float>,
+    "c2_test_mentions": <float>, "c3_ai_questioning": <float>, "d1_narration": <float>,
+    "d2_tradeoffs": <float>, "d3_ai_balance": <float>, "d4_status_updates": <float>,
+    "interpretation": "<string>"
+  }},
+  "code": {{
+    "b1_clarity": <float 0-8>, "b2_correctness": <float 0-7>, "b3_efficiency_code": <float 0-5>,
+    "p3_critical_miss": <bool>, "p3_details": "<string>", "code_feedback": "<string>"
+  }},
+  "insight_candidates": [
+    {{
+      "category": "<Problem Solving | Code Quality | Verification | Communication>",
+      "polarity": "<positive | negative>",
+      "title": "<short 3-8 word title>",
+      "description": "<1-2 sentence specific observation + actionable suggestion>",
+      "prompt_indices": [0, 3]
+    }}
+  ]
+}}
+
+── CONVERSATION RUBRIC ──
+
+{_rubric_section(_EVAL_SYSTEM_PROMPT)}
+
+── CODE RUBRIC ──
+
+{_rubric_section(_CODE_EVAL_SYSTEM_PROMPT)}
+
+── INSIGHT CANDIDATES ──
+List 6-8 candidates, at least one positive and one negative per category where the session gives evidence. The final score isn't known yet: the scoring engine keeps or drops each candidate and decides its tier from the category's score, so describe what the developer actually did rather than judging the tier.
+- "positive": something done well; "negative": something missing or done poorly, with a concrete suggestion
+- "prompt_indices": 1-3 0-based indices of the relevant developer prompts, or [] for general behaviour
+- Reference actual prompt content when possible (quote 3-5 words)
+- For zero-effort sessions (no prompts, no edits), give negative candidates noting the session was incomplete
+""".strip()
+
+
+class FusedEval:
+    """Result of the single fused call; any part may be None/empty."""
+
+    __slots__ = ("conversation", "code", "insight_candidates")
+
+    def __init__(self, conversation: Optional[ConversationSemanticEval],
+                 code: Optional[CodeSemanticEval], insight_candidates: list[dict]):
+        self.conversation = conversation
+        self.code = code
+        self.insight_candidates = insight_candidates
+
+    def to_json(self) -> dict:
+        return {
+            "conversation": self.conversation.model_dump() if self.conversation else None,
+            "code": self.code.model_dump() if self.code else None,
+            "insight_candidates": self.insight_candidates,
+        }
+
+    @classmethod
+    def from_data(cls, data: dict, has_user_turns: bool, has_code: bool) -> "FusedEval":
+        def part(key, convert, wanted):
+            raw = data.get(key)
+            if not wanted or not isinstance(raw, dict):
+                return None
+            try:
+                return convert(raw)
+            except Exception as exc:
+                logger.warning("FusedEval: invalid %s section: %s", key, exc)
+                return None
+
+        candidates = data.get("insight_candidates")
+        return cls(
+            conversation=part("conversation", conversation_eval_from_data, has_user_turns),
+            code=part("code", code_eval_from_data, has_code),
+            insight_candidates=[c for c in candidates if isinstance(c, dict)]
+            if isinstance(candidates, list) else [],
+        )
+
+
+def _build_prompt(conversation_history: list[dict], final_code: str) -> str:
+    user_prompts = [t.get("content", "") for t in conversation_history if t.get("role") == "user"]
+    prompt_lines = [
+        f"  [{i}] {p[:300] + '...' if len(p) > 300 else p}"
+        for i, p in enumerate(user_prompts[:MAX_PROMPTS_IN_CANDIDATES])
+    ]
+    return (
+        "CONVERSATION TRANSCRIPT:\n\n"
+        f"{_format_transcript(conversation_history) or '(no conversation)'}\n\n"
+        "DEVELOPER PROMPTS:\n"
+        f"{chr(10).join(prompt_lines) or '  (none — developer did not use the AI assistant)'}\n\n"
+        "SUBMITTED CODE:\n\n"
+        f"{final_code or '(no code)'}"
+    )
+
+
+async def evaluate_fused(conversation_history: list[dict],
+                         final_code: Optional[SubmittedCode]) -> Optional[FusedEval]:
+    """
+    Conversation eval, code eval and insight candidates in one Gemini call.
+
+    Returns None if the call fails or its response can't be parsed.
+    """
+    has_user_turns = any(t.get("role") == "user" for t in conversation_history)
+    code = submission_text(final_code) if final_code else ""
+    has_code = bool(code.strip())
+    prompt = _build_prompt(conversation_history, code)
+
+    cache_key = eval_key("fused", _FUSED_SYSTEM_PROMPT, prompt)
+    cached = await cache_get(cache_key, lambda data: FusedEval.from_data(data, has_user_turns, has_code))
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if client is None:
+        logger.warning("FusedEval skipped — GEMINI_API_KEY not set")
+        return None
+
+    try:
+        response = await generate_with_fallback(
+            client,
+            contents=[{"role": "user", "parts": [{"text": prompt}]}],
+            config=types.GenerateContentConfig(
+                system_instruction=_FUSED_SYSTEM_PROMPT,
+                max_output_tokens=2560,   # conversation 1024 + code 512 + insights 1024
+                temperature=0.2,
+                response_mime_type="application/json",
+            ),
+        )
+
+        data = _parse_response(response.text)
+        if not isinstance(data, dict):
+            logger.warning("FusedEval: could not parse JSON from response")
+            return None
+
+        result = FusedEval.from_data(data, has_user_turns, has_code)
+        if result.conversation or result.code:
+            await cache_put(cache_key, result.to_json())
+        return result
+
+    except Exception as exc:
+        logger.warning("FusedEval failed — falling back to metric scoring: %s", exc)
+        return None
@@ -22,36 +22,21 @@ Output:
 
 import json
 import logging
-import os
 from typing import Optional
 
-from google import genai
 from google.genai import types
 
 from gemini.config import GEMINI_MODEL_CHAIN
 from gemini.fallback import generate_with_fallback
+from gemini.service import get_client
 from models.score import (
     Insight, HeadlineMetrics, RubricBreakdown,
     SubCriteriaDetail, PenaltyDetail, TestSuiteResult,
 )
+from scoring.eval_cache import cache_get, cache_put, eval_key
 
 logger = logging.getLogger(__name__)
 
-_client: Optional[genai.Client] = None
-_configured_key: Optional[str] = None
-
-
-def _get_client() -> Optional[genai.Client]:
-    global _client, _configured_key
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    if api_key != _configured_key:
-        _client = genai.Client(api_key=api_key)
-        _configured_key = api_key
-    return _client
-
-
 # ── System prompt for insight generation ─────────────────────────────────
 
 _INSIGHTS_SYSTEM_PROMPT = """
@@ -264,6 +249,70 @@ def _validate_insight(raw: dict, num_prompts: int = 0) -> Optional[Insight]:
         return None
 
 
+# ── Local tiering of fused-eval candidates ──────────────────────────────
+
+# Rubric field and max per category — the same thresholds the insights
+# prompt gives Gemini: strength ≥60% of max, weakness <30%.
+_CATEGORY_MAX = {
+    "Problem Solving": ("problem_solving", 12),
+    "Code Quality": ("code_quality", 13),
+    "Verification": ("verification", 12),
+    "Communication": ("communication", 13),
+}
+
+
+def _category_tier(category: str, rubric: Optional[RubricBreakdown]) -> Optional[str]:
+    if rubric is None:
+        return None
+    field, max_points = _CATEGORY_MAX[category]
+    share = getattr(rubric, field) / max_points
+    if share >= 0.6:
+        return "strength"
+    if share < 0.3:
+        return "weakness"
+    return "improvement"
+
+
+def derive_insights(
+    candidates: list[dict],
+    user_prompts: list[str],
+    total_score: int,
+    rubric: Optional[RubricBreakdown] = None,
+    metrics: Optional[HeadlineMetrics] = None,
+    penalties: Optional[PenaltyDetail] = None,
+    test_suite: Optional[TestSuiteResult] = None,
+) -> list[Insight]:
+    """
+    Turn fused-eval insight candidates into final insights using the computed score.
+
+    Each candidate is an observation with a "polarity" (positive/negative);
+    its tier comes from its category's rubric score rather than from the
+    model, so strengths are only kept for categories that earned them.
+    Falls back to metric-based insights like generate_insights does.
+    """
+    insights = []
+    for raw in candidates or []:
+        if not isinstance(raw, dict):
+            continue
+        insight = _validate_insight(raw, num_prompts=len(user_prompts))
+        if insight is None:
+            continue
+        positive = str(raw.get("polarity", "")).strip().lower() == "positive"
+        tier = _category_tier(insight.category, rubric)
+        if positive:
+            if tier not in (None, "strength"):
+                continue   # no praise for a category that scored low
+            insight.type = "strength"
+        else:
+            insight.type = "weakness" if tier == "weakness" else "improvement"
+        insights.append(insight)
+
+    if len(insights) < 2:
+        logger.warning("Insights: fewer than 2 usable fused candidates, using fallback")
+        return _fallback_insights(user_prompts, total_score, metrics, rubric, penalties, test_suite)
+    return insights[:6]
+
+
 # ── Fallback: metric-based insights (no Gemini) ─────────────────────────
 
 def _fallback_insights(
@@ -449,16 +498,21 @@ async def generate_insights(
     Falls back to metric-based insights if Gemini is unavailable or fails.
     Always returns 2-5 Insight objects.
     """
-    client = _get_client()
-    if client is None:
-        logger.warning("Insights generation skipped — GEMINI_API_KEY not set")
-        return _fallback_insights(user_prompts, total_score, metrics, rubric, penalties, test_suite)
-
     prompt = _build_insights_prompt(
         user_prompts, total_score, rubric, sub_criteria,
         metrics, penalties, test_suite,
     )
 
+    cache_key = eval_key("insights", _INSIGHTS_SYSTEM_PROMPT, prompt)
+    cached = await cache_get(cache_key, lambda items: [Insight.model_validate(item) for item in items])
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if client is None:
+        logger.warning("Insights generation skipped — GEMINI_API_KEY not set")
+        return _fallback_insights(user_prompts, total_score, metrics, rubric, penalties, test_suite)
+
     try:
         response = await generate_with_fallback(
             client,
@@ -490,7 +544,9 @@ async def generate_insights(
             logger.warning("Insights: Gemini returned fewer than 2 valid insights, using fallback")
             return _fallback_insights(user_prompts, total_score, metrics, rubric, penalties, test_suite)
 
-        return insights[:6]
+        insights = insights[:6]
+        await cache_put(cache_key, [insight.model_dump() for insight in insights])
+        return insights
 
     except Exception as exc:
         logger.warning("Insights generation failed — using fallback: %s", exc)
@@ -0,0 +1,222 @@
+"""
+Background submit jobs on RQ — the vendored rq-v1.0 library itself.
+
+POST /submit with "background": true enqueues score_job on the
+"sponge-submit" queue and returns its id at once. Progress is read back
+from the job (GET /submit/jobs/{id}, or its /events stream). The job
+itself stores the score on the session and records it on the
+leaderboard before it finishes, so nothing depends on a client polling.
+
+SPONGE_SUBMIT_QUEUE selects where jobs run:
+  local  (default) an in-process fakeredis queue drained by a worker
+         thread. The thread hands each job's scoring back to the API's
+         event loop, so it shares the sandbox scheduler and Gemini
+         service with everything else. For dev and tests.
+  redis  a real Redis at SPONGE_REDIS_URL. Jobs run on separate worker
+         processes (`python -m scoring.jobs` from backend/), so scoring
+         throughput scales with workers, independently of the API tier.
+
+A job carries a snapshot of the session and needs nothing else from the
+API process besides the session store (SPONGE_SESSION_STORE=redis with
+separate worker processes). It isn't bound by the HTTP deadline, so it waits for any
+stage that overran its budget (up to SPONGE_SUBMIT_JOB_LATE_S) and returns
+the full score.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from typing import Optional
+
+import store
+from models.score import Score
+from models.session import Session
+from ranking import get_leaderboard_index
+from scoring.paths import RQ_SOURCE
+from scoring.pipeline import score_session
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_QUEUE_MODE = os.environ.get("SPONGE_SUBMIT_QUEUE", "local")
+REDIS_URL = os.environ.get("SPONGE_REDIS_URL", "redis://localhost:6379/0")
+QUEUE_NAME = "sponge-submit"
+JOB_TIMEOUT_S = 900           # generous: includes waiting for late stages
+RESULT_TTL_S = 86400          # keep finished scores for a day
+FAILURE_TTL_S = 3600
+
+if RQ_SOURCE not in sys.path:
+    sys.path.append(RQ_SOURCE)   # the vendored rq package
+
+from rq import Queue, SimpleWorker, Worker           # noqa: E402
+from rq.exceptions import NoSuchJobError             # noqa: E402
+from rq.job import Job, JobStatus, get_current_job   # noqa: E402
+from rq.timeouts import BaseDeathPenalty             # noqa: E402
+
+
+def _job_id(session_id: str) -> str:
+    return f"submit-{session_id}"
+
+
+# ---------- Queue ----------
+
+_queue: Optional[Queue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> Queue:
+    """Lazily connect the submit queue for SUBMIT_QUEUE_MODE."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if SUBMIT_QUEUE_MODE == "redis":
+                import redis
+                connection = redis.Redis.from_url(REDIS_URL)
+            else:
+                import fakeredis
+                connection = fakeredis.FakeRedis()
+            _queue = Queue(QUEUE_NAME, connection=connection)
+        return _queue
+
+
+# ---------- Local worker ----------
+# RQ's worker uses SIGALRM for job timeouts, which only works on the main
+# thread; the local worker runs on a background thread without them.
+
+class _NoDeathPenalty(BaseDeathPenalty):
+
+    def setup_death_penalty(self):
+        pass
+
+    def cancel_death_penalty(self):
+        pass
+
+
+class _ThreadWorker(SimpleWorker):
+    death_penalty_class = _NoDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+
+_api_loop: Optional[asyncio.AbstractEventLoop] = None
+_draining = False
+_drain_lock = threading.Lock()
+
+
+def _kick_local_worker() -> None:
+    global _draining
+    with _drain_lock:
+        if _draining:
+            return
+        _draining = True
+    threading.Thread(target=_drain, name="sponge-submit-worker", daemon=True).start()
+
+
+def _drain() -> None:
+    global _draining
+    queue = get_queue()
+    while True:
+        try:
+            _ThreadWorker([queue], connection=queue.connection).work(burst=True)
+        except Exception:
+            logger.exception("Local submit worker crashed")
+        with _drain_lock:
+            if not len(queue):
+                _draining = False
+                return
+
+
+# ---------- Jobs ----------
+
+def score_job(session_json: str) -> str:
+    """RQ job: score a session snapshot and return the Score as JSON."""
+    session = Session.model_validate_json(session_json)
+    job = get_current_job()
+
+    def on_stage(stage: str) -> None:
+        if job is not None:
+            job.meta["stage"] = stage
+            job.save_meta()
+
+    scoring = score_session(session, on_stage=on_stage, wait_late=True)
+    loop = _api_loop
+    if loop is not None and loop.is_running():
+        # Local mode: score on the API loop, alongside every other request
+        score = asyncio.run_coroutine_threadsafe(scoring, loop).result()
+    else:
+        score = asyncio.run(scoring)
+    _save_score(session.session_id, score)
+    on_stage("done")
+    return score.model_dump_json()
+
+
+def _save_score(session_id: str, score: Score) -> None:
+    """Store the score on the session and record it on the leaderboard."""
+    session = store.sessions.get_or_create(session_id)
+    session.score = score
+    store.sessions.save(session, "score")
+    get_leaderboard_index().record(session)
+
+
+def enqueue_submission(session: Session) -> Job:
+    """Enqueue scoring for session, or return its job if one is already live.
+
+    Must be called from the API's event loop thread.
+    """
+    global _api_loop
+    queue = get_queue()
+    job_id = _job_id(session.session_id)
+    try:
+        job = Job.fetch(job_id, connection=queue.connection)
+        if job.get_status() != JobStatus.FAILED:
+            return job   # retried submit: same job
+        job.delete()
+    except NoSuchJobError:
+        pass
+
+    job = queue.enqueue(
+        "scoring.jobs.score_job", session.model_dump_json(),
+        job_id=job_id, job_timeout=JOB_TIMEOUT_S,
+        result_ttl=RESULT_TTL_S, failure_ttl=FAILURE_TTL_S,
+        meta={"session_id": session.session_id, "stage": "queued"},
+        description=f"score {session.session_id}",
+    )
+    if SUBMIT_QUEUE_MODE != "redis":
+        _api_loop = asyncio.get_running_loop()
+        _kick_local_worker()
+    return job
+
+
+def job_state(job_id: str) -> Optional[dict]:
+    """{job_id, status, stage, session_id, score, error} or None if unknown."""
+    try:
+        job = Job.fetch(job_id, connection=get_queue().connection)
+    except NoSuchJobError:
+        return None
+    status = job.get_status()
+    state = {
+        "job_id": job_id,
+        "status": status,
+        "stage": job.meta.get("stage"),
+        "session_id": job.meta.get("session_id"),
+        "score": None,
+        "error": None,
+    }
+    if status == JobStatus.FINISHED and job.result:
+        state["score"] = Score.model_validate_json(job.result)
+    elif status == JobStatus.FAILED:
+        state["error"] = "Scoring failed — submit again to retry"
+    return state
+
+
+def main() -> None:
+    """`python -m scoring.jobs`: a worker process for SPONGE_SUBMIT_QUEUE=redis."""
+    logging.basicConfig(level=logging.INFO)
+    queue = get_queue()
+    Worker([queue], connection=queue.connection).work()
+
+
+if __name__ == "__main__":
+    main()
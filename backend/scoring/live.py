@@ -0,0 +1,168 @@
+"""
+Live scoring: metric accumulators updated as a session's events arrive.
+
+/session/event(s) and /prompt feed each session's LiveTimeline (ingest_rows,
+record_history), so the counts behind the headline metrics and the
+metric-based sub-criteria are kept up to date one event at a time:
+
+  prompt windows   the open window's first event of each type; when the
+                   next prompt_sent closes it, each type seen strictly
+                   inside it bumps a counter (modification, blind
+                   adoption, test-after-AI)
+  ai_apply         a deque of applies still inside their 30s review
+                   window, resolved or expired as edits arrive
+  ordering         first/last arrival position per event type (C4)
+  prompts          vocabulary, re-prompt and echo counts, extended only
+                   with the turns a new /prompt adds
+
+Each event costs O(1) amortized, so compute_score — at /submit or for the
+GET /session/{id}/live-score preview — reads finished counts instead of
+replaying the log. LiveTimeline answers every SessionTimeline query, with
+the same results, as long as events arrive in timestamp order (then
+arrival order is ts order). An event that arrives out of order, or an
+event list / history changed behind its back, makes session_timeline()
+fall back to replaying the log.
+"""
+
+from collections import Counter, deque
+
+from models.event import Event, EventRow, event_rows
+from models.session import Session
+from scoring.timeline import APPLY_EDIT_WINDOW_MS, SessionTimeline
+
+
+class LiveTimeline(SessionTimeline):
+    """A SessionTimeline built one event at a time."""
+
+    __slots__ = ("in_order", "n_events", "history", "_last_ts",
+                 "_open_start", "_open_first", "_closed", "_pending_applies", "_reviewed")
+
+    def __init__(self, session: Session):
+        self.start_ms = int(session.started_at.timestamp() * 1000)
+        self._logged = {}
+        self._ts = {}
+        self._order = {}
+        self._windows = []
+        self._window_counts = {}
+        self._set_conversation([])
+        self.history = None
+
+        self.in_order = True
+        self.n_events = 0
+        self._last_ts = None
+        self._open_start = None                       # ts of the latest prompt_sent
+        self._open_first: dict[str, int] = {}         # type → first ts inside the open window
+        self._closed: Counter = Counter()             # type → closed windows containing it
+        self._pending_applies: deque[int] = deque()   # ai_apply ts still awaiting an edit
+        self._reviewed = 0                            # ai_apply events edited within the window
+
+        for kind, ts, _, _ in event_rows(session.events):
+            self.add(kind, ts)
+        self.set_history(session.conversation_history)
+
+    def add(self, kind: str, ts: int) -> None:
+        """Account for the next event in the log."""
+        self.n_events += 1
+        if self._last_ts is not None and ts < self._last_ts:
+            self.in_order = False   # replays from here on; stop accumulating
+        if not self.in_order:
+            return
+        self._last_ts = ts
+
+        logged = self._logged.get(kind)
+        if logged is None:
+            # Arrival order is ts order: one list serves as both
+            logged = self._logged[kind] = self._ts[kind] = []
+        logged.append(ts)
+        pos = self.n_events - 1
+        first, _ = self._order.get(kind, (pos, pos))
+        self._order[kind] = (first, pos)
+
+        if kind == "prompt_sent":
+            if self._open_start is not None:
+                for seen, first_ts in self._open_first.items():
+                    if first_ts < ts:
+                        self._closed[seen] += 1
+            self._open_start = ts
+            self._open_first = {}
+        elif self._open_start is not None and ts > self._open_start:
+            self._open_first.setdefault(kind, ts)
+
+        if kind == "ai_apply":
+            self._pending_applies.append(ts)
+        elif kind == "file_edit":
+            pending = self._pending_applies
+            while pending and pending[0] + APPLY_EDIT_WINDOW_MS <= ts:
+                pending.popleft()   # expired without an edit
+            while pending and pending[0] < ts:
+                pending.popleft()
+                self._reviewed += 1
+
+    def set_history(self, history: list[dict]) -> None:
+        """Adopt the session's new conversation, counting only the added turns."""
+        prompts = [t["content"] for t in history if t.get("role") == "user"]
+        responses = [t["content"] for t in history if t.get("role") == "assistant"]
+        extends = (
+            self.history is not None
+            and prompts[:len(self.prompts)] == self.prompts
+            and responses[:len(self.responses)] == self.responses
+        )
+        if extends:
+            self.prompts, self.responses = prompts, responses
+        else:
+            self._set_conversation(history)
+        self.history = history
+        self._count_conversation()
+
+    def prompt_windows_with(self, kind: str) -> int:
+        open_window = self._open_start is not None and kind in self._open_first
+        return self._closed[kind] + open_window
+
+    def applies_without_edit(self) -> int:
+        return self.count("ai_apply") - self._reviewed
+
+    def in_sync(self, session: Session) -> bool:
+        """Whether this still describes session exactly."""
+        return (self.in_order
+                and self.n_events == len(session.events)
+                and self.history is session.conversation_history)
+
+
+# ---------- Session hooks ----------
+
+def ingest_rows(session: Session, rows: list[EventRow], coalesce_ms: int = 0) -> None:
+    """Append (event, ts, file, meta) rows to the session's log and its live
+    accumulators, folding file_edit bursts within coalesce_ms into spans."""
+    live = session._live
+    log = session.events
+    in_step = live is not None and live.n_events == len(log)
+    for row in rows:
+        if log.merge_edit(row, coalesce_ms):
+            continue         # the span's first edit already counted
+        log.append_row(*row)
+        if in_step:
+            live.add(row[0], row[1])
+    if not in_step:
+        session._live = LiveTimeline(session)
+
+
+def ingest_event(session: Session, event: Event) -> None:
+    """Append one event to the session's log and its live accumulators."""
+    ingest_rows(session, [(event.event, event.ts, event.file, event.meta)])
+
+
+def record_history(session: Session, history: list[dict]) -> None:
+    """Replace the session's conversation and update its live accumulators."""
+    session.conversation_history = history
+    if session._live is None:
+        session._live = LiveTimeline(session)
+    else:
+        session._live.set_history(history)
+
+
+def session_timeline(session: Session) -> SessionTimeline:
+    """The session's live timeline when it is in sync, else one replayed from the log."""
+    live = session._live
+    if live is not None and live.in_sync(session):
+        return live
+    return SessionTimeline(session)
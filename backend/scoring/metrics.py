@@ -5,9 +5,11 @@ Extracted from engine.py — computes the 6 headline metrics (0.0–1.0 each)
 from the event log and conversation history.
 """
 
+from typing import Optional
+
 from models.score import HeadlineMetrics
 from models.session import Session
-from scoring.vocabulary import _is_grounded, _word_overlap
+from scoring.timeline import SessionTimeline
 
 
 # ---------- Session data helpers ----------
@@ -30,7 +32,8 @@ def _session_start_ms(session: Session) -> int:
 
 # ---------- Headline metric computation (0.0 – 1.0 each) ----------
 
-def compute_headline_metrics(session: Session) -> HeadlineMetrics:
+def compute_headline_metrics(session: Session,
+                             timeline: Optional[SessionTimeline] = None) -> HeadlineMetrics:
     """
     All metrics derived purely from the event log and conversation history.
 
@@ -54,12 +57,12 @@ def compute_headline_metrics(session: Session) -> HeadlineMetrics:
     evidence_grounded_followup_rate:
         Fraction of follow-up prompts (index >= 1) that quote or closely echo
         something from the preceding AI response (word overlap > 0.15).
+
+    Pass the timeline compute_score already built to avoid indexing twice.
     """
-    prompts = _user_prompts(session)
-    responses = _ai_responses(session)
-    prompt_events = _events_of(session, "prompt_sent")
-    edit_events = _events_of(session, "file_edit")
-    test_events = _events_of(session, "test_run")
+    timeline = timeline or SessionTimeline(session)
+    prompts = timeline.prompts
+    responses = timeline.responses
 
     n_turns = min(len(prompts), len(responses))
 
@@ -69,27 +72,13 @@ def compute_headline_metrics(session: Session) -> HeadlineMetrics:
         mod_rate = 0.0
         test_after_rate = 0.0
     else:
-        blind_count = 0
-        mod_count = 0
-        test_after_count = 0
-
-        for i, p_event in enumerate(prompt_events):
-            # window: from this prompt_sent to the next prompt_sent (or end)
-            window_start = p_event.ts
-            window_end = prompt_events[i + 1].ts if i + 1 < len(prompt_events) else float("inf")
-
-            edits_in_window = [e for e in edit_events if window_start < e.ts < window_end]
-            tests_in_window = [e for e in test_events if window_start < e.ts < window_end]
-
-            if edits_in_window:
-                mod_count += 1
-            else:
-                blind_count += 1
-
-            if tests_in_window:
-                test_after_count += 1
+        # windows: from each prompt_sent to the next prompt_sent (or end)
+        n_windows = timeline.count("prompt_sent")
+        mod_count = timeline.prompt_windows_with("file_edit")
+        blind_count = n_windows - mod_count
+        test_after_count = timeline.prompt_windows_with("test_run")
 
-        n = len(prompt_events) or 1
+        n = n_windows or 1
         blind_rate = round(blind_count / n, 2)
         mod_rate = round(mod_count / n, 2)
         test_after_rate = round(test_after_count / n, 2)
@@ -98,29 +87,19 @@ def compute_headline_metrics(session: Session) -> HeadlineMetrics:
     if len(prompts) < 2:
         passive_rate = 0.0
     else:
-        similar_pairs = sum(
-            1 for a, b in zip(prompts, prompts[1:])
-            if _word_overlap(a, b) > 0.6
-        )
-        passive_rate = round(similar_pairs / (len(prompts) - 1), 2)
+        passive_rate = round(timeline.similar_prompt_pairs() / (len(prompts) - 1), 2)
 
     # -- grounded prompt rate --
     if not prompts:
         grounded_rate = 0.0
     else:
-        grounded_rate = round(sum(1 for p in prompts if _is_grounded(p)) / len(prompts), 2)
+        grounded_rate = round(timeline.prompts_with("rq") / len(prompts), 2)
 
     # -- evidence-grounded followup rate --
     if len(prompts) < 2 or len(responses) < 1:
         evidence_rate = 0.0
     else:
-        followups = prompts[1:]
-        preceding_responses = responses[:len(followups)]
-        evidence_count = sum(
-            1 for p, r in zip(followups, preceding_responses)
-            if _word_overlap(p, r) > 0.15
-        )
-        evidence_rate = round(evidence_count / len(followups), 2)
+        evidence_rate = round(timeline.echoing_followups() / (len(prompts) - 1), 2)
 
     return HeadlineMetrics(
         blind_adoption_rate=blind_rate,
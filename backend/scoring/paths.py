@@ -0,0 +1,10 @@
+"""
+Filesystem locations shared by the scorers, kept free of imports so the
+vocabulary matcher and the job workers can read them without loading the
+sandbox.
+"""
+
+import os
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RQ_SOURCE = os.path.join(BACKEND_ROOT, "rq-v1.0")   # the reference RQ codebase
@@ -0,0 +1,246 @@
+"""
+Deadline-aware scoring pipeline behind /submit.
+
+Two stages, each with its own latency budget and both inside an overall
+SPONGE_SUBMIT_BUDGET (default 50s, under the platform's 60s limit):
+
+  evaluate   conversation eval, code analysis and correctness tests in
+             parallel (or the fused call plus tests) — SPONGE_SUBMIT_EVAL_BUDGET
+  insights   generate_insights on the computed score — SPONGE_SUBMIT_INSIGHTS_BUDGET
+
+An evaluation still running when its stage's budget is spent is
+cancelled and replaced by its fallback: compute_score falls back to
+metrics for it, or insights fall back to _fallback_insights. Its name
+goes into Score.degraded_stages. Nothing outlives the response, so a
+slow model can't pile up calls, rate-limit tokens and sandbox runs
+behind new submissions.
+
+SPONGE_SUBMIT_LATE_S > 0 (default 0: off) keeps over-budget evaluations
+running in the background for that long instead. If one finishes in
+time, session.score is recomputed with its result, so a later /submit or
+leaderboard read gets the full score. RQ jobs have no request deadline
+and wait for them up to SPONGE_SUBMIT_JOB_LATE_S.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from models.score import Score
+from models.session import Session
+from scoring.code_analysis import analyze_final_code
+from scoring.engine import compute_score
+from scoring.fused_eval import FUSED_EVAL, evaluate_fused
+from scoring.insights import _fallback_insights, derive_insights, generate_insights
+from scoring.semantic import evaluate_conversation
+from scoring.test_runner import run_correctness_tests
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_BUDGET_S = float(os.environ.get("SPONGE_SUBMIT_BUDGET", "50"))
+EVAL_BUDGET_S = float(os.environ.get("SPONGE_SUBMIT_EVAL_BUDGET", "40"))
+INSIGHTS_BUDGET_S = float(os.environ.get("SPONGE_SUBMIT_INSIGHTS_BUDGET", "8"))
+LATE_RESULT_S = float(os.environ.get("SPONGE_SUBMIT_LATE_S", "0"))
+JOB_LATE_RESULT_S = float(os.environ.get("SPONGE_SUBMIT_JOB_LATE_S", "300"))
+
+# Background tasks finishing late stages; referenced so they aren't collected
+_late_tasks: set[asyncio.Task] = set()
+
+
+def _result(task: asyncio.Task) -> Optional[object]:
+    """A finished stage's value; evaluations report failure as None."""
+    if task.cancelled():
+        return None
+    exc = task.exception()
+    if exc is not None:
+        logger.warning("Submit stage %s failed: %s", task.get_name(), exc)
+        return None
+    return task.result()
+
+
+async def _run_stages(stages: dict[str, Awaitable], budget_s: float,
+                      ) -> tuple[dict[str, Optional[object]], dict[str, asyncio.Task]]:
+    """Run stages concurrently for at most budget_s.
+
+    Returns (results, late): results has None for every stage that missed
+    the budget; late maps those stages to their still-running tasks.
+    """
+    tasks = {name: asyncio.create_task(coro, name=name) for name, coro in stages.items()}
+    done, _ = await asyncio.wait(tasks.values(), timeout=max(0.0, budget_s))
+    results, late = {}, {}
+    for name, task in tasks.items():
+        if task in done:
+            results[name] = _result(task)
+        else:
+            results[name] = None
+            late[name] = task
+    if late:
+        logger.warning("Submit stages over budget (%.1fs): %s", budget_s, ", ".join(late))
+    return results, late
+
+
+def _cancel(late: dict[str, asyncio.Task]) -> None:
+    for task in late.values():
+        task.cancel()
+
+
+class _Submission:
+    """Everything needed to (re)compute a session's score from stage results."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.results: dict[str, Optional[object]] = {}
+        self.user_prompts = [
+            t["content"] for t in session.conversation_history
+            if t.get("role") == "user"
+        ]
+
+    def evals(self) -> tuple:
+        fused = self.results.get("fused")
+        if fused is not None:
+            return fused.conversation, fused.code
+        return self.results.get("conversation"), self.results.get("code")
+
+    def score(self) -> Score:
+        conv_eval, code_eval = self.evals()
+        return compute_score(
+            self.session,
+            semantic_eval=conv_eval,
+            conv_eval=conv_eval,
+            code_eval=code_eval,
+            test_results=self.results.get("tests"),
+        )
+
+    def fallback_insights(self, score: Score) -> list:
+        return _fallback_insights(
+            self.user_prompts, score.total_score, score.headline_metrics,
+            score.rubric_breakdown, score.penalty_detail, score.test_suite,
+        )
+
+    def derived_insights(self, score: Score) -> list:
+        """Fused mode: pick and tier the fused call's candidates locally."""
+        return derive_insights(
+            self.results["fused"].insight_candidates,
+            user_prompts=self.user_prompts,
+            total_score=score.total_score,
+            rubric=score.rubric_breakdown,
+            metrics=score.headline_metrics,
+            penalties=score.penalty_detail,
+            test_suite=score.test_suite,
+        )
+
+    async def insights(self, score: Score) -> list:
+        if self.results.get("fused") is not None:
+            return self.derived_insights(score)
+        return await generate_insights(
+            user_prompts=self.user_prompts,
+            total_score=score.total_score,
+            rubric=score.rubric_breakdown,
+            sub_criteria=score.sub_criteria,
+            metrics=score.headline_metrics,
+            penalties=score.penalty_detail,
+            test_suite=score.test_suite,
+        )
+
+
+async def score_session(session: Session, on_stage: Optional[Callable[[str], None]] = None,
+                        wait_late: bool = False,
+                        on_late_score: Optional[Callable[[Session], None]] = None) -> Score:
+    """Score a submitted session within SUBMIT_BUDGET_S (see module docstring).
+
+    on_stage is called with "evaluate" and "insights" as each stage starts.
+    With wait_late the over-budget stages are awaited here (up to
+    JOB_LATE_RESULT_S) and the upgraded score is returned — for callers
+    with no request deadline, like the RQ jobs. Otherwise they are
+    cancelled, or with LATE_RESULT_S > 0 left to finish in the background.
+    on_late_score is called with the session after late stages upgrade
+    session.score, so the caller can persist it.
+    """
+    keep_late = wait_late or LATE_RESULT_S > 0
+    deadline = time.monotonic() + SUBMIT_BUDGET_S
+    submission = _Submission(session)
+    if on_stage:
+        on_stage("evaluate")
+
+    tests = run_correctness_tests(session.final_code, include_hidden=True,
+                                  session_id=session.session_id)
+    if FUSED_EVAL:
+        # One Gemini call for both evals and the insight candidates
+        stages = {"fused": evaluate_fused(session.conversation_history, session.final_code),
+                  "tests": tests}
+    else:
+        stages = {"conversation": evaluate_conversation(session.conversation_history),
+                  "code": analyze_final_code(session.final_code),
+                  "tests": tests}
+    submission.results, late = await _run_stages(
+        stages, min(EVAL_BUDGET_S, deadline - time.monotonic()),
+    )
+    if not keep_late:
+        _cancel(late)
+
+    score = submission.score()
+    insights = None
+    if "fused" not in late:
+        # (A late fused call would only be replaced by a second, slower one)
+        if on_stage:
+            on_stage("insights")
+        insights_results, late_insights = await _run_stages(
+            {"insights": submission.insights(score)},
+            min(INSIGHTS_BUDGET_S, deadline - time.monotonic()),
+        )
+        insights = insights_results["insights"]
+        if not keep_late:
+            _cancel(late_insights)
+        late.update(late_insights)
+    score.insights = insights or submission.fallback_insights(score)
+    score.user_prompts = submission.user_prompts
+    score.degraded_stages = sorted(late)
+
+    if late and wait_late:
+        session.score = score
+        await _attach_late(submission, late, JOB_LATE_RESULT_S, on_late_score)
+        return session.score
+    if late and keep_late:
+        task = asyncio.create_task(_attach_late(submission, late, LATE_RESULT_S, on_late_score))
+        _late_tasks.add(task)
+        task.add_done_callback(_late_tasks.discard)
+    return score
+
+
+async def _attach_late(submission: _Submission, late: dict[str, asyncio.Task], timeout_s: float,
+                       on_late_score: Optional[Callable[[Session], None]] = None) -> None:
+    """Wait up to timeout_s for over-budget stages and upgrade session.score
+    with their results."""
+    done, pending = await asyncio.wait(late.values(), timeout=timeout_s)
+    for task in pending:
+        task.cancel()
+
+    arrived = {name for name, task in late.items() if task in done}
+    for name in arrived:
+        submission.results[name] = _result(late[name])
+    if not arrived:
+        logger.warning("Late submit stages never finished for %s: %s",
+                       submission.session.session_id, ", ".join(late))
+        return
+
+    previous = submission.session.score
+    if previous is None:
+        return
+    if arrived - {"insights"}:
+        score = submission.score()
+        score.insights = previous.insights
+        score.user_prompts = previous.user_prompts
+        if submission.results.get("fused") is not None:
+            score.insights = submission.derived_insights(score)
+    else:
+        score = previous.model_copy()
+    if submission.results.get("insights"):
+        score.insights = submission.results["insights"]
+    score.degraded_stages = sorted(set(late) - arrived)
+    submission.session.score = score
+    if on_late_score:
+        on_late_score(submission.session)
+    logger.info("Attached late submit stages for %s: %s",
+                submission.session.session_id, ", ".join(sorted(arrived)))
@@ -0,0 +1,216 @@
+"""
+Sandbox scheduler — admission control for pytest runs.
+
+Every sandbox run goes through one process-wide scheduler:
+  - at most SANDBOX_CONCURRENCY slots are in use at once (default: CPU
+    count); a run takes one slot per pytest process it starts
+  - further runs wait in a FIFO queue
+  - interactive runs (/run-tests) are rejected with SchedulerBusy once
+    SANDBOX_MAX_QUEUE runs are waiting, and are superseded — cancelled,
+    queued or running — when the same session starts a newer run
+  - submission runs are never rejected or superseded
+
+Waiting is pure asyncio: a queued run holds no thread or process.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SANDBOX_CONCURRENCY = int(os.environ.get("SPONGE_SANDBOX_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+SANDBOX_MAX_QUEUE = int(os.environ.get("SPONGE_SANDBOX_QUEUE", "0")) or 4 * SANDBOX_CONCURRENCY
+
+# Starting guess for how long a run holds its slot, refined as runs finish
+INITIAL_RUN_ESTIMATE_S = 2.0
+RUN_ESTIMATE_ALPHA = 0.2
+
+
+class SchedulerBusy(Exception):
+    """The wait queue is full. Retry after retry_after seconds."""
+
+    def __init__(self, retry_after: int, queued: int):
+        super().__init__(f"sandbox queue full ({queued} waiting)")
+        self.retry_after = retry_after
+        self.queued = queued
+
+
+class RunSuperseded(Exception):
+    """The session started a newer run, so this one was cancelled."""
+
+
+class _Ticket:
+    __slots__ = ("session_id", "interactive", "weight", "waiter", "task", "superseded")
+
+    def __init__(self, session_id: Optional[str], interactive: bool, weight: int):
+        self.session_id = session_id
+        self.interactive = interactive
+        self.weight = weight
+        self.waiter: Optional[asyncio.Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self.superseded = False
+
+    def cancel(self) -> None:
+        self.superseded = True
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+
+class SandboxScheduler:
+
+    def __init__(self, concurrency: int = SANDBOX_CONCURRENCY, max_queue: int = SANDBOX_MAX_QUEUE):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters: deque[_Ticket] = deque()
+        self._interactive: dict[str, _Ticket] = {}  # session_id → latest interactive run
+        self._run_estimate = INITIAL_RUN_ESTIMATE_S
+
+    # ---------- Introspection ----------
+
+    @property
+    def active(self) -> int:
+        """Slots in use."""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def idle_slots(self) -> int:
+        """Slots a run started now could take without waiting."""
+        return 0 if self._waiters else self.concurrency - self._active
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a newly queued run."""
+        rounds = math.ceil((len(self._waiters) + 1) / self.concurrency)
+        return max(1, math.ceil(rounds * self._run_estimate))
+
+    def position(self, session_id: str) -> Optional[int]:
+        """1-based queue position of the session's first waiting run."""
+        for i, ticket in enumerate(self._waiters, start=1):
+            if ticket.session_id == session_id:
+                return i
+        return None
+
+    def is_running(self, session_id: str) -> bool:
+        ticket = self._interactive.get(session_id)
+        return ticket is not None and ticket.task is not None
+
+    # ---------- Running ----------
+
+    async def run(self, factory: Callable[[], Awaitable[T]], session_id: Optional[str] = None,
+                  interactive: bool = True, weight: int = 1) -> T:
+        """Run factory() once `weight` slots are free and return its result.
+
+        weight is capped at the concurrency limit; admission stays FIFO, so a
+        heavy run at the head of the queue is not starved by lighter ones.
+
+        Raises SchedulerBusy (interactive runs, queue full) or RunSuperseded
+        (interactive runs replaced by a newer run from the same session).
+        """
+        if session_id is not None:
+            previous = self._interactive.pop(session_id, None)
+            if previous is not None:
+                previous.cancel()
+
+        if interactive and self._active >= self.concurrency and len(self._waiters) >= self.max_queue:
+            raise SchedulerBusy(self.retry_after(), len(self._waiters))
+
+        ticket = _Ticket(session_id, interactive, min(max(1, weight), self.concurrency))
+        if interactive and session_id is not None:
+            self._interactive[session_id] = ticket
+
+        # The waiter and the run are awaited through asyncio.wait, which
+        # doesn't pass their cancellation on: a cancelled waiter or task
+        # means the ticket was superseded, a CancelledError that we were.
+        try:
+            await self._acquire(ticket)
+            started = time.monotonic()
+            try:
+                if ticket.superseded:       # superseded just as its slots were granted
+                    raise RunSuperseded()
+                ticket.task = asyncio.ensure_future(factory())
+                await asyncio.wait((ticket.task,))
+            except asyncio.CancelledError:
+                ticket.task.cancel()
+                raise
+            finally:
+                self._release(ticket.weight)
+                self._record(time.monotonic() - started)
+            if ticket.superseded and ticket.task.cancelled():
+                raise RunSuperseded()
+            return ticket.task.result()
+        finally:
+            if session_id is not None and self._interactive.get(session_id) is ticket:
+                del self._interactive[session_id]
+
+    async def _acquire(self, ticket: _Ticket) -> None:
+        if self._active + ticket.weight <= self.concurrency and not self._waiters:
+            self._active += ticket.weight
+            return
+
+        ticket.waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(ticket)
+        try:
+            await asyncio.wait((ticket.waiter,))
+        except asyncio.CancelledError:
+            self._leave_queue(ticket)
+            raise
+        if ticket.waiter.cancelled():
+            self._leave_queue(ticket)
+            raise RunSuperseded()
+
+    def _leave_queue(self, ticket: _Ticket) -> None:
+        """Give up a queued ticket's place, or slots it was just handed."""
+        if ticket.waiter.done() and not ticket.waiter.cancelled():
+            self._release(ticket.weight)
+            return
+        ticket.waiter.cancel()
+        try:
+            self._waiters.remove(ticket)
+        except ValueError:
+            pass
+        # A heavy head leaving may let lighter waiters in
+        self._grant()
+
+    def _release(self, weight: int) -> None:
+        self._active -= weight
+        self._grant()
+
+    def _grant(self) -> None:
+        """Admit waiters from the head of the queue while their slots fit."""
+        while self._waiters:
+            ticket = self._waiters[0]
+            if ticket.waiter.done():
+                self._waiters.popleft()
+                continue
+            if self._active + ticket.weight > self.concurrency:
+                return
+            self._waiters.popleft()
+            self._active += ticket.weight
+            ticket.waiter.set_result(None)
+
+    def _record(self, duration: float) -> None:
+        self._run_estimate += RUN_ESTIMATE_ALPHA * (duration - self._run_estimate)
+
+
+_scheduler: Optional[SandboxScheduler] = None
+
+
+def get_scheduler() -> SandboxScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = SandboxScheduler()
+        logger.info("scheduler: %d concurrent sandbox runs, queue of %d",
+                    _scheduler.concurrency, _scheduler.max_queue)
+    return _scheduler
@@ -13,32 +13,17 @@ The engine falls back to pure metric-based scoring gracefully.
 
 import json
 import logging
-import os
 from typing import Optional
 
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
 from gemini.fallback import generate_with_fallback
+from gemini.service import get_client
+from scoring.eval_cache import cache_get, cache_put, eval_key
 
 logger = logging.getLogger(__name__)
 
-_client: Optional[genai.Client] = None
-_configured_key: Optional[str] = None
-
-
-def _get_client() -> Optional[genai.Client]:
-    global _client, _configured_key
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    if api_key != _configured_key:
-        _client = genai.Client(api_key=api_key)
-        _configured_key = api_key
-    return _client
-
-
 # ── Output models ─────────────────────────────────────────────────────────
 
 class ConversationSemanticEval(BaseModel):
@@ -228,6 +213,25 @@ def _clamp(val, lo, hi) -> float:
     return float(max(lo, min(hi, val)))
 
 
+def conversation_eval_from_data(data: dict) -> ConversationSemanticEval:
+    """Clamp a parsed model response into a ConversationSemanticEval."""
+    return ConversationSemanticEval(
+        a1_understanding=_clamp(data.get("a1_understanding", 0), 0, 6),
+        a2_decomposition=_clamp(data.get("a2_decomposition", 0), 0, 7),
+        a3_justification=_clamp(data.get("a3_justification", 0), 0, 7),
+        a4_edge_cases=_clamp(data.get("a4_edge_cases", 0), 0, 5),
+        b3_efficiency_discussion=_clamp(data.get("b3_efficiency_discussion", 0), 0, 5),
+        b4_ownership_dialogue=_clamp(data.get("b4_ownership_dialogue", 0), 0, 5),
+        c2_test_mentions=_clamp(data.get("c2_test_mentions", 0), 0, 9),
+        c3_ai_questioning=_clamp(data.get("c3_ai_questioning", 0), 0, 4),
+        d1_narration=_clamp(data.get("d1_narration", 0), 0, 8),
+        d2_tradeoffs=_clamp(data.get("d2_tradeoffs", 0), 0, 7),
+        d3_ai_balance=_clamp(data.get("d3_ai_balance", 0), 0, 5),
+        d4_status_updates=_clamp(data.get("d4_status_updates", 0), 0, 5),
+        interpretation=str(data.get("interpretation", "")).strip(),
+    )
+
+
 # ── Public entry point ────────────────────────────────────────────────────
 
 async def evaluate_conversation(
@@ -239,11 +243,6 @@ async def evaluate_conversation(
     Returns ConversationSemanticEval with 12 sub-criterion scores and
     personalized feedback, or None if the call fails.
     """
-    client = _get_client()
-    if client is None:
-        logger.warning("SemanticEval skipped — GEMINI_API_KEY not set")
-        return None
-
     user_turns = [t for t in conversation_history if t.get("role") == "user"]
     if not user_turns:
         return None
@@ -251,6 +250,16 @@ async def evaluate_conversation(
     transcript = _format_transcript(conversation_history)
     prompt = f"Here is the full conversation to evaluate:\n\n{transcript}"
 
+    cache_key = eval_key("conversation", _EVAL_SYSTEM_PROMPT, prompt)
+    cached = await cache_get(cache_key, ConversationSemanticEval.model_validate)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if client is None:
+        logger.warning("SemanticEval skipped — GEMINI_API_KEY not set")
+        return None
+
     try:
         response = await generate_with_fallback(
             client,
@@ -268,21 +277,9 @@ async def evaluate_conversation(
             logger.warning("SemanticEval: could not parse JSON from response")
             return None
 
-        return ConversationSemanticEval(
-            a1_understanding=_clamp(data.get("a1_understanding", 0), 0, 6),
-            a2_decomposition=_clamp(data.get("a2_decomposition", 0), 0, 7),
-            a3_justification=_clamp(data.get("a3_justification", 0), 0, 7),
-            a4_edge_cases=_clamp(data.get("a4_edge_cases", 0), 0, 5),
-            b3_efficiency_discussion=_clamp(data.get("b3_efficiency_discussion", 0), 0, 5),
-            b4_ownership_dialogue=_clamp(data.get("b4_ownership_dialogue", 0), 0, 5),
-            c2_test_mentions=_clamp(data.get("c2_test_mentions", 0), 0, 9),
-            c3_ai_questioning=_clamp(data.get("c3_ai_questioning", 0), 0, 4),
-            d1_narration=_clamp(data.get("d1_narration", 0), 0, 8),
-            d2_tradeoffs=_clamp(data.get("d2_tradeoffs", 0), 0, 7),
-            d3_ai_balance=_clamp(data.get("d3_ai_balance", 0), 0, 5),
-            d4_status_updates=_clamp(data.get("d4_status_updates", 0), 0, 5),
-            interpretation=str(data.get("interpretation", "")).strip(),
-        )
+        result = conversation_eval_from_data(data)
+        await cache_put(cache_key, result.model_dump())
+        return result
 
     except Exception as exc:
         logger.warning("SemanticEval failed — falling back to metric scoring: %s", exc)
@@ -1,33 +1,57 @@
 """
 Test runner service — sandbox execution for correctness verification.
 
-Parses user-submitted final_code, overlays it onto a copy of rq-v1.0,
-runs the synthesized test suite via pytest subprocess, and returns
-TestSuiteResult with per-test pass/fail and core test failures.
+Takes the user's files (a {path: content} mapping, or the legacy
+concatenated `// --- path ---` final_code), overlays them onto a per-run
+view of a shared sandbox template, runs the synthesized test suite via pytest
+subprocess, and returns TestSuiteResult with per-test pass/fail and core
+test failures.
+
+The template is built once per process: a pruned copy of rq-v1.0 (only the
+rq package and the test helpers the suites import) with precompiled
+bytecode, placed on tmpfs when available and made read-only. Each run gets
+a view of it made of hardlinks (or symlinks) plus the user's changed files,
+so a run costs a handful of file writes instead of a full tree copy.
+
+Per-suite results are cached by content, so unchanged code is never graded
+twice by the same suite. Runs that do need pytest are admitted by the
+sandbox scheduler (scoring/scheduler.py), sharded across parallel pytest
+processes when slots are idle, and awaited without holding a thread.
 
 Entry point: run_correctness_tests(final_code, include_hidden=False) -> Optional[TestSuiteResult]
 """
 
 import asyncio
+import atexit
+import compileall
+import hashlib
+import json
 import logging
 import os
+import py_compile
 import re
 import shutil
+import signal
+import socket
 import subprocess
 import sys
 import tempfile
+import threading
 import xml.etree.ElementTree as ET
-from typing import Optional
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Optional, Union
 
 from models.score import TestResult, TestSuiteResult
+from scoring.paths import BACKEND_ROOT, RQ_SOURCE
+from scoring.scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
-# Path to the reference RQ codebase and our synthesized test suite
-BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-RQ_SOURCE = os.path.join(BACKEND_ROOT, "rq-v1.0")
+# Our synthesized test suites (the RQ codebase is at paths.RQ_SOURCE)
 TEST_SUITE_PATH = os.path.join(os.path.dirname(__file__), "tests", "test_submission.py")
 HIDDEN_TEST_SUITE_PATH = os.path.join(os.path.dirname(__file__), "tests", "test_hidden.py")
+VIRTUAL_CLOCK_PATH = os.path.join(os.path.dirname(__file__), "tests", "virtual_clock.py")
+RESULT_STREAM_PATH = os.path.join(os.path.dirname(__file__), "tests", "result_stream.py")
 
 # Core test names from the test suite (P3 triggers)
 CORE_TEST_NAMES = {
@@ -36,6 +60,22 @@ CORE_TEST_NAMES = {
     "test_existing_enqueue_unchanged",
 }
 
+# Visible test names in display order (test_submission.py)
+VISIBLE_TEST_NAMES = [
+    "test_enqueue_in_exists",
+    "test_enqueue_at_exists",
+    "test_existing_enqueue_unchanged",
+    "test_enqueue_in_returns_job",
+    "test_enqueue_at_returns_job",
+    "test_scheduled_job_not_in_queue_immediately",
+    "test_scheduled_job_in_scheduled_registry",
+    "test_enqueue_at_past_datetime",
+    "test_enqueue_in_zero_delay",
+    "test_worker_moves_ready_jobs",
+    "test_multiple_scheduled_jobs_ordering",
+    "test_job_status_lifecycle",
+]
+
 # Hidden test names (only run at submission time)
 HIDDEN_TEST_NAMES = [
     "test_enqueue_in_negative_delay",
@@ -48,17 +88,56 @@ HIDDEN_TEST_NAMES = [
     "test_enqueue_at_with_echo_kwargs",
 ]
 
+# Suite files (as named in the sandbox) → the tests each one defines
+SUITE_TEST_NAMES = {
+    "test_submission.py": VISIBLE_TEST_NAMES,
+    "test_hidden.py": HIDDEN_TEST_NAMES,
+}
+SUITE_CLASSES = {
+    "test_submission.py": "TestSubmission",
+    "test_hidden.py": "TestHidden",
+}
+
+# Upper bound on parallel pytest processes per run. Each shard is its own
+# process (and so its own fakeredis server); the scheduler charges a run
+# one slot per shard.
+TEST_SHARDS = int(os.environ.get("SPONGE_TEST_SHARDS", "4"))
+
+# Receives each TestResult of a run as soon as it is known
+ResultCallback = Callable[[TestResult], None]
+
 # Timeout for pytest subprocess (seconds)
 PYTEST_TIMEOUT = 45
 
+# Parts of rq-v1.0 the synthesized suites actually need. Docs, examples and
+# the upstream test modules are left out of the sandbox template.
+SANDBOX_RQ_DIRNAME = "rq-v1.0"
+TEMPLATE_RQ_ENTRIES = [
+    "rq",
+    os.path.join("tests", "__init__.py"),
+    os.path.join("tests", "fixtures.py"),
+]
+
+# Where sandbox templates and per-run views live. Prefer tmpfs so neither
+# ever touches disk; SPONGE_SANDBOX_DIR overrides.
+SHM_DIR = "/dev/shm"
+
 # conftest.py written into the temp dir — patches redis.Redis with fakeredis
 # so tests run fully in-memory without a real Redis server.
 CONFTEST_CONTENT = '''\
+# Virtual clock first, so everything imported below sees the patched
+# time.time and datetime.datetime (see virtual_clock.py).
+import virtual_clock
+virtual_clock.install()
+
 import fakeredis
 import redis as redis_module
 
-# Shared in-memory server so all Redis(db=N) calls share data
-_server = fakeredis.FakeServer()
+# Shared in-memory server so all Redis(db=N) calls share data. Reused when
+# this file runs again in the same process (the fork server applies it once
+# up front, then pytest loads it in each forked run).
+_server = getattr(redis_module, "_sponge_fake_server", None) or fakeredis.FakeServer()
+redis_module._sponge_fake_server = _server
 
 class _FakeRedis(fakeredis.FakeRedis):
     def __init__(self, host="localhost", port=6379, db=0, **kw):
@@ -78,6 +157,13 @@ rq.worker.Worker = rq.worker.SimpleWorker
 '''
 
 
+# Submitted code: the files by path, or the legacy concatenated blob
+SubmittedCode = Union[dict[str, str], str]
+
+# File header line: // --- rq/queue.py ---   ([^\S\n]: whitespace within the line)
+_FILE_HEADER = re.compile(r"^//[^\S\n]*---[^\S\n]*(.+?)[^\S\n]*---[^\S\n]*$", re.MULTILINE)
+
+
 def parse_final_code(final_code: str) -> dict[str, str]:
     """Parse concatenated final_code into individual files.
 
@@ -87,126 +173,686 @@ def parse_final_code(final_code: str) -> dict[str, str]:
         // --- rq/worker.py ---
         <file contents>
 
-    Returns dict mapping relative paths to file contents.
+    Returns dict mapping relative paths to file contents. One finditer pass
+    finds the headers; each file is sliced out between its header line and
+    the next one.
     """
     files = {}
-    current_file = None
-    current_lines = []
-
-    for line in final_code.split("\n"):
-        # Match file header: // --- rq/queue.py ---
-        match = re.match(r"^//\s*---\s*(.+?)\s*---\s*$", line)
-        if match:
-            # Save previous file
-            if current_file is not None:
-                files[current_file] = "\n".join(current_lines)
-            current_file = match.group(1).strip()
-            current_lines = []
-        else:
-            current_lines.append(line)
+    path, start = None, 0
+    for match in _FILE_HEADER.finditer(final_code):
+        if path is not None:
+            files[path] = final_code[start:match.start() - 1]
+        path, start = match.group(1).strip(), match.end() + 1
+    if path is not None:
+        files[path] = final_code[start:]
+    return files
 
-    # Save last file
-    if current_file is not None:
-        files[current_file] = "\n".join(current_lines)
 
-    return files
+def submitted_files(code: SubmittedCode) -> dict[str, str]:
+    """The files of a submission, parsing the legacy blob format."""
+    return code if isinstance(code, dict) else parse_final_code(code)
+
+
+def _no_code(code: Optional[SubmittedCode]) -> bool:
+    return not code or (isinstance(code, str) and not code.strip())
+
+
+# ---------- Sandbox template ----------
+
+_template_dir: Optional[str] = None
+_template_hashes: dict[str, str] = {}
+_template_lock = threading.Lock()
+_suite_hashes: dict[str, str] = {}  # suite file → hash of it plus the harness
+
+
+def _sandbox_root() -> str:
+    """Directory that holds the template and every per-run view.
+
+    Both must share a filesystem so per-run views can hardlink into the
+    template.
+    """
+    configured = os.environ.get("SPONGE_SANDBOX_DIR")
+    if configured:
+        os.makedirs(configured, exist_ok=True)
+        return configured
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+def _content_hash(content: str) -> str:
+    """Hash file content, ignoring trailing newlines.
+
+    The frontend joins files with blank lines, so an unchanged file comes
+    back with extra newlines at the end — which don't change what it does.
+    """
+    return hashlib.sha1(content.rstrip("\n").encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _set_tree_writable(path: str, writable: bool) -> None:
+    """Flip write permission on every file and directory under path."""
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            if not os.path.islink(full):
+                os.chmod(full, 0o644 if writable else 0o444)
+        os.chmod(dirpath, 0o755 if writable else 0o555)
+
+
+def _remove_template(path: str) -> None:
+    try:
+        _set_tree_writable(path, True)
+        shutil.rmtree(path)
+    except Exception:
+        logger.warning("test_runner: failed to clean up template %s", path)
 
 
-def _run_tests_sync(final_code: str, include_hidden: bool = False) -> TestSuiteResult:
-    """Synchronous test execution — called via asyncio.to_thread.
+def _build_template() -> str:
+    """Create the read-only sandbox template and return its path.
 
-    Raises on failure instead of returning None so callers can see the error.
+    Layout mirrors a per-run directory:
+        conftest.py, test_submission.py, test_hidden.py, virtual_clock.py,
+        result_stream.py
+        rq-v1.0/rq/...                (with precompiled __pycache__)
+        rq-v1.0/tests/__init__.py, rq-v1.0/tests/fixtures.py
     """
-    tmpdir = None
+    template = tempfile.mkdtemp(prefix="sponge_template_", dir=_sandbox_root())
     try:
-        # Parse user's code into files
-        user_files = parse_final_code(final_code)
-        if not user_files:
-            raise ValueError("No files parsed from final_code")
-
-        # Create temp directory and copy rq-v1.0 into it
-        tmpdir = tempfile.mkdtemp(prefix="sponge_test_")
-        rq_copy = os.path.join(tmpdir, "rq-v1.0")
-        shutil.copytree(RQ_SOURCE, rq_copy)
-
-        # Write conftest.py to patch redis with fakeredis (no real Redis needed)
-        with open(os.path.join(tmpdir, "conftest.py"), "w") as f:
+        rq_dir = os.path.join(template, SANDBOX_RQ_DIRNAME)
+        for entry in TEMPLATE_RQ_ENTRIES:
+            src = os.path.join(RQ_SOURCE, entry)
+            dest = os.path.join(rq_dir, entry)
+            if os.path.isdir(src):
+                shutil.copytree(src, dest, ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copy2(src, dest)
+
+        with open(os.path.join(template, "conftest.py"), "w") as f:
             f.write(CONFTEST_CONTENT)
+        shutil.copy2(TEST_SUITE_PATH, os.path.join(template, "test_submission.py"))
+        shutil.copy2(HIDDEN_TEST_SUITE_PATH, os.path.join(template, "test_hidden.py"))
+        shutil.copy2(VIRTUAL_CLOCK_PATH, os.path.join(template, "virtual_clock.py"))
+        shutil.copy2(RESULT_STREAM_PATH, os.path.join(template, "result_stream.py"))
+
+        # Hash-checked pycs stay valid through hardlinks and symlinks, and an
+        # overlaid file with different content is never served a stale pyc.
+        compileall.compile_dir(
+            rq_dir, quiet=1,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+        )
+
+        # Let pytest cache its assertion-rewritten suites and conftest in the
+        # template too; runs only read them.
+        subprocess.run(
+            [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider",
+             "-p", "result_stream", "test_submission.py", "test_hidden.py", f"--rootdir={template}"],
+            capture_output=True, timeout=PYTEST_TIMEOUT, cwd=template,
+            env={**_pytest_env(rq_dir), "PYTHONDONTWRITEBYTECODE": ""},
+        )
+
+        hashes = {}
+        for dirpath, _, filenames in os.walk(rq_dir):
+            for name in filenames:
+                if name.endswith(".py"):
+                    full = os.path.join(dirpath, name)
+                    with open(full, encoding="utf-8") as f:
+                        hashes[os.path.relpath(full, rq_dir)] = _content_hash(f.read())
+
+        # The conftest and clock shape every suite's results
+        harness = "".join(_file_hash(os.path.join(template, name))
+                          for name in ("conftest.py", "virtual_clock.py", "result_stream.py"))
+        suite_hashes = {
+            suite: hashlib.sha1((harness + _file_hash(os.path.join(template, suite))).encode()).hexdigest()
+            for suite in SUITE_TEST_NAMES
+        }
+
+        _set_tree_writable(template, False)
+    except Exception:
+        _remove_template(template)
+        raise
+
+    global _template_hashes, _suite_hashes
+    _template_hashes = hashes
+    _suite_hashes = suite_hashes
+    atexit.register(_remove_template, template)
+    return template
+
+
+def _get_template() -> str:
+    """Return the sandbox template, building it on first use."""
+    global _template_dir
+    if _template_dir is not None and os.path.isdir(_template_dir):
+        return _template_dir
+    with _template_lock:
+        if _template_dir is None or not os.path.isdir(_template_dir):
+            _template_dir = _build_template()
+            logger.info("test_runner: sandbox template ready at %s", _template_dir)
+    return _template_dir
+
+
+def prepare_sandbox() -> None:
+    """Build the sandbox template and start the fork server ahead of the
+    first run (called at startup)."""
+    _get_template()
+    _get_fork_server()
+
+
+def _overlay_files(user_files: dict[str, str]) -> dict[str, str]:
+    """Map user files to paths inside a run view, dropping unchanged ones.
 
-        # Overlay user's modified files
-        for rel_path, content in user_files.items():
-            dest = os.path.join(rq_copy, rel_path)
+    Paths are relative to rq-v1.0 (e.g. "rq/queue.py"). Files whose content
+    matches the template are left as links; paths escaping the sandbox are
+    rejected.
+    """
+    overlay = {}
+    for rel_path, content in user_files.items():
+        norm = os.path.normpath(rel_path.lstrip("/"))
+        if norm.startswith("..") or os.path.isabs(norm):
+            logger.warning("test_runner: ignoring file outside sandbox: %r", rel_path)
+            continue
+        if _template_hashes.get(norm) == _content_hash(content):
+            continue
+        overlay[os.path.join(SANDBOX_RQ_DIRNAME, norm)] = content
+    return overlay
+
+
+def _link_file(src: str, dest: str) -> None:
+    try:
+        os.link(src, dest)
+    except OSError:
+        os.symlink(src, dest)
+
+
+def _link_tree(src: str, dest: str, rel: str, dirty_dirs: set[str], overlay: dict[str, str]) -> None:
+    """Populate dest with links to src's entries.
+
+    Directories with no overlaid files below them become a single symlink;
+    the rest are recreated and linked file by file, skipping overlaid files.
+    """
+    for entry in os.scandir(src):
+        rel_entry = os.path.join(rel, entry.name) if rel else entry.name
+        target = os.path.join(dest, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            if rel_entry in dirty_dirs:
+                os.mkdir(target)
+                _link_tree(entry.path, target, rel_entry, dirty_dirs, overlay)
+            else:
+                os.symlink(entry.path, target, target_is_directory=True)
+        elif rel_entry not in overlay:
+            _link_file(entry.path, target)
+
+
+def _create_run_view(overlay: dict[str, str]) -> str:
+    """Create a per-run sandbox directory and return its path.
+
+    overlay comes from _overlay_files. The directory looks like a full copy
+    of the template with the user's files on top, but only the changed
+    files are actually written.
+    """
+    template = _get_template()
+
+    dirty_dirs = set()
+    for path in overlay:
+        parent = os.path.dirname(path)
+        while parent:
+            dirty_dirs.add(parent)
+            parent = os.path.dirname(parent)
+
+    run_dir = tempfile.mkdtemp(prefix="sponge_test_", dir=os.path.dirname(template))
+    try:
+        _link_tree(template, run_dir, "", dirty_dirs, overlay)
+        for path, content in overlay.items():
+            dest = os.path.join(run_dir, path)
             os.makedirs(os.path.dirname(dest), exist_ok=True)
             with open(dest, "w") as f:
                 f.write(content)
+    except Exception:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        raise
+    return run_dir
+
+
+def _pytest_env(rq_root: str) -> dict[str, str]:
+    """Environment for a pytest run against the sandbox at rq_root.
+
+    Set RQ_CODEBASE_PATH so test_submission.py imports from the overlay.
+    Include sys.path so the subprocess can find packages installed by
+    the runtime (e.g. on Vercel, sys.executable is the system Python
+    which doesn't have site-packages — we need to pass them explicitly).
+    Bytecode writes are disabled so runs never touch the shared template,
+    and third-party pytest plugins are not loaded: the suites only need
+    pytest itself, and plugin imports dominate startup.
+    """
+    env = os.environ.copy()
+    env["RQ_CODEBASE_PATH"] = rq_root
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env["PYTEST_DISABLE_PLUGIN_AUTOLOAD"] = "1"
+    runtime_paths = os.pathsep.join(p for p in sys.path if p)
+    extra_paths = rq_root + os.pathsep + os.path.join(rq_root, "tests")
+    env["PYTHONPATH"] = extra_paths + os.pathsep + runtime_paths
+    return env
+
+
+def _pytest_command(run_dir: str, test_files: list[str], xml_path: str) -> list[str]:
+    rq_root = os.path.join(run_dir, SANDBOX_RQ_DIRNAME)
+    return [
+        sys.executable, "-m", "pytest",
+        *test_files,
+        f"--junitxml={xml_path}",
+        "-q",
+        "--no-header",
+        "-p", "no:cacheprovider",
+        "-p", "result_stream",
+        f"--result-order={','.join(VISIBLE_TEST_NAMES + HIDDEN_TEST_NAMES)}",
+        f"--ignore={os.path.join(rq_root, 'tests')}",
+        f"--rootdir={run_dir}",
+    ]
+
+
+# ---------- Fork server ----------
+
+FORK_SERVER_PATH = os.path.join(os.path.dirname(__file__), "fork_server.py")
+FORK_SERVER_START_TIMEOUT = 30
+
+_fork_server: Optional[subprocess.Popen] = None
+_fork_server_socket: Optional[str] = None
+_fork_server_disabled = False
+_fork_server_lock = threading.Lock()
 
-        # Copy the test suite into the temp dir
-        test_dest = os.path.join(tmpdir, "test_submission.py")
-        shutil.copy2(TEST_SUITE_PATH, test_dest)
-
-        test_files_to_run = [test_dest]
-        if include_hidden:
-            hidden_dest = os.path.join(tmpdir, "test_hidden.py")
-            shutil.copy2(HIDDEN_TEST_SUITE_PATH, hidden_dest)
-            test_files_to_run.append(hidden_dest)
-
-        # Build the pytest command
-        # Set RQ_CODEBASE_PATH so test_submission.py imports from the overlay.
-        # Include sys.path so the subprocess can find packages installed by
-        # the runtime (e.g. on Vercel, sys.executable is the system Python
-        # which doesn't have site-packages — we need to pass them explicitly).
-        env = os.environ.copy()
-        env["RQ_CODEBASE_PATH"] = rq_copy
-        runtime_paths = os.pathsep.join(p for p in sys.path if p)
-        extra_paths = rq_copy + os.pathsep + os.path.join(rq_copy, "tests")
-        env["PYTHONPATH"] = extra_paths + os.pathsep + runtime_paths
-
-        xml_path = os.path.join(tmpdir, "results.xml")
-        python_exe = sys.executable
-        cmd = [
-            python_exe, "-m", "pytest",
-            *test_files_to_run,
-            f"--junitxml={xml_path}",
-            "-q",
-            "--no-header",
-            f"--ignore={os.path.join(rq_copy, 'tests')}",
-            f"--rootdir={tmpdir}",
-        ]
-
-        # Run pytest with timeout — capture output for diagnostics
+
+class ForkServerError(RuntimeError):
+    """The fork server could not run a test — fall back to a subprocess."""
+
+
+def _fork_server_enabled() -> bool:
+    if _fork_server_disabled or not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        return False
+    return os.environ.get("SPONGE_FORK_SERVER", "1") != "0"
+
+
+def _stop_fork_server() -> None:
+    global _fork_server
+    if _fork_server is not None and _fork_server.poll() is None:
+        _fork_server.kill()
+        _fork_server.wait()
+    _fork_server = None
+
+
+def _get_fork_server() -> Optional[str]:
+    """Return the fork server's socket path, starting it if needed.
+
+    Returns None when the fork server is disabled or fails to start; the
+    caller then runs pytest as a plain subprocess.
+    """
+    global _fork_server, _fork_server_socket, _fork_server_disabled
+    if not _fork_server_enabled():
+        return None
+    if _fork_server is not None and _fork_server.poll() is None:
+        return _fork_server_socket
+
+    with _fork_server_lock:
+        if _fork_server is not None and _fork_server.poll() is None:
+            return _fork_server_socket
+
+        template = _get_template()
+        sock_path = os.path.join(_sandbox_root(), f"sponge_fork_{os.getpid()}.sock")
+        proc = subprocess.Popen(
+            [sys.executable, FORK_SERVER_PATH, sock_path, template],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            cwd=template,
+            env=_pytest_env(os.path.join(template, SANDBOX_RQ_DIRNAME)),
+        )
+
+        # Wait for the "ready" line without blocking forever on a hung start
+        ready = []
+        reader = threading.Thread(target=lambda: ready.append(proc.stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(FORK_SERVER_START_TIMEOUT)
+        if not ready or ready[0].strip() != "ready":
+            proc.kill()
+            proc.wait()
+            _fork_server_disabled = True
+            logger.warning("test_runner: fork server failed to start — using subprocess runs")
+            return None
+
+        if _fork_server is None:
+            atexit.register(_stop_fork_server)
+        _fork_server = proc
+        _fork_server_socket = sock_path
+        logger.info("test_runner: fork server ready (pid %d)", proc.pid)
+        return sock_path
+
+
+async def _run_pytest_forked(sock_path: str, run_dir: str, args: list[str],
+                             overlaid: list[str]) -> int:
+    """Run pytest in a child of the fork server and return its exit code.
+
+    Raises ForkServerError if the server can't be reached or the child dies
+    without reporting, and RuntimeError on timeout. On timeout or
+    cancellation the child is killed.
+    """
+    request = {"run_dir": run_dir, "args": args, "overlaid": overlaid}
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(sock_path), FORK_SERVER_START_TIMEOUT,
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        raise ForkServerError(f"fork server unreachable: {e!r}") from e
+
+    pid = None
+    try:
         try:
-            proc = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=PYTEST_TIMEOUT,
-                cwd=tmpdir,
-                env=env,
-            )
-        except subprocess.TimeoutExpired:
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            started = json.loads(await asyncio.wait_for(reader.readline(), FORK_SERVER_START_TIMEOUT) or "{}")
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            raise ForkServerError(f"fork server did not start the run: {e!r}") from e
+        pid = started.get("pid")
+        if pid is None:
+            raise ForkServerError(f"fork server did not start the run: {started}")
+
+        try:
+            line = await asyncio.wait_for(reader.readline(), PYTEST_TIMEOUT)
+        except asyncio.TimeoutError:
             raise RuntimeError(f"pytest timed out after {PYTEST_TIMEOUT}s")
+        pid = None  # reported back, so it has finished
+    finally:
+        if pid is not None:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        writer.close()
+
+    outcome = json.loads(line) if line else {}
+    if "returncode" not in outcome:
+        raise ForkServerError(f"forked run failed: {outcome.get('error', 'no result')}")
+    return outcome["returncode"]
+
+
+async def _run_pytest_subprocess(cmd: list[str], run_dir: str, rq_root: str) -> tuple[int, str]:
+    """Run pytest as a fresh subprocess; return (returncode, output)."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        cwd=run_dir,
+        env=_pytest_env(rq_root),
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), PYTEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"pytest timed out after {PYTEST_TIMEOUT}s")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return proc.returncode, stdout.decode(errors="replace")
+
+
+# ---------- Result cache ----------
+# Per-suite outcomes keyed by what determines them: the user's effective
+# changes on top of the template and the suite (plus harness) content. Runs
+# with unchanged code — repeated "Run tests", or /submit right after
+# /run-tests — skip pytest for every suite already graded.
+
+RESULT_CACHE_SIZE = int(os.environ.get("SPONGE_TEST_CACHE_SIZE", "256"))
+
+# (files digest, suite, suite hash) → {test_name: (passed, error_message)}
+_result_cache: OrderedDict[tuple[str, str, str], dict] = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _files_digest(overlay: dict[str, str]) -> str:
+    """Digest of the user's code as it differs from the template."""
+    h = hashlib.sha1()
+    for path in sorted(overlay):
+        h.update(path.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+        h.update(_content_hash(overlay[path]).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cache_get(files_digest: str, suite: str) -> Optional[dict[str, tuple[bool, Optional[str]]]]:
+    key = (files_digest, suite, _suite_hashes.get(suite, ""))
+    with _result_cache_lock:
+        outcomes = _result_cache.get(key)
+        if outcomes is not None:
+            _result_cache.move_to_end(key)
+        return outcomes
+
+
+def _cache_put(files_digest: str, suite: str, outcomes: dict[str, tuple[bool, Optional[str]]]) -> None:
+    if RESULT_CACHE_SIZE <= 0:
+        return
+    key = (files_digest, suite, _suite_hashes.get(suite, ""))
+    with _result_cache_lock:
+        _result_cache[key] = outcomes
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def clear_result_cache() -> None:
+    with _result_cache_lock:
+        _result_cache.clear()
+
+
+# ---------- Test runs ----------
+
+# How long to wait for streamed outcomes still in flight once pytest exits
+RESULT_STREAM_DRAIN_TIMEOUT = 2
+
+
+async def _stream_results(path: str, on_result: ResultCallback) -> tuple[asyncio.AbstractServer, set]:
+    """Listen on path for the result_stream plugin and pass each outcome on.
+
+    Returns the server and the set of its connection handler tasks.
+    """
+    handlers = set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        handlers.add(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                try:
+                    outcome = json.loads(line)
+                    result = _test_result(outcome["test_name"], bool(outcome["passed"]),
+                                          outcome.get("error_message"))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                on_result(result)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=path)
+    return server, handlers
+
+
+async def _run_suites(overlay: dict[str, str], targets: list[str],
+                      on_result: Optional[ResultCallback] = None) -> dict[str, tuple[bool, Optional[str]]]:
+    """Run pytest targets (suite files or node ids) against the overlay and
+    return per-test outcomes.
+
+    Runs in a fork of the pre-warmed fork server when available, otherwise
+    as a fresh pytest subprocess. With on_result, each outcome is also
+    passed on as soon as its test finishes.
+    """
+    run_dir = None
+    results_server = None
+    try:
+        # Per-run view of the template with the user's changed files on top
+        run_dir = _create_run_view(overlay)
+        rq_root = os.path.join(run_dir, SANDBOX_RQ_DIRNAME)
+
+        test_files_to_run = [os.path.join(run_dir, target) for target in targets]
+        xml_path = os.path.join(run_dir, "results.xml")
+        cmd = _pytest_command(run_dir, test_files_to_run, xml_path)
+        if on_result is not None:
+            results_sock = os.path.join(run_dir, "results.sock")
+            results_server, results_handlers = await _stream_results(results_sock, on_result)
+            cmd.append(f"--result-socket={results_sock}")
+
+        returncode = None
+        output = ""
+        sock_path = _get_fork_server()
+        if sock_path is not None:
+            try:
+                returncode = await _run_pytest_forked(sock_path, run_dir, cmd[3:], list(overlay))
+            except ForkServerError:
+                logger.warning("test_runner: forked run failed — retrying as subprocess", exc_info=True)
+            output_path = os.path.join(run_dir, "pytest-output.txt")
+            if os.path.exists(output_path):
+                with open(output_path, errors="replace") as f:
+                    output = f.read()
+
+        if returncode is None:
+            returncode, output = await _run_pytest_subprocess(cmd, run_dir, rq_root)
+
+        if results_server is not None:
+            # Let the handler pass on whatever pytest sent before exiting
+            results_server.close()
+            if results_handlers:
+                await asyncio.wait(results_handlers, timeout=RESULT_STREAM_DRAIN_TIMEOUT)
 
         # Parse JUnit XML results
-        result = _parse_junit_xml(xml_path, include_hidden)
-        if result is None:
+        xml_results = _read_junit_xml(xml_path)
+        if not xml_results:
             raise RuntimeError(
                 f"pytest produced no parseable results. "
-                f"returncode={proc.returncode}, "
-                f"stdout={proc.stdout[-800:] if proc.stdout else ''}, "
-                f"stderr={proc.stderr[-800:] if proc.stderr else ''}"
+                f"returncode={returncode}, "
+                f"output={output[-1600:]}"
             )
-        return result
+        return xml_results
 
     finally:
-        if tmpdir and os.path.exists(tmpdir):
+        if results_server is not None:
+            results_server.close()
+        if run_dir and os.path.exists(run_dir):
             try:
-                shutil.rmtree(tmpdir)
+                shutil.rmtree(run_dir)
             except Exception:
-                logger.warning("test_runner: failed to clean up %s", tmpdir)
+                logger.warning("test_runner: failed to clean up %s", run_dir)
+
+
+def _plan_shards(suites: list[str], max_shards: int) -> list[list[str]]:
+    """Split the suites' tests into at most TEST_SHARDS pytest invocations.
+
+    Tests are dealt round-robin in display order, so core tests land in
+    different shards. A single shard runs whole suite files.
+    """
+    node_ids = [
+        f"{suite}::{SUITE_CLASSES[suite]}::{name}"
+        for suite in suites for name in SUITE_TEST_NAMES[suite]
+    ]
+    count = max(1, min(TEST_SHARDS, max_shards, len(node_ids)))
+    if count == 1:
+        return [list(suites)]
+    return [node_ids[i::count] for i in range(count)]
+
+
+async def _run_shards(overlay: dict[str, str], shards: list[list[str]],
+                      on_result: Optional[ResultCallback] = None) -> dict[str, tuple[bool, Optional[str]]]:
+    """Run every shard in parallel and merge their per-test outcomes."""
+    tasks = [asyncio.ensure_future(_run_suites(overlay, targets, on_result)) for targets in shards]
+    try:
+        parts = await asyncio.gather(*tasks)
+    finally:
+        # One shard failing (or the run being cancelled) stops the others
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    merged = {}
+    for part in parts:
+        merged.update(part)
+    return merged
+
+
+async def _ensure_sandbox() -> None:
+    """Build the template and start the fork server off the event loop.
+
+    Both only block the first time (or after the fork server dies).
+    """
+    template_ready = _template_dir is not None and os.path.isdir(_template_dir)
+    server_ready = not _fork_server_enabled() or (_fork_server is not None and _fork_server.poll() is None)
+    if not (template_ready and server_ready):
+        await asyncio.to_thread(prepare_sandbox)
+
+
+async def _run_tests(final_code: SubmittedCode, include_hidden: bool = False,
+                     session_id: Optional[str] = None, interactive: bool = True,
+                     on_result: Optional[ResultCallback] = None) -> TestSuiteResult:
+    """Grade final_code, raising on failure so callers can see the error.
+
+    Suites already graded for the same code come from the result cache; the
+    rest are sharded across parallel pytest processes once the sandbox
+    scheduler admits them. on_result, if given, sees each TestResult as soon
+    as it is known — cached ones first.
+    """
+    user_files = submitted_files(final_code)
+    if not user_files:
+        raise ValueError("No files parsed from final_code")
+
+    await _ensure_sandbox()  # template hashes decide the overlay and cache keys
+    overlay = _overlay_files(user_files)
+    digest = _files_digest(overlay)
+
+    suites = ["test_submission.py"] + (["test_hidden.py"] if include_hidden else [])
+    xml_results = {}
+    pending = []
+    for suite in suites:
+        cached = _cache_get(digest, suite)
+        if cached is None:
+            pending.append(suite)
+        else:
+            xml_results.update(cached)
+            if on_result is not None:
+                for name in SUITE_TEST_NAMES[suite]:
+                    on_result(_test_result(name, *cached[name]))
+
+    if pending:
+        # Shard into idle slots only — under load, one process per run
+        shards = _plan_shards(pending, get_scheduler().idle_slots())
+        fresh = await get_scheduler().run(
+            lambda: _run_shards(overlay, shards, on_result),
+            session_id=session_id, interactive=interactive, weight=len(shards),
+        )
+        xml_results.update(fresh)
+        for suite in pending:
+            outcomes = {name: fresh[name] for name in SUITE_TEST_NAMES[suite] if name in fresh}
+            # Only complete suites are cached; a partial run (e.g. a
+            # collection error) is cheap to redo and may not be repeatable.
+            if len(outcomes) == len(SUITE_TEST_NAMES[suite]):
+                _cache_put(digest, suite, outcomes)
+    else:
+        logger.info("test_runner: all suites served from cache")
+
+    result = _build_suite_result(xml_results, include_hidden)
+    if result is None:
+        raise RuntimeError("no test results")
+    return result
 
 
 def _parse_junit_xml(xml_path: str, include_hidden: bool = False) -> Optional[TestSuiteResult]:
     """Parse JUnit XML produced by pytest --junitxml into TestSuiteResult."""
+    xml_results = _read_junit_xml(xml_path)
+    if xml_results is None:
+        return None
+    return _build_suite_result(xml_results, include_hidden)
+
+
+def _read_junit_xml(xml_path: str) -> Optional[dict[str, tuple[bool, Optional[str]]]]:
+    """Read pytest's JUnit XML into {test_name: (passed, error_message)}."""
     if not os.path.exists(xml_path):
         logger.warning("test_runner: JUnit XML not found at %s", xml_path)
         return None
@@ -217,38 +863,33 @@ def _parse_junit_xml(xml_path: str, include_hidden: bool = False) -> Optional[Te
         logger.warning("test_runner: failed to parse JUnit XML")
         return None
 
-    root = tree.getroot()
-
     # Extract per-test results from <testcase> elements
-    xml_results = {}  # test_name -> (passed, error_message)
-    for tc in root.iter("testcase"):
+    xml_results = {}
+    for tc in tree.getroot().iter("testcase"):
         name = tc.attrib.get("name", "")
         failure = tc.find("failure")
         error = tc.find("error")
         if failure is not None:
-            msg = failure.attrib.get("message", "Test failed")
-            xml_results[name] = (False, msg)
+            xml_results[name] = (False, failure.attrib.get("message", "Test failed"))
         elif error is not None:
-            msg = error.attrib.get("message", "Test error")
-            xml_results[name] = (False, msg)
+            xml_results[name] = (False, error.attrib.get("message", "Test error"))
         else:
             xml_results[name] = (True, None)
+    return xml_results
+
+
+def _test_result(test_name: str, passed: bool, error_message: Optional[str] = None) -> TestResult:
+    is_core = test_name in CORE_TEST_NAMES
+    if passed:
+        return TestResult(test_name=test_name, passed=True, is_core=is_core)
+    return TestResult(test_name=test_name, passed=False, error_message=error_message, is_core=is_core)
+
 
+def _build_suite_result(xml_results: dict[str, tuple[bool, Optional[str]]],
+                        include_hidden: bool = False) -> Optional[TestSuiteResult]:
+    """Turn per-test outcomes into a TestSuiteResult in display order."""
     # Known test names in display order
-    all_test_names = [
-        "test_enqueue_in_exists",
-        "test_enqueue_at_exists",
-        "test_existing_enqueue_unchanged",
-        "test_enqueue_in_returns_job",
-        "test_enqueue_at_returns_job",
-        "test_scheduled_job_not_in_queue_immediately",
-        "test_scheduled_job_in_scheduled_registry",
-        "test_enqueue_at_past_datetime",
-        "test_enqueue_in_zero_delay",
-        "test_worker_moves_ready_jobs",
-        "test_multiple_scheduled_jobs_ordering",
-        "test_job_status_lifecycle",
-    ]
+    all_test_names = list(VISIBLE_TEST_NAMES)
     if include_hidden:
         all_test_names.extend(HIDDEN_TEST_NAMES)
 
@@ -257,17 +898,12 @@ def _parse_junit_xml(xml_path: str, include_hidden: bool = False) -> Optional[Te
     total_failed = 0
 
     for test_name in all_test_names:
-        is_core = test_name in CORE_TEST_NAMES
         passed, error_msg = xml_results.get(test_name, (False, "Test not found in output"))
         if passed:
             total_passed += 1
-            results.append(TestResult(test_name=test_name, passed=True, is_core=is_core))
         else:
             total_failed += 1
-            results.append(TestResult(
-                test_name=test_name, passed=False,
-                error_message=error_msg, is_core=is_core,
-            ))
+        results.append(_test_result(test_name, passed, error_msg))
 
     total = total_passed + total_failed
     if total == 0:
@@ -287,30 +923,69 @@ def _parse_junit_xml(xml_path: str, include_hidden: bool = False) -> Optional[Te
     )
 
 
-async def run_correctness_tests(final_code: str, include_hidden: bool = False) -> Optional[TestSuiteResult]:
+async def run_correctness_tests(final_code: SubmittedCode, include_hidden: bool = False,
+                                session_id: Optional[str] = None) -> Optional[TestSuiteResult]:
     """Run the synthesized test suite against user's submitted code.
 
     Returns TestSuiteResult or None if execution fails for any reason.
     This function never raises — all errors are caught and logged.
-    Used by submit.py where we want safe fallback behavior.
+    Used by submit.py where we want safe fallback behavior, so the run is
+    never rejected by the scheduler or superseded by a later one.
     """
-    if not final_code or not final_code.strip():
+    if _no_code(final_code):
         logger.warning("test_runner: empty final_code")
         return None
 
     try:
-        return await asyncio.to_thread(_run_tests_sync, final_code, include_hidden)
+        return await _run_tests(final_code, include_hidden, session_id, interactive=False)
     except Exception:
         logger.exception("test_runner: failed to run tests")
         return None
 
 
-async def run_correctness_tests_verbose(final_code: str, include_hidden: bool = False) -> TestSuiteResult:
+async def run_correctness_tests_verbose(final_code: SubmittedCode, include_hidden: bool = False,
+                                        session_id: Optional[str] = None) -> TestSuiteResult:
     """Like run_correctness_tests but lets exceptions propagate for debugging.
 
-    Used by the /run-tests endpoint where we want to surface errors to the user.
+    Used by the /run-tests endpoint where we want to surface errors to the
+    user. The run may raise SchedulerBusy when the sandbox queue is full,
+    or RunSuperseded when the same session starts a newer run.
     """
-    if not final_code or not final_code.strip():
+    if _no_code(final_code):
         raise ValueError("empty final_code")
 
-    return await asyncio.to_thread(_run_tests_sync, final_code, include_hidden)
+    return await _run_tests(final_code, include_hidden, session_id, interactive=True)
+
+
+async def stream_correctness_tests(final_code: SubmittedCode, include_hidden: bool = False,
+                                   session_id: Optional[str] = None,
+                                   ) -> AsyncIterator[Union[TestResult, TestSuiteResult]]:
+    """Like run_correctness_tests_verbose, but yields each TestResult as its
+    test finishes and the full TestSuiteResult last.
+
+    Closing the iterator early (e.g. the client disconnected) cancels the run.
+    """
+    if _no_code(final_code):
+        raise ValueError("empty final_code")
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            queue.put_nowait(await _run_tests(
+                final_code, include_hidden, session_id, interactive=True, on_result=queue.put_nowait,
+            ))
+        except Exception as e:
+            queue.put_nowait(e)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            if isinstance(item, TestSuiteResult):
+                return
+    finally:
+        task.cancel()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+pytest plugin for the sandbox runner, loaded with `-p result_stream`.
+
+--result-order=a,b,c   run tests in this order (by test name); the runner
+                       passes the display order, so core tests go first.
+--result-socket=PATH   send each test's outcome as a JSON line to the Unix
+                       socket at PATH as soon as it is known:
+                           {"test_name": str, "passed": bool, "error_message": str|null}
+
+Streaming is best-effort: if the socket can't be reached the run carries
+on, and the JUnit XML report stays the source of truth for the summary.
+"""
+
+import json
+import socket
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("sponge")
+    group.addoption("--result-socket", default=None,
+                    help="Unix socket to stream per-test outcomes to")
+    group.addoption("--result-order", default="",
+                    help="comma-separated test names to run first, in order")
+
+
+def pytest_configure(config):
+    path = config.getoption("result_socket")
+    if path:
+        try:
+            config.pluginmanager.register(_ResultStream(path), "sponge_result_stream")
+        except OSError:
+            pass
+
+
+def pytest_collection_modifyitems(config, items):
+    order = [name for name in config.getoption("result_order").split(",") if name]
+    if order:
+        rank = {name: i for i, name in enumerate(order)}
+        items.sort(key=lambda item: rank.get(item.name, len(rank)))
+
+
+def _failure_message(report) -> str:
+    # Same message the JUnit report records
+    reprcrash = getattr(report.longrepr, "reprcrash", None)
+    if reprcrash is not None:
+        return reprcrash.message
+    return str(report.longrepr)
+
+
+class _ResultStream:
+
+    def __init__(self, path: str):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._failed = set()
+
+    def _send(self, name: str, passed: bool, message=None) -> None:
+        if self._sock is None:
+            return
+        line = json.dumps({"test_name": name, "passed": passed, "error_message": message}) + "\n"
+        try:
+            self._sock.sendall(line.encode())
+        except OSError:
+            self._sock = None
+
+    def pytest_runtest_logreport(self, report):
+        name = report.nodeid.split("::")[-1]
+        if report.failed and report.nodeid not in self._failed:
+            # Setup, call or teardown — the first failure decides the test
+            self._failed.add(report.nodeid)
+            self._send(name, False, _failure_message(report))
+        elif report.when == "teardown" and report.nodeid not in self._failed:
+            self._send(name, True)
+
+    def pytest_unconfigure(self, config):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -17,7 +17,6 @@ and are not visible to the candidate in the frontend.
 
 import os
 import sys
-import time
 from datetime import datetime, timedelta
 
 RQ_ROOT = os.environ.get("RQ_CODEBASE_PATH", os.path.join(
@@ -35,6 +34,9 @@ from tests.fixtures import say_hello, do_nothing, some_calculation, div_by_zero,
 from rq import Queue
 from rq.job import Job
 
+# Moves the sandbox's virtual clock; a real sleep when run standalone.
+from virtual_clock import advance_clock
+
 
 class TestHidden(RQTestCase):
     """Hidden tests — edge cases and robustness for delayed job execution."""
@@ -52,7 +54,7 @@ class TestHidden(RQTestCase):
         self.assertIsNotNone(job.id)
 
         # Should be processable immediately
-        time.sleep(0.5)
+        advance_clock(0.5)
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
 
@@ -77,7 +79,7 @@ class TestHidden(RQTestCase):
 
         self.assertIsNotNone(job)
 
-        time.sleep(2)
+        advance_clock(2)
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
 
@@ -147,7 +149,7 @@ class TestHidden(RQTestCase):
         # Schedule a job with short delay
         scheduled_job = q.enqueue_in(timedelta(seconds=1), say_hello, "scheduled")
 
-        time.sleep(2)
+        advance_clock(2)
 
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
@@ -178,7 +180,7 @@ class TestHidden(RQTestCase):
 
         self.assertNotEqual(job_a.id, job_b.id, "Jobs should have different IDs")
 
-        time.sleep(2)
+        advance_clock(2)
 
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
@@ -198,7 +200,7 @@ class TestHidden(RQTestCase):
         q = Queue(connection=self.testconn)
         job = q.enqueue_in(timedelta(seconds=1), div_by_zero, 5)
 
-        time.sleep(2)
+        advance_clock(2)
 
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
@@ -223,7 +225,7 @@ class TestHidden(RQTestCase):
         future = datetime.utcnow() + timedelta(seconds=1)
         job = q.enqueue_at(future, echo, "hello", 42, key="value")
 
-        time.sleep(2)
+        advance_clock(2)
 
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
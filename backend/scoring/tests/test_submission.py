@@ -25,7 +25,6 @@ patterns in rq-v1.0/tests/ using RQTestCase as the base class.
 
 import os
 import sys
-import time
 from datetime import datetime, timedelta
 
 # Add rq-v1.0 to the path so we can import the modified RQ codebase.
@@ -46,6 +45,9 @@ from tests.fixtures import say_hello, do_nothing
 from rq import Queue
 from rq.job import Job
 
+# Moves the sandbox's virtual clock; a real sleep when run standalone.
+from virtual_clock import advance_clock
+
 # List of core test names (P3 triggers)
 CORE_TESTS = [
     "test_enqueue_in_exists",
@@ -206,7 +208,7 @@ class TestSubmission(RQTestCase):
         w = Worker([q], connection=self.testconn)
 
         # Give the scheduler a moment if needed
-        time.sleep(0.5)
+        advance_clock(0.5)
         w.work(burst=True)
 
         job = Job.fetch(job.id, connection=self.testconn)
@@ -227,7 +229,7 @@ class TestSubmission(RQTestCase):
 
         from rq import Worker
         w = Worker([q], connection=self.testconn)
-        time.sleep(0.5)
+        advance_clock(0.5)
         w.work(burst=True)
 
         job = Job.fetch(job.id, connection=self.testconn)
@@ -244,7 +246,7 @@ class TestSubmission(RQTestCase):
         job = q.enqueue_in(timedelta(seconds=1), say_hello, "delayed")
 
         # Wait for the scheduled time to pass
-        time.sleep(2)
+        advance_clock(2)
 
         from rq import Worker
         w = Worker([q], connection=self.testconn)
@@ -269,7 +271,7 @@ class TestSubmission(RQTestCase):
         job_b = q.enqueue_in(timedelta(seconds=1), say_hello, "B")
 
         # After 2 seconds, job_b should be ready but job_a should not
-        time.sleep(2)
+        advance_clock(2)
 
         from rq import Worker
         w = Worker([q], connection=self.testconn)
@@ -311,7 +313,7 @@ class TestSubmission(RQTestCase):
         )
 
         # Wait for delay to pass, then run worker
-        time.sleep(2)
+        advance_clock(2)
         from rq import Worker
         w = Worker([q], connection=self.testconn)
         w.work(burst=True)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Controllable clock for the synthesized scoring suites.
+
+The sandbox conftest installs it before rq is imported. From then on
+time.time(), datetime.datetime.now()/utcnow()/today() — and through them
+rq.utils.utcnow() and rq.utils.current_timestamp() — read a virtual clock.
+advance_clock() moves it forward, so a test waiting for a scheduled job to
+become due skips the wait instead of sleeping through it.
+
+Virtual time only passes when a test advances it or any code sleeps
+(time.sleep still really sleeps, and moves the clock by the same amount).
+Each read also ticks it forward by a microsecond, so busy-wait loops end.
+It starts half-way through a second, so rq's whole-second timestamps never
+straddle a boundary by accident: a job due in 3s is never ready after 2s,
+however slowly the sandbox runs.
+
+Outside the sandbox (clock not installed) advance_clock() really sleeps, so
+the suites behave the same when run on their own.
+"""
+
+import datetime as _datetime_module
+import math
+import threading
+import time as _time_module
+
+_real_time = _time_module.time
+_real_sleep = _time_module.sleep
+_real_datetime = _datetime_module.datetime
+
+TICK_S = 1e-6
+
+_now = 0.0
+_lock = threading.Lock()
+_installed = False
+
+
+def now() -> float:
+    """Virtual replacement for time.time()."""
+    global _now
+    with _lock:
+        _now += TICK_S
+        return _now
+
+
+def now_ns() -> int:
+    """Virtual replacement for time.time_ns()."""
+    return int(now() * 1_000_000_000)
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep that also lets the same amount of virtual time pass."""
+    _real_sleep(seconds)
+    _advance(seconds)
+
+
+class _VirtualDatetimeMeta(type):
+    # Datetimes built by the real class (arithmetic, C helpers) are still
+    # instances of the patched datetime.datetime as far as callers can tell.
+    def __instancecheck__(cls, obj):
+        return isinstance(obj, _real_datetime)
+
+    def __subclasscheck__(cls, subclass):
+        return issubclass(subclass, _real_datetime)
+
+
+class VirtualDatetime(_real_datetime, metaclass=_VirtualDatetimeMeta):
+    """datetime.datetime whose notion of "now" follows the virtual clock."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(now(), tz)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.fromtimestamp(now(), _datetime_module.timezone.utc).replace(tzinfo=None)
+
+    @classmethod
+    def today(cls):
+        return cls.now()
+
+
+def install() -> None:
+    """Patch time and datetime. Safe to call again.
+
+    The clock starts at the current whole real second plus 0.5 and is
+    monotonic across calls: a repeat call sets it to the later of its
+    current value and that real-time mark, so it never resets or goes
+    back, and virtual time already advanced is kept.
+    """
+    global _installed, _now
+    with _lock:
+        _now = max(_now, math.floor(_real_time()) + 0.5)
+    if _installed:
+        return
+    _time_module.time = now
+    _time_module.time_ns = now_ns
+    _time_module.sleep = sleep
+    _datetime_module.datetime = VirtualDatetime
+    _installed = True
+
+
+def _advance(seconds: float) -> None:
+    global _now
+    if seconds > 0:
+        with _lock:
+            _now += seconds
+
+
+def advance_clock(seconds: float) -> None:
+    """Move virtual time forward (or sleep for real when not installed)."""
+    if not _installed:
+        _real_sleep(seconds)
+        return
+    _advance(seconds)
@@ -0,0 +1,141 @@
+"""
+Indexed view of a session's event log, built once per scoring pass.
+
+The engine asks the same few questions of the event log from every
+category: how many prompt windows contain an edit or a test run, which
+ai_apply events were followed by an edit within 30s, what happened after
+the first test run. Answering each by rescanning session.events is
+O(prompts × events), which gets slow for long sessions with thousands of
+file_edit events.
+
+SessionTimeline groups the event timestamps by type once, keeps a sorted timestamp
+array per type, and answers window questions by bisection. Answers are
+identical to the scans they replace, including their edge cases: windows
+are open intervals, prompt windows follow prompt_sent events in log order
+(the last one open-ended), and "after the first test run" follows the
+stable ts-sorted order of the whole log.
+
+A file_edit row may stand for a burst of edits (a span, see
+models.event.coalesce_edit); window questions only need its first edit,
+and counts are of rows.
+
+It also counts the conversation-level signals several categories share:
+prompts per vocabulary, near-duplicate consecutive prompts and follow-ups
+that echo the preceding AI response.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from models.event import event_rows
+from models.session import Session
+from scoring.vocabulary import _word_overlap, vocabularies
+
+APPLY_EDIT_WINDOW_MS = 30_000   # an ai_apply counts as reviewed if edited within this
+REPROMPT_OVERLAP = 0.6          # consecutive prompts this similar are a passive re-ask
+ECHO_OVERLAP = 0.15             # a follow-up this close to the last response quotes it
+
+
+class SessionTimeline:
+    """Per-type event lists and sorted timestamps for one session."""
+
+    __slots__ = ("prompts", "responses", "start_ms", "_logged", "_ts",
+                 "_order", "_windows", "_window_counts",
+                 "_vocab", "_similar", "_echoing", "_counted")
+
+    def __init__(self, session: Session):
+        self.start_ms = int(session.started_at.timestamp() * 1000)
+        self._set_conversation(session.conversation_history)
+
+        rows = [(kind, ts) for kind, ts, _, _ in event_rows(session.events)]
+        self._logged: dict[str, list[int]] = {}
+        for kind, ts in rows:
+            self._logged.setdefault(kind, []).append(ts)
+        self._ts = {kind: sorted(logged) for kind, logged in self._logged.items()}
+
+        # Position of each type's first and last event in stable ts order
+        self._order: dict[str, tuple[int, int]] = {}
+        for pos, (kind, _) in enumerate(sorted(rows, key=lambda r: r[1])):
+            first, _ = self._order.get(kind, (pos, pos))
+            self._order[kind] = (first, pos)
+
+        prompt_ts = self.timestamps("prompt_sent")
+        self._windows = list(zip(prompt_ts, prompt_ts[1:] + [float("inf")]))
+        self._window_counts: dict[str, int] = {}
+
+    def timestamps(self, kind: str) -> list[int]:
+        """Timestamps of one event type, in log order."""
+        return self._logged.get(kind, [])
+
+    def count(self, kind: str) -> int:
+        return len(self._logged.get(kind, ()))
+
+    def count_between(self, kind: str, lo: float, hi: float) -> int:
+        """Events of kind with lo < ts < hi."""
+        ts = self._ts.get(kind)
+        if not ts or hi <= lo:
+            return 0
+        return max(0, bisect_left(ts, hi) - bisect_right(ts, lo))
+
+    def count_before(self, kind: str, ts: float) -> int:
+        """Events of kind with ts strictly before ts."""
+        return bisect_left(self._ts.get(kind, []), ts)
+
+    def prompt_windows_with(self, kind: str) -> int:
+        """Prompt windows (prompt_sent to the next, or open-ended) containing kind."""
+        if kind not in self._window_counts:
+            self._window_counts[kind] = sum(
+                1 for lo, hi in self._windows if self.count_between(kind, lo, hi)
+            )
+        return self._window_counts[kind]
+
+    def applies_without_edit(self) -> int:
+        """ai_apply events with no file_edit within APPLY_EDIT_WINDOW_MS after."""
+        return sum(
+            1 for ts in self.timestamps("ai_apply")
+            if not self.count_between("file_edit", ts, ts + APPLY_EDIT_WINDOW_MS)
+        )
+
+    def _set_conversation(self, history: list[dict]) -> None:
+        self.prompts: list[str] = [t["content"] for t in history if t.get("role") == "user"]
+        self.responses: list[str] = [t["content"] for t in history if t.get("role") == "assistant"]
+        self._vocab: Counter = Counter()
+        self._similar = 0
+        self._echoing = 0
+        self._counted = (0, 0)   # prompts and follow-up pairs included so far
+
+    def _count_conversation(self) -> None:
+        """Extend the prompt counts to prompts / pairs added since the last call."""
+        counted_prompts, counted_pairs = self._counted
+        prompts, responses = self.prompts, self.responses
+        for i in range(counted_prompts, len(prompts)):
+            self._vocab.update(vocabularies(prompts[i]))
+            if i and _word_overlap(prompts[i - 1], prompts[i]) > REPROMPT_OVERLAP:
+                self._similar += 1
+        # Follow-up i (prompt i, i >= 1) pairs with the response before it
+        pairs = min(len(prompts) - 1, len(responses)) if prompts else 0
+        for i in range(counted_pairs + 1, pairs + 1):
+            if _word_overlap(prompts[i], responses[i - 1]) > ECHO_OVERLAP:
+                self._echoing += 1
+        self._counted = (len(prompts), max(pairs, 0))
+
+    def prompts_with(self, vocabulary: str) -> int:
+        """User prompts with a term from vocabulary ("rq", "tradeoff", "edge_case")."""
+        self._count_conversation()
+        return self._vocab[vocabulary]
+
+    def similar_prompt_pairs(self) -> int:
+        """Consecutive prompt pairs with word overlap > REPROMPT_OVERLAP."""
+        self._count_conversation()
+        return self._similar
+
+    def echoing_followups(self) -> int:
+        """Follow-up prompts with word overlap > ECHO_OVERLAP with the preceding response."""
+        self._count_conversation()
+        return self._echoing
+
+    def after_first(self, kind: str, other: str) -> bool:
+        """Whether an event of other follows the first event of kind in ts order."""
+        if kind not in self._order or other not in self._order:
+            return False
+        return self._order[other][1] > self._order[kind][0]
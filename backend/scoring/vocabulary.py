@@ -4,9 +4,26 @@ RQ-specific vocabulary for grounded prompt detection and keyword matching.
 Extracted from engine.py — these term dictionaries and helper functions
 are used by the scoring engine to detect domain-specific language in
 user prompts.
+
+All three vocabularies are compiled into one regex, so a prompt is
+classified against every vocabulary in a single scan (vocabularies()).
+The grounding vocabulary is RQ_TERMS plus the module, class and function
+names read from the RQ sources themselves. Classifications are memoized
+per message digest, since metrics.py and engine.py ask about the same
+prompts and responses several times per score; word sets only for the
+last few messages, which _word_overlap compares pairwise.
 """
 
+import hashlib
+import os
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from gemini.symbol_index import file_symbols, name_parts
+from scoring.paths import RQ_SOURCE
 
 
 # ---------- RQ-specific vocabulary for grounded prompt detection ----------
@@ -43,27 +60,160 @@ EDGE_CASE_TERMS = {
 }
 
 
+MEMO_SIZE = 4096       # message digests whose classification is kept
+WORDS_MEMO_SIZE = 32   # messages whose word set is kept
+
+# Sources that aren't part of the codebase the candidate works in
+_SKIP_SOURCES = {"compat", "dummy.py", "__init__.py"}
+
+
+# ---------- Terms from the RQ sources ----------
+
+def rq_source_terms(root: Optional[str] = None) -> frozenset[str]:
+    """Lower-cased module file names and public definition names under root.
+
+    Definitions must have at least two name parts ("enqueue_call",
+    "StartedJobRegistry"), so generic names like `to_dict` or `get_ident`
+    don't make a prompt count as grounded.
+    """
+    root = root or os.path.join(RQ_SOURCE, "rq")
+    terms = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "__pycache__" and d not in _SKIP_SOURCES]
+        for filename in filenames:
+            if not filename.endswith(".py") or filename in _SKIP_SOURCES:
+                continue
+            terms.add(filename.lower())
+            try:
+                with open(os.path.join(dirpath, filename), encoding="utf-8") as f:
+                    symbols = file_symbols(filename, f.read()).symbols
+            except (OSError, UnicodeDecodeError):
+                continue
+            for symbol in symbols:
+                if not symbol.name.startswith("_") and len(name_parts(symbol.name)) >= 2:
+                    terms.add(symbol.name.lower())
+    return frozenset(terms)
+
+
+# ---------- Combined matcher ----------
+
+def _trie_pattern(terms) -> str:
+    """Regex matching any of terms, factored into a character trie.
+
+    re tries alternatives one by one, so a flat alternation of ~250 terms
+    is slow; sharing prefixes keeps each position to a few comparisons.
+    Optional tails are greedy, so a match is the longest term at its start.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class _Matcher:
+    """One trie regex over every term, with the vocabularies each term implies.
+
+    Scanning restarts one character after each match start, so every
+    position where some term begins is visited and matched with the
+    longest term starting there. A shorter term at the same position is a
+    prefix of that match, so mapping each term to every vocabulary with a
+    term inside it finds exactly the vocabularies `term in text` would.
+    """
+
+    __slots__ = ("pattern", "implies", "names")
+
+    def __init__(self, vocabularies: dict[str, frozenset[str]]):
+        terms = set().union(*vocabularies.values())
+        self.pattern = re.compile(_trie_pattern(terms))
+        self.implies = {
+            term: frozenset(name for name, vocab in vocabularies.items()
+                            if any(v in term for v in vocab))
+            for term in terms
+        }
+        self.names = frozenset(vocabularies)
+
+    def classify(self, lower: str) -> frozenset[str]:
+        found = frozenset()
+        pos = 0
+        while found != self.names:
+            match = self.pattern.search(lower, pos)
+            if match is None:
+                break
+            found |= self.implies[match.group()]
+            pos = match.start() + 1
+        return found
+
+
+_matcher: Optional[_Matcher] = None
+_matcher_lock = threading.Lock()
+
+
+def _get_matcher() -> _Matcher:
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = _Matcher({
+                "rq": frozenset(RQ_TERMS) | rq_source_terms(),
+                "tradeoff": frozenset(TRADEOFF_TERMS),
+                "edge_case": frozenset(EDGE_CASE_TERMS),
+            })
+        return _matcher
+
+
+_classified: "OrderedDict[bytes, frozenset[str]]" = OrderedDict()   # sha1(text) → vocabularies
+_classified_lock = threading.Lock()
+
+
+def vocabularies(text: str) -> frozenset[str]:
+    """Which of "rq", "tradeoff", "edge_case" have a term in text."""
+    key = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+    with _classified_lock:
+        found = _classified.get(key)
+        if found is not None:
+            _classified.move_to_end(key)
+            return found
+    found = _get_matcher().classify(text.lower())
+    with _classified_lock:
+        _classified[key] = found
+        while len(_classified) > MEMO_SIZE:
+            _classified.popitem(last=False)
+    return found
+
+
+@lru_cache(maxsize=WORDS_MEMO_SIZE)
+def _words(text: str) -> frozenset[str]:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
 # ---------- Vocabulary helper functions ----------
 
 def _is_grounded(prompt: str) -> bool:
-    lower = prompt.lower()
-    return any(term in lower for term in RQ_TERMS)
+    return "rq" in vocabularies(prompt)
 
 
 def _has_tradeoff_language(prompt: str) -> bool:
-    lower = prompt.lower()
-    return any(term in lower for term in TRADEOFF_TERMS)
+    return "tradeoff" in vocabularies(prompt)
 
 
 def _has_edge_case_language(prompt: str) -> bool:
-    lower = prompt.lower()
-    return any(term in lower for term in EDGE_CASE_TERMS)
+    return "edge_case" in vocabularies(prompt)
 
 
 def _word_overlap(a: str, b: str) -> float:
     """Jaccard similarity between word sets of two strings."""
-    wa = set(re.findall(r"\w+", a.lower()))
-    wb = set(re.findall(r"\w+", b.lower()))
+    wa = _words(a)
+    wb = _words(b)
     if not wa or not wb:
         return 0.0
     return len(wa & wb) / len(wa | wb)
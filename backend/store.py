@@ -1,8 +1,419 @@
 """
-In-memory session store shared across all routes.
-For the hackathon, sessions live in a plain dict — no DB needed.
+Session store shared across all routes.
+
+`store.sessions` keeps the dict-style access the routes grew up with
+(`get`, `[]`, `pop`, `values`) and adds the operations a store outside
+process memory needs. Routes change sessions in place and then persist
+only what they changed: `save(session, *fields)` for top-level fields,
+`append_events(session_id, rows)` / `append_event(session_id, event)` for
+the event log, which is appended to, never rewritten.
+
+SPONGE_SESSION_STORE selects the backend:
+  memory  (default) process-local LRU of SPONGE_SESSION_MAX sessions that
+          expire after SPONGE_SESSION_TTL seconds idle. With
+          SPONGE_SESSION_SPILL_DIR set, sessions pushed out of the LRU are
+          written there and loaded back on their next request instead of
+          being lost. Keeps the live score accumulators (scoring/live.py).
+  redis   a hash of JSON fields plus an event list per session at
+          SPONGE_REDIS_URL, shared by every uvicorn worker and surviving
+          restarts; both keys expire SPONGE_SESSION_TTL after the last
+          write. Events are stored as compact [event, ts, file, meta]
+          rows. Sessions are loaded fresh per request, so scoring replays
+          the event log rather than reading live accumulators.
+
+With SPONGE_EDIT_COALESCE_MS > 0 (default 0: off), consecutive file_edit
+events on one file, each within that many ms of the previous, are stored
+as a single span event: the first edit with meta {"end": ts, "count": n}.
+Edits arriving out of order are never merged, but an event arriving late
+inside an already merged burst can shift scores — see
+models.event.coalesce_edit — so only enable it for clients that deliver
+events in order.
+
+Missing sessions are still created on first use (get_or_create), so a
+client whose session was lost or expired carries on with a fresh one.
 """
 
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+from models.event import Event, EventLog, EventRow, coalesce_edit, event_rows, row_latest_ts
 from models.session import Session
+from scoring.live import ingest_rows
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_MODE = os.environ.get("SPONGE_SESSION_STORE", "memory")
+SESSION_TTL_S = int(os.environ.get("SPONGE_SESSION_TTL", str(7 * 86400)))
+SESSION_MAX = int(os.environ.get("SPONGE_SESSION_MAX", "5000"))
+SESSION_SPILL_DIR = os.environ.get("SPONGE_SESSION_SPILL_DIR") or None
+REDIS_URL = os.environ.get("SPONGE_REDIS_URL", "redis://localhost:6379/0")
+EDIT_COALESCE_MS = int(os.environ.get("SPONGE_EDIT_COALESCE_MS", "0"))
+
+REDIS_KEY_PREFIX = "sponge:session:"
+REDIS_LATEST_TS_FIELD = "events_latest_ts"   # kept in the hash while coalescing edits
+
+# Top-level Session fields stored (and saved) individually; events are separate
+FIELDS = tuple(f for f in Session.model_fields if f != "events")
+
+_COMPACT = (",", ":")
+
+
+# ---------- Serialization ----------
+
+def pack_row(row: EventRow) -> str:
+    """One event as a compact JSON row; session_id is implied by the session."""
+    row = list(row)
+    while row[-1] is None:
+        row.pop()
+    return json.dumps(row, separators=_COMPACT)
+
+
+def pack_event(event: Event) -> str:
+    return pack_row((event.event, event.ts, event.file, event.meta))
+
+
+def unpack_row(raw) -> EventRow:
+    row = json.loads(raw)
+    row += [None] * (4 - len(row))
+    return tuple(row)
+
+
+def _fields_json(session: Session, fields) -> dict[str, str]:
+    data = session.model_dump(mode="json", include=set(fields))
+    return {field: json.dumps(data[field], separators=_COMPACT) for field in fields}
+
+
+def _session_from(session_id: str, fields: dict[str, str], rows) -> Session:
+    data = {field: json.loads(value) for field, value in fields.items()
+            if field != REDIS_LATEST_TS_FIELD}
+    data["session_id"] = session_id
+    data["events"] = EventLog(session_id, map(unpack_row, rows))
+    return Session.model_validate(data)
+
+
+# ---------- Interface ----------
+
+class SessionStore:
+    """What the routes need from a session store; backends implement the
+    first six methods, the dict-style helpers are shared."""
+
+    def get(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def put(self, session: Session) -> None:
+        """Store the whole session, replacing any previous version."""
+        raise NotImplementedError
+
+    def save(self, session: Session, *fields: str) -> None:
+        """Persist the given top-level fields (all but events when none given)."""
+        raise NotImplementedError
+
+    def append_events(self, session_id: str, rows: list[EventRow]) -> None:
+        """Append (event, ts, file, meta) rows to the session's event log,
+        creating the session if needed."""
+        raise NotImplementedError
+
+    def pop(self, session_id: str, default=None) -> Optional[Session]:
+        raise NotImplementedError
+
+    def values(self) -> Iterator[Session]:
+        raise NotImplementedError
+
+    def get_or_create(self, session_id: str) -> Session:
+        session = self.get(session_id)
+        if session is None:
+            session = Session(session_id=session_id)
+            self.put(session)
+        return session
+
+    def append_event(self, session_id: str, event: Event) -> None:
+        self.append_events(session_id, [(event.event, event.ts, event.file, event.meta)])
+
+    def __getitem__(self, session_id: str) -> Session:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: Session) -> None:
+        self.put(session)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+# ---------- Backends ----------
+
+class MemorySessionStore(SessionStore):
+    """Process-local LRU with idle expiry and an optional disk spill."""
+
+    def __init__(self, size: int = SESSION_MAX, ttl_s: int = SESSION_TTL_S,
+                 spill_dir: Optional[str] = SESSION_SPILL_DIR, coalesce_ms: int = EDIT_COALESCE_MS):
+        self.size = size
+        self.ttl_s = ttl_s
+        self.spill_dir = spill_dir
+        self.coalesce_ms = coalesce_ms
+        self._sessions: OrderedDict[str, tuple[float, Session]] = OrderedDict()
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # -- spill files --
+
+    def _spill_path(self, session_id: str) -> str:
+        # Ids come from clients: a digest keeps distinct ids in distinct files
+        name = hashlib.sha256(session_id.encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.spill_dir, name + ".json")
+
+    def _spill(self, session: Session) -> None:
+        path = self._spill_path(session.session_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        record = {
+            "fields": _fields_json(session, FIELDS),
+            "events": [pack_row(row) for row in event_rows(session.events)],
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, separators=_COMPACT)
+        os.replace(tmp, path)
+
+    def _read_spilled(self, path: str) -> Optional[Session]:
+        try:
+            if os.path.getmtime(path) + self.ttl_s <= time.time():
+                os.unlink(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        session_id = json.loads(record["fields"]["session_id"])
+        return _session_from(session_id, record["fields"], record["events"])
+
+    def _unspill(self, session_id: str) -> Optional[Session]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        session = self._read_spilled(path)
+        if session is not None:
+            os.unlink(path)   # back in memory; re-spilled if evicted again
+        return session
+
+    # -- LRU --
+
+    def _insert(self, session: Session) -> None:
+        """Store under the lock; evicts past size."""
+        self._sessions[session.session_id] = (time.time() + self.ttl_s, session)
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.size:
+            _, (_, evicted) = self._sessions.popitem(last=False)
+            if self.spill_dir:
+                try:
+                    self._spill(evicted)
+                except OSError:
+                    logger.exception("Could not spill session %s", evicted.session_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._sessions[session_id] = (time.time() + self.ttl_s, entry[1])
+                    self._sessions.move_to_end(session_id)
+                    return entry[1]
+                del self._sessions[session_id]
+                return None
+            session = self._unspill(session_id)
+            if session is not None:
+                self._insert(session)
+            return session
+
+    def put(self, session: Session) -> None:
+        with self._lock:
+            self._insert(session)
+
+    def save(self, session: Session, *fields: str) -> None:
+        # Changed in place already; make sure it is (still) the stored copy
+        self.put(session)
+
+    def append_events(self, session_id: str, rows: list[EventRow]) -> None:
+        session = self.get_or_create(session_id)
+        with self._lock:
+            ingest_rows(session, rows, self.coalesce_ms)
+
+    def pop(self, session_id: str, default=None) -> Optional[Session]:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            spilled = self._unspill(session_id)
+        if entry is not None:
+            return entry[1]
+        return spilled if spilled is not None else default
+
+    def values(self) -> Iterator[Session]:
+        now = time.time()
+        with self._lock:
+            live = [s for expires, s in self._sessions.values() if expires > now]
+        yield from live
+        if self.spill_dir:
+            for name in os.listdir(self.spill_dir):
+                if name.endswith(".json"):
+                    session = self._read_spilled(os.path.join(self.spill_dir, name))
+                    if session is not None:
+                        yield session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class RedisSessionStore(SessionStore):
+    """A hash of JSON-encoded fields and an event list per session, in any
+    Redis-compatible server."""
+
+    def __init__(self, url: str = REDIS_URL, ttl_s: int = SESSION_TTL_S, client=None,
+                 coalesce_ms: int = EDIT_COALESCE_MS):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl_s = ttl_s
+        self.coalesce_ms = coalesce_ms
+
+    @staticmethod
+    def _keys(session_id: str) -> tuple[str, str]:
+        key = REDIS_KEY_PREFIX + session_id
+        return key, key + ":events"
+
+    def _expire(self, pipe, session_id: str) -> None:
+        for key in self._keys(session_id):
+            pipe.expire(key, self.ttl_s)
+
+    def _ensure(self, pipe, session_id: str) -> None:
+        """Queue creating session_id's hash if it doesn't exist yet (no read)."""
+        key, _ = self._keys(session_id)
+        for field, value in _fields_json(Session(session_id=session_id), FIELDS).items():
+            pipe.hsetnx(key, field, value)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        key, events_key = self._keys(session_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.lrange(events_key, 0, -1)
+        fields, rows = pipe.execute()
+        if not fields:
+            return None
+        fields = {f.decode(): v for f, v in fields.items()}
+        return _session_from(session_id, fields, rows)
+
+    def get_or_create(self, session_id: str) -> Session:
+        session = self.get(session_id)
+        if session is None:
+            # Another worker may be creating it too: only fill what is missing
+            pipe = self.client.pipeline()
+            self._ensure(pipe, session_id)
+            self._expire(pipe, session_id)
+            pipe.execute()
+            session = self.get(session_id)
+        return session
+
+    def put(self, session: Session) -> None:
+        key, events_key = self._keys(session.session_id)
+        pipe = self.client.pipeline()
+        pipe.delete(events_key)
+        pipe.hdel(key, REDIS_LATEST_TS_FIELD)     # recomputed by the next coalesced append
+        pipe.hset(key, mapping=_fields_json(session, FIELDS))
+        if session.events:
+            pipe.rpush(events_key, *(pack_row(row) for row in event_rows(session.events)))
+        self._expire(pipe, session.session_id)
+        pipe.execute()
+
+    def save(self, session: Session, *fields: str) -> None:
+        key, _ = self._keys(session.session_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=_fields_json(session, fields or FIELDS))
+        self._expire(pipe, session.session_id)
+        pipe.execute()
+
+    def append_events(self, session_id: str, rows: list[EventRow]) -> None:
+        _, events_key = self._keys(session_id)
+        if self.coalesce_ms > 0:
+            self._append_coalesced(session_id, rows)
+            return
+        pipe = self.client.pipeline()
+        self._ensure(pipe, session_id)
+        if rows:
+            pipe.rpush(events_key, *map(pack_row, rows))
+        self._expire(pipe, session_id)
+        pipe.execute()
+
+    def _append_coalesced(self, session_id: str, rows: list[EventRow]) -> None:
+        """Append with edit bursts folded into the log's last row: read its
+        tail and latest ts, rewrite the last row (LSET) and push the rest,
+        retried if another worker appends in between."""
+        from redis.exceptions import WatchError
+
+        key, events_key = self._keys(session_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key, events_key)
+                    tail = [unpack_row(raw) for raw in pipe.lrange(events_key, -2, -1)]
+                    latest = pipe.hget(key, REDIS_LATEST_TS_FIELD)
+                    if latest is not None:
+                        latest = int(latest)
+                    elif tail:
+                        # Not tracked yet (log written by put or before coalescing)
+                        latest = max(row_latest_ts(unpack_row(raw)) for raw in pipe.lrange(events_key, 0, -1))
+                    stored = len(tail)
+                    last = tail[-1] if tail else None
+                    for row in rows:
+                        merged = None
+                        if tail:
+                            before = tail[-2] if len(tail) > 1 else None
+                            merged = coalesce_edit(before, tail[-1], row, self.coalesce_ms, latest)
+                        if merged is not None:
+                            tail[-1] = merged
+                        else:
+                            tail.append(row)
+                        latest = row[1] if latest is None else max(latest, row[1])
+                    pipe.multi()
+                    self._ensure(pipe, session_id)
+                    if latest is not None:
+                        pipe.hset(key, REDIS_LATEST_TS_FIELD, latest)
+                    if stored and tail[stored - 1] != last:
+                        pipe.lset(events_key, -1, pack_row(tail[stored - 1]))
+                    if len(tail) > stored:
+                        pipe.rpush(events_key, *map(pack_row, tail[stored:]))
+                    self._expire(pipe, session_id)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def pop(self, session_id: str, default=None) -> Optional[Session]:
+        session = self.get(session_id)
+        self.client.delete(*self._keys(session_id))
+        return session if session is not None else default
+
+    def values(self) -> Iterator[Session]:
+        for key in self.client.scan_iter(match=REDIS_KEY_PREFIX + "*", count=500):
+            key = key.decode()
+            if key.endswith(":events"):
+                continue
+            session = self.get(key[len(REDIS_KEY_PREFIX):])
+            if session is not None:
+                yield session
+
+
+def _open_store() -> SessionStore:
+    if SESSION_STORE_MODE == "redis":
+        return RedisSessionStore()
+    if SESSION_STORE_MODE != "memory":
+        logger.warning("Unknown SPONGE_SESSION_STORE=%r — using memory", SESSION_STORE_MODE)
+    return MemorySessionStore()
+
 
-sessions: dict[str, Session] = {}
+sessions: SessionStore = _open_store()
@@ -0,0 +1,139 @@
+"""
+Tests for the cached prompt prefix (gemini/context_cache.py): layout,
+once-per-model registration, TTL extension and the uncached fallbacks.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from gemini import client as gemini_client
+from gemini import context_cache
+from gemini import service as gemini_service
+from gemini.config import GEMINI_MODEL_CHAIN
+from gemini.context_cache import GeminiCacheBackend, LocalCacheBackend, PrefixCache
+from gemini.service import GeminiService
+from gemini.system_prompt import SYSTEM_PROMPT
+
+BASELINE = {
+    "rq/queue.py": "class Queue:\n    def enqueue(self, f):\n        pass\n",
+    "rq/worker.py": "class Worker:\n    def work(self):\n        pass\n",
+}
+EDITED_QUEUE = BASELINE["rq/queue.py"] + "\n    def enqueue_in(self, delay, f):\n        pass\n"
+
+
+class FakeModels:
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.error = error
+
+    async def generate_content(self, *, model, contents, config):
+        self.calls.append(SimpleNamespace(model=model, contents=contents, config=config))
+        if self.error is not None and config.cached_content:
+            raise self.error
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+
+class FakeCaches:
+
+    def __init__(self, fail: bool = False):
+        self.created = []
+        self.fail = fail
+
+    async def create(self, *, model, config):
+        if self.fail:
+            raise Exception("400 INVALID_ARGUMENT: caching not supported")
+        self.created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def update(self, *, name, config):
+        pass
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    def install(backend, models=None, caches=None) -> FakeModels:
+        models = models or FakeModels()
+        fake = SimpleNamespace(aio=SimpleNamespace(models=models, caches=caches or FakeCaches()))
+        monkeypatch.setattr(gemini_client, "get_client", lambda: fake)
+        monkeypatch.setattr(gemini_service, "_service", GeminiService())   # no cooldowns
+        monkeypatch.setattr(context_cache, "_prefix_cache", PrefixCache(backend, BASELINE))
+        monkeypatch.setattr(context_cache, "_prefix_cache_loaded", True)
+        return models
+    return install
+
+
+def _ask(session_id: str, files: dict) -> str:
+    return asyncio.run(gemini_client.call_gemini(
+        prompt="How do I add enqueue_in?",
+        conversation_history=[],
+        active_file="rq/queue.py",
+        file_contents=files,
+        session_id=session_id,
+    ))
+
+
+def _message(call) -> str:
+    return call.contents[-1]["parts"][0]["text"]
+
+
+class TestPrefixLayout:
+
+    def test_local_backend_registers_once_and_sends_only_edits(self, gemini):
+        backend = LocalCacheBackend()
+        models = gemini(backend)
+        assert _ask("cache_a", {**BASELINE, "rq/queue.py": EDITED_QUEUE}) == "ok"
+        assert _ask("cache_b", dict(BASELINE)) == "ok"
+
+        assert [model for model, _ in backend.created] == [GEMINI_MODEL_CHAIN[0]]
+        first, second = models.calls
+        assert first.config.system_instruction.startswith(SYSTEM_PROMPT)
+        assert "--- rq/worker.py ---" in first.config.system_instruction
+        assert "enqueue_in" in _message(first)
+        assert "class Worker" not in _message(first)
+        assert "[unchanged from baseline]" in _message(second)
+
+    def test_gemini_backend_uses_cached_content(self, gemini):
+        caches = FakeCaches()
+        models = gemini(GeminiCacheBackend(), caches=caches)
+        _ask("cache_gemini", {**BASELINE, "rq/queue.py": EDITED_QUEUE})
+        _ask("cache_gemini", {**BASELINE, "rq/queue.py": EDITED_QUEUE})
+        assert caches.created == [GEMINI_MODEL_CHAIN[0]]
+        assert all(c.config.cached_content == "cachedContents/1" for c in models.calls)
+        assert all(c.config.system_instruction is None for c in models.calls)
+
+    def test_create_failure_falls_back_to_full_layout(self, gemini):
+        caches = FakeCaches(fail=True)
+        models = gemini(GeminiCacheBackend(), caches=caches)
+        _ask("cache_fail", dict(BASELINE))
+        _ask("cache_fail", dict(BASELINE))
+        for call in models.calls:
+            assert call.config.cached_content is None
+            assert call.config.system_instruction == SYSTEM_PROMPT
+            assert "class Worker" in _message(call)
+
+    def test_stale_cache_is_dropped_and_retried_uncached(self, gemini):
+        models = gemini(GeminiCacheBackend(),
+                        models=FakeModels(Exception("404 NOT_FOUND: CachedContent not found")))
+        assert _ask("cache_stale", dict(BASELINE)) == "ok"
+        assert [bool(c.config.cached_content) for c in models.calls] == [True, False]
+        assert context_cache._prefix_cache._entries == {}
+
+
+class TestPrefixCacheTtl:
+
+    def test_extends_before_expiry(self, monkeypatch):
+        backend = LocalCacheBackend()
+        cache = PrefixCache(backend, BASELINE)
+        model = GEMINI_MODEL_CHAIN[0]
+        name = asyncio.run(cache.cached_name(None, model))
+        assert asyncio.run(cache.cached_name(None, model)) == name
+        assert backend.extended == []
+
+        # Nearly expired: extended in place, not recreated
+        cache._entries[model] = (name, context_cache.time.monotonic() + 10)
+        assert asyncio.run(cache.cached_name(None, model)) == name
+        assert backend.extended == [name]
+        assert len(backend.created) == 1
@@ -0,0 +1,92 @@
+"""
+Tests for file_edit coalescing: bursts are stored as span events and
+every score is the same as with one event per edit.
+"""
+
+import random
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+import store
+from main import app
+from models.session import Session
+from scoring import live
+from scoring.engine import compute_score
+from store import MemorySessionStore, RedisSessionStore
+
+KINDS = ["file_open", "file_edit", "file_edit", "file_edit", "prompt_sent", "test_run", "ai_apply"]
+FILES = ["rq/queue.py", "rq/job.py"]
+STEPS = [0, 0, 1, 300, 1_999, 2_000, 2_001, 15_000, 29_999, 30_000, 45_000]   # ties and window edges
+
+
+def _rows(rng: random.Random, start_ms: int) -> list:
+    ts, rows = start_ms, []
+    for _ in range(rng.randint(1, 100)):
+        ts += rng.choice(STEPS)
+        kind = rng.choice(KINDS)
+        rows.append((kind, ts, rng.choice(FILES) if kind.startswith("file") else None, None))
+    return rows
+
+
+class TestCoalescing:
+
+    def test_scores_are_unchanged(self):
+        rng = random.Random(24)
+        for _ in range(300):
+            raw = Session(session_id="raw")
+            spans = Session(session_id="spans", started_at=raw.started_at)
+            rows = _rows(rng, int(raw.started_at.timestamp() * 1000))
+            for i in range(0, len(rows), 7):
+                live.ingest_rows(raw, rows[i:i + 7], 0)
+                live.ingest_rows(spans, rows[i:i + 7], 2_000)
+
+            replayed = Session.model_validate(spans.model_dump())
+            assert compute_score(raw) == compute_score(spans) == compute_score(replayed)
+            assert sum((e.meta or {}).get("count", 1) for e in spans.events) == len(raw.events)
+
+    def test_bursts_become_spans(self, monkeypatch):
+        monkeypatch.setattr(store, "sessions", MemorySessionStore(coalesce_ms=2_000))
+        with TestClient(app) as http:
+            for ts, file in [(1_000, "rq/queue.py"), (1_400, "rq/queue.py"), (2_900, "rq/queue.py"),
+                             (3_000, "rq/job.py"), (9_000, "rq/job.py")]:
+                http.post("/session/event", json={"session_id": "burst", "event": "file_edit",
+                                                  "ts": ts, "file": file})
+        events = store.sessions["burst"].events
+        assert [(e.ts, e.file, e.meta) for e in events] == [
+            (1_000, "rq/queue.py", {"end": 2_900, "count": 3}),
+            (3_000, "rq/job.py", None),
+            (9_000, "rq/job.py", None),        # more than the quiet interval later
+        ]
+
+    def test_late_prompt_inside_a_burst(self):
+        # Edits at 1.0s-1.8s and a prompt at 1.5s that arrives after them
+        edits = [("file_edit", ts, "rq/queue.py", None) for ts in (1_000, 1_200, 1_800)]
+        late = [("prompt_sent", 1_500, None, None), ("test_run", 5_000, None, None)]
+        in_order = Session(session_id="in_order")
+        live.ingest_rows(in_order, sorted(edits + late, key=lambda row: row[1]))
+
+        default = Session(session_id="default", started_at=in_order.started_at)
+        live.ingest_rows(default, edits + late, store.EDIT_COALESCE_MS)   # off by default
+        assert compute_score(default) == compute_score(in_order)
+
+        # With coalescing on, an out-of-order edit is never folded into a span
+        spans = Session(session_id="spans")
+        live.ingest_rows(spans, [edits[0], edits[2], edits[1]], 2_000)
+        assert [(e.ts, e.meta) for e in spans.events] == [
+            (1_000, {"end": 1_800, "count": 2}), (1_200, None)]
+
+    def test_redis_store_matches_memory(self):
+        rng = random.Random(7)
+        memory = MemorySessionStore(coalesce_ms=2_000)
+        redis_store = RedisSessionStore(client=fakeredis.FakeRedis(), coalesce_ms=2_000)
+        rows = _rows(rng, 0)
+        for i in range(0, len(rows), 5):
+            memory.append_events("s", rows[i:i + 5])
+            redis_store.append_events("s", rows[i:i + 5])
+        assert redis_store["s"].events == memory["s"].events
+
+        late = [("file_edit", 10, "rq/job.py", None), ("file_edit", 10**9, "rq/job.py", None)]
+        memory.append_events("s", late)
+        redis_store.append_events("s", late)
+        assert redis_store["s"].events == memory["s"].events
@@ -0,0 +1,94 @@
+"""
+Tests for the evaluation cache (scoring/eval_cache.py): the three stores
+and replayed evaluations skipping Gemini.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import fakeredis
+
+from scoring import code_analysis, eval_cache
+from scoring.eval_cache import DiskEvalCache, MemoryEvalCache, RedisEvalCache, eval_key
+
+CODE_EVAL = {
+    "b1_clarity": 6, "b2_correctness": 5, "b3_efficiency_code": 4,
+    "p3_critical_miss": False, "p3_details": "", "code_feedback": "Tidy.",
+}
+
+
+class TestStores:
+
+    def test_memory_expires_and_evicts(self, monkeypatch):
+        cache = MemoryEvalCache(size=2, ttl_s=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)   # evicts b, the least recently used
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+        now = eval_cache.time.time()
+        monkeypatch.setattr(eval_cache.time, "time", lambda: now + 61)
+        assert cache.get("a") is None
+
+    def test_disk_round_trip_and_prune(self, tmp_path):
+        cache = DiskEvalCache(str(tmp_path), size=3)
+        cache.put("code:abc", {"x": 1})
+        assert DiskEvalCache(str(tmp_path)).get("code:abc") == {"x": 1}
+        for i in range(5):
+            cache.put(f"code:{i}", i)
+        cache._prune()
+        assert len(list(tmp_path.glob("*.json"))) == 3
+
+    def test_redis_round_trip(self):
+        cache = RedisEvalCache(client=fakeredis.FakeRedis(), ttl_s=60)
+        cache.put("insights:abc", [{"title": "x"}])
+        assert cache.get("insights:abc") == [{"title": "x"}]
+        assert 0 < cache.client.ttl(eval_cache.REDIS_KEY_PREFIX + "insights:abc") <= 60
+
+    def test_key_depends_on_prompt_and_system_prompt(self):
+        assert eval_key("code", "sys", "a") == eval_key("code", "sys", "a")
+        assert eval_key("code", "sys", "a") != eval_key("code", "sys", "b")
+        assert eval_key("code", "sys", "a") != eval_key("code", "sys2", "a")
+
+
+class TestReplay:
+
+    def test_replayed_code_analysis_skips_gemini(self, monkeypatch):
+        calls = []
+
+        async def fake_generate(client, *, contents, config):
+            calls.append(contents)
+            return SimpleNamespace(text=json.dumps(CODE_EVAL))
+
+        monkeypatch.setattr(eval_cache, "_cache", MemoryEvalCache())
+        monkeypatch.setattr(eval_cache, "_cache_loaded", True)
+        monkeypatch.setattr(code_analysis, "get_client", lambda: object())
+        monkeypatch.setattr(code_analysis, "generate_with_fallback", fake_generate)
+
+        first = asyncio.run(code_analysis.analyze_final_code("def f():\n    return 1\n"))
+        monkeypatch.setattr(code_analysis, "get_client", lambda: None)   # e.g. quota gone
+        second = asyncio.run(code_analysis.analyze_final_code("def f():\n    return 1\n"))
+        assert first == second and first.b1_clarity == 6
+        assert len(calls) == 1
+
+    def test_corrupt_entry_is_a_miss(self, monkeypatch):
+        calls = []
+
+        async def fake_generate(client, *, contents, config):
+            calls.append(contents)
+            return SimpleNamespace(text=json.dumps(CODE_EVAL))
+
+        cache = MemoryEvalCache()
+        monkeypatch.setattr(eval_cache, "_cache", cache)
+        monkeypatch.setattr(eval_cache, "_cache_loaded", True)
+        monkeypatch.setattr(code_analysis, "get_client", lambda: object())
+        monkeypatch.setattr(code_analysis, "generate_with_fallback", fake_generate)
+
+        asyncio.run(code_analysis.analyze_final_code("def f():\n    return 1\n"))
+        for key, (expires, _) in list(cache._entries.items()):
+            cache._entries[key] = (expires, {"b1_clarity": "not a number"})
+        result = asyncio.run(code_analysis.analyze_final_code("def f():\n    return 1\n"))
+        assert result.b1_clarity == 6
+        assert len(calls) == 2
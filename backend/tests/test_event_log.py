@@ -0,0 +1,66 @@
+"""
+Tests for the columnar event log (models/event.py) and the batched
+POST /session/events endpoint.
+"""
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+import store
+from main import app
+from models.event import Event, EventLog
+from models.session import Session
+from store import RedisSessionStore
+
+ROWS = [("file_open", 1_000, "rq/queue.py", None), ("prompt_sent", 2_000, None, None),
+        ("file_edit", 3_000, "rq/queue.py", {"chars": 12}), ("test_run", 4_000, None, None)]
+
+
+class TestEventLog:
+
+    def test_behaves_as_a_list_of_events(self):
+        events = [Event(session_id="log", event=kind, ts=ts, file=file, meta=meta)
+                  for kind, ts, file, meta in ROWS]
+        session = Session(session_id="log", events=events)
+
+        assert isinstance(session.events, EventLog)
+        assert list(session.events) == events and session.events[-1] == events[-1]
+        assert session.events == events
+        assert session.model_dump()["events"] == [e.model_dump() for e in events]
+        assert Session.model_validate_json(session.model_dump_json()).events == session.events
+
+        session.events.append(Event(session_id="log", event="file_edit", ts=5_000, file="rq/queue.py"))
+        assert len(session.events._paths) == 2      # one interned copy of the path, plus "no file"
+
+
+class TestBatchEndpoint:
+
+    def _post_batch(self, http, session_id):
+        return http.post("/session/events", json={"session_id": session_id, "events": [
+            {"event": kind, "ts": ts, "file": file} for kind, ts, file, _ in ROWS]})
+
+    def test_batch_matches_single_events(self):
+        with TestClient(app) as http:
+            for kind, ts, file, _ in ROWS:
+                http.post("/session/event", json={"session_id": "batch_one", "event": kind,
+                                                  "ts": ts, "file": file})
+            assert self._post_batch(http, "batch_many").json() == {"logged": len(ROWS)}
+            one = http.get("/session/batch_one/live-score").json()
+            many = http.get("/session/batch_many/live-score").json()
+
+        assert store.sessions["batch_many"].events == store.sessions["batch_one"].events
+        assert many["incremental"] is True
+        assert {**many, "session_id": None} == {**one, "session_id": None}
+
+    def test_oversized_batch_is_rejected(self):
+        with TestClient(app) as http:
+            events = [{"event": "file_edit", "ts": i} for i in range(1001)]
+            assert http.post("/session/events", json={"session_id": "batch_big", "events": events}).status_code == 422
+
+    def test_batch_on_redis(self, monkeypatch):
+        client = fakeredis.FakeRedis()
+        monkeypatch.setattr(store, "sessions", RedisSessionStore(client=client))
+        with TestClient(app) as http:
+            self._post_batch(http, "batch_redis")
+        assert client.llen("sponge:session:batch_redis:events") == len(ROWS)
+        assert [e.ts for e in store.sessions["batch_redis"].events] == [ts for _, ts, _, _ in ROWS]
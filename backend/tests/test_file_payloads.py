@@ -0,0 +1,77 @@
+"""
+Tests for dict-native file payloads: /run-tests and /submit take
+{path: content}, and the code review sees only the edited files.
+"""
+
+from fastapi.testclient import TestClient
+
+import routes.run_tests
+from file_store import get_files
+from gemini.context_cache import load_baseline
+from main import app
+from scoring import pipeline
+from scoring.code_analysis import submission_text
+
+BASELINE = load_baseline()
+EDITED = "class Queue:\n    def enqueue_in(self, seconds, f):\n        pass\n"
+
+
+class TestSubmissionText:
+
+    def test_only_edited_files_are_reviewed(self):
+        files = {"rq/queue.py": EDITED, "rq/job.py": BASELINE["rq/job.py"], "rq/worker.py": BASELINE["rq/worker.py"]}
+        text = submission_text(files)
+        assert text.startswith(f"// --- rq/queue.py ---\n{EDITED}")
+        assert "rq/job.py" not in text and "2 other submitted files are unchanged" in text
+
+    def test_legacy_blob_and_untouched_files_pass_through(self):
+        blob = f"// --- rq/queue.py ---\n{EDITED}"
+        assert submission_text(blob) == blob
+        untouched = {"rq/job.py": BASELINE["rq/job.py"]}
+        assert submission_text(untouched) == f"// --- rq/job.py ---\n{BASELINE['rq/job.py']}"
+
+
+class TestFilePayloads:
+
+    def test_run_tests_takes_a_mapping(self, monkeypatch):
+        seen = []
+
+        async def fake_run(final_code, **kwargs):
+            seen.append(final_code)
+            return {"total": 0}
+
+        monkeypatch.setattr(routes.run_tests, "run_correctness_tests_verbose", fake_run)
+        with TestClient(app) as http:
+            http.post("/run-tests", json={"session_id": "payload_dict", "file_contents": {"rq/queue.py": EDITED}})
+            http.post("/run-tests", json={"session_id": "payload_blob",
+                                          "file_contents": f"// --- rq/queue.py ---\n{EDITED}"})
+        assert seen == [{"rq/queue.py": EDITED}, {"rq/queue.py": EDITED}]
+        assert get_files("payload_dict").contents() == {"rq/queue.py": EDITED}
+
+    def test_submit_scores_the_mapping(self, monkeypatch):
+        seen = {}
+
+        async def tests(final_code, **kwargs):
+            seen["tests"] = final_code
+
+        async def code(final_code):
+            seen["code"] = final_code
+
+        async def nothing(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(pipeline, "FUSED_EVAL", False)
+        monkeypatch.setattr(pipeline, "run_correctness_tests", tests)
+        monkeypatch.setattr(pipeline, "analyze_final_code", code)
+        monkeypatch.setattr(pipeline, "evaluate_conversation", nothing)
+        monkeypatch.setattr(pipeline, "generate_insights", lambda **kwargs: nothing())
+        with TestClient(app) as http:
+            files = {"rq/queue.py": EDITED, "rq/job.py": BASELINE["rq/job.py"]}
+            assert http.post("/submit", json={"session_id": "payload_submit", "final_code": files}).status_code == 200
+            assert seen == {"tests": files, "code": files}
+
+            # No edits is still a submission, scored from metrics; no code field at all is not
+            for empty in ({}, ""):
+                assert http.post("/submit", json={"session_id": f"payload_empty{empty!r}",
+                                                  "final_code": empty}).status_code == 200
+            assert http.post("/submit", json={"session_id": "payload_none"}).status_code == 400
@@ -0,0 +1,109 @@
+"""
+Tests for the per-session file store and the hash-manifest sync protocol
+used by /prompt, /run-tests and /submit.
+"""
+
+import time
+from collections import OrderedDict
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import file_store
+from file_store import SessionFiles, content_hash, sync_files
+from main import app
+from routes import prompt as prompt_route
+
+QUEUE = "class Queue:\n    def enqueue(self, f):\n        pass\n"
+WORKER = "class Worker:\n    pass\n"
+
+
+class TestSessionFiles:
+
+    def test_sync_reports_missing_content(self):
+        files = SessionFiles()
+        files.replace_all({"rq/queue.py": QUEUE})
+        manifest = {"rq/queue.py": content_hash(QUEUE), "rq/worker.py": content_hash(WORKER)}
+        assert files.sync(manifest, {}) == ["rq/worker.py"]
+        assert files.sync(manifest, {"rq/worker.py": WORKER}) == []
+        assert files.contents() == {"rq/queue.py": QUEUE, "rq/worker.py": WORKER}
+
+    def test_sync_drops_paths_missing_from_manifest(self):
+        files = SessionFiles()
+        files.replace_all({"rq/queue.py": QUEUE, "rq/worker.py": WORKER})
+        assert files.sync({"rq/queue.py": content_hash(QUEUE)}, {}) == []
+        assert files.manifest() == {"rq/queue.py": content_hash(QUEUE)}
+
+    def test_context_block_rebuilt_only_on_change(self, monkeypatch):
+        builds = []
+
+        def fake_build(active_file, contents, prompt=None, baseline=None, query=None):
+            builds.append(active_file)
+            return f"context for {sorted(contents)}"
+
+        monkeypatch.setattr(file_store, "_build_context_block", fake_build)
+        files = SessionFiles()
+        files.replace_all({"rq/queue.py": QUEUE})
+        first = files.context_block("rq/queue.py")
+        files.replace_all({"rq/queue.py": QUEUE})  # same content: no change
+        assert files.context_block("rq/queue.py") is first
+        assert builds == ["rq/queue.py"]
+
+        files.sync({"rq/queue.py": content_hash(QUEUE + "# edit\n")}, {"rq/queue.py": QUEUE + "# edit\n"})
+        files.context_block("rq/queue.py")
+        assert builds == ["rq/queue.py", "rq/queue.py"]
+
+        # Prompts that name something are ranked afresh, not memoized
+        for prompt in ("Where is enqueue?", "What does Worker do?", "Explain rq/job.py"):
+            files.context_block("rq/queue.py", prompt)
+        assert len(builds) == 5 and len(files._context_blocks) == 1
+
+    def test_sync_files_raises_409_with_missing_paths(self):
+        with pytest.raises(HTTPException) as exc:
+            sync_files("fs_missing", {"rq/queue.py": content_hash(QUEUE)}, None)
+        assert exc.value.status_code == 409
+        assert exc.value.detail == {"missing_files": ["rq/queue.py"]}
+
+    def test_copies_are_bounded_and_expire(self, monkeypatch):
+        monkeypatch.setattr(file_store, "_files", OrderedDict())
+        monkeypatch.setattr(file_store, "SESSION_MAX", 2)
+        for session_id in ("lru_a", "lru_b", "lru_c"):
+            file_store.get_files(session_id).replace_all({"rq/queue.py": QUEUE})
+        assert list(file_store._files) == ["lru_b", "lru_c"]
+
+        later = time.time() + file_store.SESSION_TTL_S + 1          # everything idle too long
+        monkeypatch.setattr(file_store.time, "time", lambda: later)
+        assert not file_store.get_files("lru_b")
+        assert list(file_store._files) == ["lru_b"]
+
+
+class TestPromptUsesStore:
+
+    def test_second_prompt_sends_only_hashes(self, monkeypatch):
+        contexts = []
+
+        async def fake_call_gemini(*, prompt, conversation_history, context_block=None, **_):
+            contexts.append(context_block() if callable(context_block) else context_block)
+            return "ok"
+
+        monkeypatch.setattr(prompt_route, "call_gemini", fake_call_gemini)
+        manifest = {"rq/queue.py": content_hash(QUEUE)}
+        body = {
+            "session_id": "fs_prompt",
+            "prompt_text": "Where is enqueue?",
+            "conversation_history": [],
+            "active_file": "rq/queue.py",
+            "file_hashes": manifest,
+        }
+        with TestClient(app) as http:
+            missing = http.post("/prompt", json=body)
+            assert missing.status_code == 409
+            assert missing.json()["detail"] == {"missing_files": ["rq/queue.py"]}
+
+            assert http.post("/prompt", json={**body, "file_contents": {"rq/queue.py": QUEUE}}).status_code == 200
+            assert http.post("/prompt", json=body).status_code == 200
+
+        assert len(contexts) == 2
+        assert contexts[0] == contexts[1]
+        assert "class Queue" in contexts[0]
@@ -0,0 +1,90 @@
+"""
+Tests for fused single-call evaluation (scoring/fused_eval.py) and the
+local tiering of its insight candidates (insights.derive_insights).
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from models.score import RubricBreakdown
+from scoring import eval_cache, fused_eval
+from scoring.insights import derive_insights
+
+HISTORY = [
+    {"role": "user", "content": "How does the worker loop in worker.py pick jobs?"},
+    {"role": "assistant", "content": "It calls dequeue_job ..."},
+]
+CODE = "// --- rq/queue.py ---\ndef enqueue_in(self, seconds, f):\n    pass\n"
+
+CONVERSATION = {
+    "a1_understanding": 4, "a2_decomposition": 99, "a3_justification": 3, "a4_edge_cases": 2,
+    "b3_efficiency_discussion": 1, "b4_ownership_dialogue": 2, "c2_test_mentions": 3,
+    "c3_ai_questioning": 1, "d1_narration": 3, "d2_tradeoffs": 2, "d3_ai_balance": 3,
+    "d4_status_updates": 1, "interpretation": "Solid start.",
+}
+CANDIDATES = [
+    {"category": "Communication", "polarity": "positive", "title": "Grounded questions",
+     "description": "You named worker.py when asking.", "prompt_indices": [0]},
+    {"category": "Verification", "polarity": "positive", "title": "Ran tests",
+     "description": "You ran the suite once.", "prompt_indices": []},
+    {"category": "Verification", "polarity": "negative", "title": "Test more often",
+     "description": "Run tests after each change.", "prompt_indices": [7]},
+    {"category": "Code Quality", "polarity": "negative", "title": "Add docstrings",
+     "description": "Document enqueue_in like its neighbours.", "prompt_indices": []},
+]
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    def install(payload: dict) -> list:
+        calls = []
+
+        async def fake_generate(client, *, contents, config):
+            calls.append(contents)
+            return SimpleNamespace(text=json.dumps(payload))
+
+        monkeypatch.setattr(eval_cache, "_cache", eval_cache.MemoryEvalCache())
+        monkeypatch.setattr(eval_cache, "_cache_loaded", True)
+        monkeypatch.setattr(fused_eval, "get_client", lambda: object())
+        monkeypatch.setattr(fused_eval, "generate_with_fallback", fake_generate)
+        return calls
+    return install
+
+
+class TestFusedEval:
+
+    def test_one_call_yields_all_parts(self, fake_gemini):
+        calls = fake_gemini({"conversation": CONVERSATION, "code": {"b1_clarity": 6},
+                             "insight_candidates": CANDIDATES})
+        result = asyncio.run(fused_eval.evaluate_fused(HISTORY, CODE))
+        assert len(calls) == 1
+        assert result.conversation.a2_decomposition == 7   # clamped like evaluate_conversation
+        assert result.code.b1_clarity == 6
+        assert len(result.insight_candidates) == 4
+
+    def test_malformed_section_is_none_not_fatal(self, fake_gemini):
+        fake_gemini({"conversation": CONVERSATION, "code": "oops", "insight_candidates": "x"})
+        result = asyncio.run(fused_eval.evaluate_fused(HISTORY, CODE))
+        assert result.conversation is not None
+        assert result.code is None
+        assert result.insight_candidates == []
+
+
+class TestDeriveInsights:
+
+    def test_tier_comes_from_computed_score(self):
+        rubric = RubricBreakdown(problem_solving=6, code_quality=6, verification=2, communication=10)
+        insights = derive_insights(CANDIDATES, user_prompts=["p"], total_score=40, rubric=rubric)
+        by_title = {i.title: i for i in insights}
+        assert by_title["Grounded questions"].type == "strength"
+        assert "Ran tests" not in by_title                  # praise for a weak category
+        assert by_title["Test more often"].type == "weakness"
+        assert by_title["Test more often"].prompt_indices == []   # out-of-range index dropped
+        assert by_title["Add docstrings"].type == "improvement"
+
+    def test_too_few_candidates_fall_back(self):
+        insights = derive_insights([], user_prompts=[], total_score=5)
+        assert insights[0].title == "Session incomplete"
@@ -0,0 +1,88 @@
+"""
+Tests for the shared Gemini service (gemini/service.py) as used by the
+fallback helpers: 429 cooldowns, per-model token buckets and hedging.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from gemini import service as gemini_service
+from gemini.config import GEMINI_MODEL_CHAIN
+from gemini.fallback import generate_with_fallback
+from gemini.service import HEDGE_MIN_SAMPLES, GeminiService, retry_delay
+
+PRIMARY, BACKUP = GEMINI_MODEL_CHAIN[0], GEMINI_MODEL_CHAIN[1]
+
+
+class FakeModels:
+    """client.aio.models; script maps model → (delay seconds, text or Exception)."""
+
+    def __init__(self, script: dict):
+        self.script = script
+        self.calls = []
+
+    async def generate_content(self, *, model, contents, config):
+        self.calls.append(model)
+        delay, outcome = self.script.get(model, (0, model))
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(text=outcome)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    def install(**kwargs) -> GeminiService:
+        svc = GeminiService(**kwargs)
+        monkeypatch.setattr(gemini_service, "_service", svc)
+        return svc
+    return install
+
+
+def _generate(models: FakeModels):
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return asyncio.run(generate_with_fallback(client, contents=[], config=None))
+
+
+class TestCooldown:
+
+    def test_rate_limited_model_is_skipped_until_reset(self, service):
+        service()
+        models = FakeModels({PRIMARY: (0, Exception("429 RESOURCE_EXHAUSTED"))})
+        assert _generate(models).text == BACKUP
+        assert _generate(models).text == BACKUP
+        assert models.calls == [PRIMARY, BACKUP, BACKUP]
+
+    def test_all_cooling_down_returns_none_without_calls(self, service):
+        svc = service()
+        for model in GEMINI_MODEL_CHAIN:
+            svc.cooldown(model, 30)
+        models = FakeModels({})
+        assert _generate(models) is None
+        assert models.calls == []
+
+    def test_retry_delay_from_error(self):
+        assert retry_delay(Exception("429 ... 'retryDelay': '17s'")) == 17
+        assert retry_delay(Exception("Please retry in 4.5s.")) == 4.5
+        assert retry_delay(Exception("429 RESOURCE_EXHAUSTED")) == gemini_service.QUOTA_COOLDOWN_S
+
+
+class TestAdmission:
+
+    def test_empty_bucket_moves_to_next_model(self, service):
+        service(rpm={PRIMARY: 1})
+        models = FakeModels({})
+        assert _generate(models).text == PRIMARY
+        assert _generate(models).text == BACKUP   # PRIMARY's next token is a minute away
+        assert models.calls == [PRIMARY, BACKUP]
+
+    def test_slow_model_is_hedged(self, service, monkeypatch):
+        monkeypatch.setattr(gemini_service, "HEDGE_MIN_DELAY_S", 0.01)
+        svc = service(hedge=True)
+        for _ in range(HEDGE_MIN_SAMPLES):
+            svc.record_latency(PRIMARY, 0.01)
+        models = FakeModels({PRIMARY: (5, PRIMARY)})
+        assert _generate(models).text == BACKUP
+        assert models.calls == [PRIMARY, BACKUP]
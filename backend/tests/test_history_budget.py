@@ -0,0 +1,83 @@
+"""
+Tests for token estimation and the rolling history summary
+(gemini/tokens.py, gemini/history.py).
+"""
+
+from gemini import history as gemini_history
+from gemini import tokens
+from gemini.client import _build_contents
+from gemini.history import fit_history
+
+
+def _conversation(turns: int, words: int = 200) -> list[dict]:
+    history = []
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append({"role": role, "content": f"turn {i} " + "enqueue worker " * words})
+    return history
+
+
+class TestTokenEstimate:
+
+    def test_code_is_denser_than_prose(self):
+        prose = "The worker picks up jobs from the queue and runs them one by one. " * 20
+        code = "self._x[i] = (a + b) * c.d(e, f=1) if g else {h: 0}\n" * 20
+        assert len(prose) / tokens.estimate_tokens(prose) > len(code) / tokens.estimate_tokens(code)
+
+    def test_calibration_moves_towards_observed_counts(self, monkeypatch):
+        monkeypatch.setattr(tokens, "_scale", 1.0)
+        text = "def enqueue_in(self, delay, func):\n    pass\n"
+        before = tokens.estimate_tokens(text)
+        tokens.calibrate(before, before * 2)
+        assert tokens.estimate_tokens(text) > before
+        assert tokens.MIN_SCALE <= tokens._scale <= tokens.MAX_SCALE
+
+    def test_memo_keeps_counts_not_texts(self, monkeypatch):
+        monkeypatch.setattr(tokens, "_counts", type(tokens._counts)())
+        monkeypatch.setattr(tokens, "MEMO_SIZE", 2)
+        for text in ("def enqueue(self): ...", "x" * 10_000, "class Worker: ..."):
+            tokens.estimate_tokens(text)
+        assert len(tokens._counts) == 2
+        assert all(isinstance(key, bytes) and len(key) == 20 for key in tokens._counts)
+
+
+class TestRollingSummary:
+
+    def test_short_history_is_sent_verbatim(self):
+        history = _conversation(6, words=5)
+        assert fit_history("hist_short", history) == ("", history)
+
+    def test_old_turns_are_summarised_once(self, monkeypatch):
+        summarised = []
+        real = gemini_history._summarize_turn
+
+        def counting(turn):
+            summarised.append(turn["content"][:8])
+            return real(turn)
+
+        monkeypatch.setattr(gemini_history, "_summarize_turn", counting)
+        history = _conversation(120)
+        summary, recent = fit_history("hist_long", history)
+        assert summary.startswith(f"({len(history) - len(recent)} earlier turns")
+        assert recent[0]["role"] == "user"
+        assert len(summarised) == len(history) - len(recent)
+
+        # Two more turns: only newly folded turns are summarised
+        before = len(summarised)
+        history += _conversation(2)
+        fit_history("hist_long", history)
+        assert len(summarised) - before <= gemini_history.FOLD_STEP + 1
+
+    def test_rewritten_history_rebuilds_summary(self):
+        history = _conversation(120)
+        fit_history("hist_rewrite", history)
+        rewritten = [{"role": t["role"], "content": "other " + t["content"]} for t in history]
+        summary, _ = fit_history("hist_rewrite", rewritten)
+        assert "other turn" in summary
+
+    def test_contents_stay_within_budget(self):
+        contents, estimated = _build_contents("next?", _conversation(400), None, None, "", "hist_budget")
+        history_tokens = sum(tokens.estimate_tokens(p["text"]) for t in contents[:-1] for p in t["parts"])
+        assert history_tokens <= gemini_history.HISTORY_TOKENS
+        assert "=== EARLIER CONVERSATION (summary) ===" in contents[-1]["parts"][0]["text"]
+        assert estimated > history_tokens
@@ -0,0 +1,135 @@
+"""
+Tests for the leaderboard index (ranking.py) and GET /leaderboard paging:
+both backends keep leaderboard order and ranks, and pages carry ETags.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+import ranking
+from main import app
+from models.session import Session
+from ranking import LeaderboardIndex, RedisLeaderboardIndex
+from scoring.engine import compute_score
+
+BASE_SCORE = compute_score(Session(session_id="template"))
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _scored(session_id: str, total: int, minute: int) -> Session:
+    session = Session(session_id=session_id, username=session_id,
+                      completed_at=START + timedelta(minutes=minute))
+    session.score = BASE_SCORE.model_copy(update={"total_score": total})
+    return session
+
+
+def _sessions(n: int = 60) -> list[Session]:
+    rng = random.Random(5)
+    return [_scored(f"s{i:02d}", rng.choice([40, 55, 70, 70, 85]), rng.randint(0, 30))
+            for i in range(n)]
+
+
+def _expected(sessions: list[Session]) -> list[str]:
+    ordered = sorted(sessions, key=lambda s: (-s.score.total_score, s.completed_at, s.session_id))
+    return [s.session_id for s in ordered]
+
+
+def _walk(index, limit: int) -> list[str]:
+    names, after = [], None
+    while True:
+        entries, after = index.page(limit, after)
+        names += [e["username"] for e in entries]
+        if after is None:
+            return names
+
+
+@pytest.fixture(params=["memory", "redis"])
+def index(request):
+    if request.param == "redis":
+        return RedisLeaderboardIndex(fakeredis.FakeRedis())
+    return LeaderboardIndex()
+
+
+class TestLeaderboardIndex:
+
+    def test_pages_follow_leaderboard_order(self, index):
+        sessions = _sessions()
+        for session in sessions:
+            index.record(session)
+        assert _walk(index, 7) == _expected(sessions)
+        assert [e["username"] for e in index.page()[0]] == _expected(sessions)
+
+    def test_standing_and_rescoring(self, index):
+        sessions = _sessions()
+        for session in sessions:
+            index.record(session)
+        scores = [s.score.total_score for s in sessions]
+        rank, percentile, total = index.standing(70)
+        assert rank == 1 + sum(1 for s in scores if s > 70)
+        assert percentile == round(100 * sum(1 for s in scores if s < 70) / len(scores), 1)
+        assert total == len(sessions)
+
+        # A late-upgraded score moves the entry instead of duplicating it
+        sessions[0].score = sessions[0].score.model_copy(update={"total_score": 99})
+        index.record(sessions[0])
+        assert len(index) == len(sessions)
+        assert index.page(1)[0][0]["username"] == sessions[0].session_id
+        assert index.standing(99)[0] == 1
+
+    def test_interleaved_records_leave_one_member(self, monkeypatch):
+        client = fakeredis.FakeRedis()
+        index = RedisLeaderboardIndex(client)
+        pipeline, raced = client.pipeline, []
+
+        def racing_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            def interleaved():
+                if not raced:       # another worker records between our read and write
+                    raced.append(True)
+                    index.record(_scored("racer", 90, 1))
+                return execute()
+
+            pipe.execute = interleaved
+            return pipe
+
+        monkeypatch.setattr(client, "pipeline", racing_pipeline)
+        index.record(_scored("racer", 40, 0))
+        assert len(index) == 1
+        assert index.page()[0][0]["score"] == 40
+
+
+class TestLeaderboardEndpoint:
+
+    def test_etag_cursor_and_full_list(self, monkeypatch):
+        index = LeaderboardIndex()
+        sessions = _sessions(12)
+        for session in sessions:
+            index.record(session)
+        monkeypatch.setattr(ranking, "_index", index)
+
+        with TestClient(app) as http:
+            assert [e["username"] for e in http.get("/leaderboard").json()] == _expected(sessions)
+
+            first = http.get("/leaderboard", params={"limit": 5})
+            assert len(first.json()) == 5
+            cursor = first.headers["X-Next-Cursor"]
+            second = http.get("/leaderboard", params={"limit": 5, "cursor": cursor})
+            assert [e["username"] for e in first.json() + second.json()] == _expected(sessions)[:10]
+
+            unchanged = http.get("/leaderboard", params={"limit": 5},
+                                 headers={"If-None-Match": first.headers["ETag"]})
+            assert unchanged.status_code == 304
+
+            index.record(_scored("newcomer", 100, 0))
+            changed = http.get("/leaderboard", params={"limit": 5},
+                               headers={"If-None-Match": first.headers["ETag"]})
+            assert changed.status_code == 200
+            assert changed.json()[0]["username"] == "newcomer"
+
+            assert http.get("/leaderboard", params={"cursor": "nope"}).status_code == 400
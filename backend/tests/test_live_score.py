@@ -0,0 +1,69 @@
+"""
+Tests for live scoring (scoring/live.py): accumulators fed per event give
+the same score as replaying the log, and GET /session/{id}/live-score.
+"""
+
+import random
+
+from fastapi.testclient import TestClient
+
+import store
+from main import app
+from models.event import Event
+from models.session import Session
+from scoring import live
+from scoring.engine import compute_score
+
+KINDS = ["file_open", "file_edit", "prompt_sent", "test_run", "ai_apply"]
+PROMPTS = ["How does enqueue_in schedule a job?", "fix it",
+           "What about the edge case of an empty queue? Any tradeoff?"]
+
+
+def _replayed(session: Session) -> Session:
+    return Session.model_validate(session.model_dump())   # same data, no accumulators
+
+
+class TestLiveTimeline:
+
+    def test_matches_replay(self):
+        rng = random.Random(11)
+        for _ in range(100):
+            session = Session(session_id="live_eq")
+            ts = int(session.started_at.timestamp() * 1000)
+            history = []
+            for _ in range(rng.randint(1, 60)):
+                if rng.random() < 0.15:
+                    history = history + [{"role": "user", "content": rng.choice(PROMPTS)},
+                                         {"role": "assistant", "content": rng.choice(PROMPTS)}]
+                    live.record_history(session, history)
+                ts += rng.choice([0, 1_000, 20_000, 45_000])   # ties and both sides of 30s
+                live.ingest_event(session, Event(session_id="live_eq", event=rng.choice(KINDS), ts=ts))
+
+            assert isinstance(live.session_timeline(session), live.LiveTimeline)
+            assert compute_score(session) == compute_score(_replayed(session))
+
+    def test_out_of_order_event_falls_back_to_replay(self):
+        session = Session(session_id="live_late")
+        for kind, ts in [("prompt_sent", 2_000), ("file_edit", 3_000), ("test_run", 1_000)]:
+            live.ingest_event(session, Event(session_id="live_late", event=kind, ts=ts))
+        assert not isinstance(live.session_timeline(session), live.LiveTimeline)
+        assert compute_score(session) == compute_score(_replayed(session))
+
+
+class TestLiveScoreEndpoint:
+
+    def test_preview_reads_accumulators(self):
+        store.sessions.pop("live_api", None)
+        with TestClient(app) as http:
+            for kind, ts in [("file_open", 1_000), ("prompt_sent", 2_000),
+                             ("file_edit", 3_000), ("test_run", 4_000)]:
+                http.post("/session/event", json={"session_id": "live_api", "event": kind, "ts": ts})
+            body = http.get("/session/live_api/live-score").json()
+        assert body["incremental"] is True
+        assert body["event_count"] == 4
+        assert body["headline_metrics"]["test_after_ai_rate"] == 0.0   # no AI turn yet
+        assert body["sub_criteria"]["c1_exec_frequency"] == 1.5
+
+    def test_unknown_session_is_404(self):
+        with TestClient(app) as http:
+            assert http.get("/session/live_nope/live-score").status_code == 404
@@ -0,0 +1,113 @@
+"""
+Tests for POST /prompt/stream against a local fake streaming Gemini client.
+
+Covers chunk forwarding, turn persistence, the model fallback chain and the
+error-to-message mapping shared with /prompt.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import store
+from gemini import client as gemini_client
+from gemini import service as gemini_service
+from gemini.config import GEMINI_MODEL_CHAIN
+from gemini.service import GeminiService
+from main import app
+
+
+class FakeModels:
+    """Stands in for client.aio.models; scripts per-model behaviour."""
+
+    def __init__(self, script: dict):
+        self.script = script  # model → list of chunk texts, or an Exception
+        self.calls = []
+
+    async def generate_content_stream(self, *, model, contents, config):
+        self.calls.append(model)
+        outcome = self.script.get(model, [])
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        async def chunks():
+            for item in outcome:
+                if isinstance(item, Exception):
+                    raise item
+                yield SimpleNamespace(text=item)
+
+        return chunks()
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    def install(script: dict) -> FakeModels:
+        models = FakeModels(script)
+        fake = SimpleNamespace(aio=SimpleNamespace(models=models))
+        monkeypatch.setattr(gemini_client, "get_client", lambda: fake)
+        monkeypatch.setattr(gemini_service, "_service", GeminiService())   # no cooldowns
+        return models
+    return install
+
+
+def _stream(session_id: str, prompt: str = "How do I add enqueue_in?"):
+    body = {
+        "session_id": session_id,
+        "prompt_text": prompt,
+        "conversation_history": [{"role": "user", "content": prompt}],
+        "file_contents": {"rq/queue.py": "class Queue: ..."},
+    }
+    events = []
+    with TestClient(app) as http:
+        with http.stream("POST", "/prompt/stream", json=body) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+class TestPromptStream:
+
+    def test_forwards_chunks_and_persists_turn(self, fake_gemini):
+        fake_gemini({GEMINI_MODEL_CHAIN[0]: ["  Look at ", "Queue.enqueue", " first."]})
+        events = _stream("stream_ok")
+
+        assert [data["text"] for event, data in events if event == "delta"] == \
+            ["Look at ", "Queue.enqueue", " first."]
+        assert events[-1] == ("done", {"response_text": "Look at Queue.enqueue first."})
+        assert store.sessions["stream_ok"].conversation_history == [
+            {"role": "user", "content": "How do I add enqueue_in?"},
+            {"role": "assistant", "content": "Look at Queue.enqueue first."},
+        ]
+
+    def test_falls_back_to_next_model_on_quota(self, fake_gemini):
+        models = fake_gemini({
+            GEMINI_MODEL_CHAIN[0]: Exception("429 RESOURCE_EXHAUSTED"),
+            GEMINI_MODEL_CHAIN[1]: ["from the fallback"],
+        })
+        events = _stream("stream_fallback")
+        assert models.calls == GEMINI_MODEL_CHAIN[:2]
+        assert events[-1] == ("done", {"response_text": "from the fallback"})
+
+    def test_error_maps_to_user_message(self, fake_gemini):
+        fake_gemini({GEMINI_MODEL_CHAIN[0]: Exception("403 API key not valid")})
+        events = _stream("stream_error")
+        assert events[-1] == ("done", {"response_text": gemini_client.CONFIG_ERROR_MESSAGE})
+
+    def test_all_models_rate_limited(self, fake_gemini):
+        fake_gemini({model: Exception("429 RESOURCE_EXHAUSTED") for model in GEMINI_MODEL_CHAIN})
+        events = _stream("stream_exhausted")
+        assert events[-1] == ("done", {"response_text": gemini_client.RATE_LIMITED_MESSAGE})
+
+    def test_mid_stream_failure_keeps_partial_text(self, fake_gemini):
+        fake_gemini({GEMINI_MODEL_CHAIN[0]: ["Partial answer", Exception("connection reset")]})
+        events = _stream("stream_partial")
+        text = events[-1][1]["response_text"]
+        assert text.startswith("Partial answer\n\n")
+        assert text.endswith("Please try again.")
@@ -0,0 +1,135 @@
+"""
+Tests for the sandbox scheduler — concurrency limit, FIFO admission,
+weighted runs, queue-full rejection and per-session supersession.
+"""
+
+import asyncio
+
+import pytest
+
+from scoring.scheduler import RunSuperseded, SandboxScheduler, SchedulerBusy
+
+
+def _job(log: list, name: str, gate: asyncio.Event):
+    async def run():
+        log.append(("start", name))
+        await gate.wait()
+        log.append(("end", name))
+        return name
+    return run
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestSandboxScheduler:
+
+    def test_limits_concurrency_and_admits_fifo(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=2, max_queue=10)
+            log, gate = [], asyncio.Event()
+            tasks = [asyncio.create_task(scheduler.run(_job(log, n, gate))) for n in "abcd"]
+            await _settle()
+            assert [e for e in log if e[0] == "start"] == [("start", "a"), ("start", "b")]
+            assert scheduler.active == 2 and scheduler.queued == 2
+            gate.set()
+            assert await asyncio.gather(*tasks) == list("abcd")
+            assert [n for kind, n in log if kind == "start"] == list("abcd")
+            assert scheduler.active == 0 and scheduler.queued == 0
+
+        asyncio.run(scenario())
+
+    def test_rejects_interactive_when_queue_full(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=1, max_queue=1)
+            log, gate = [], asyncio.Event()
+            running = asyncio.create_task(scheduler.run(_job(log, "a", gate)))
+            waiting = asyncio.create_task(scheduler.run(_job(log, "b", gate)))
+            await _settle()
+            with pytest.raises(SchedulerBusy) as exc:
+                await scheduler.run(_job(log, "c", gate))
+            assert exc.value.retry_after >= 1
+            # Submission runs always queue
+            submit = asyncio.create_task(scheduler.run(_job(log, "d", gate), interactive=False))
+            gate.set()
+            assert await asyncio.gather(running, waiting, submit) == ["a", "b", "d"]
+
+        asyncio.run(scenario())
+
+    def test_newer_run_supersedes_queued_and_running(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=1, max_queue=10)
+            log, gate = [], asyncio.Event()
+            running = asyncio.create_task(scheduler.run(_job(log, "a", gate), session_id="s1"))
+            queued = asyncio.create_task(scheduler.run(_job(log, "b", gate), session_id="s2"))
+            await _settle()
+            assert scheduler.position("s2") == 1
+
+            # s1 re-runs: its in-flight run is cancelled, freeing the slot
+            newer = asyncio.create_task(scheduler.run(_job(log, "c", gate), session_id="s1"))
+            # s2 re-runs while still queued
+            newest = asyncio.create_task(scheduler.run(_job(log, "d", gate), session_id="s2"))
+            await _settle()
+            gate.set()
+
+            with pytest.raises(RunSuperseded):
+                await running
+            with pytest.raises(RunSuperseded):
+                await queued
+            assert await asyncio.gather(newer, newest) == ["c", "d"]
+            assert ("start", "b") not in log
+            assert scheduler.active == 0
+
+        asyncio.run(scenario())
+
+    def test_cancelling_the_caller_is_not_supersession(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=1, max_queue=10)
+            log, gate = [], asyncio.Event()
+            running = asyncio.create_task(scheduler.run(_job(log, "a", gate), session_id="s1"))
+            queued = asyncio.create_task(scheduler.run(_job(log, "b", gate), session_id="s2"))
+            await _settle()
+            running.cancel()
+            queued.cancel()
+            for task in (running, queued):
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            gate.set()
+            await _settle()
+            assert scheduler.active == 0 and scheduler.queued == 0
+            assert log == [("start", "a")]      # a's job was cancelled too, b never started
+
+        asyncio.run(scenario())
+
+    def test_submission_is_not_superseded(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=2, max_queue=10)
+            log, gate = [], asyncio.Event()
+            submit = asyncio.create_task(scheduler.run(_job(log, "a", gate), session_id="s1", interactive=False))
+            await _settle()
+            rerun = asyncio.create_task(scheduler.run(_job(log, "b", gate), session_id="s1"))
+            gate.set()
+            assert await asyncio.gather(submit, rerun) == ["a", "b"]
+
+        asyncio.run(scenario())
+
+    def test_weighted_run_waits_for_enough_slots(self):
+        async def scenario():
+            scheduler = SandboxScheduler(concurrency=3, max_queue=10)
+            log, gate_a, gate = [], asyncio.Event(), asyncio.Event()
+            a = asyncio.create_task(scheduler.run(_job(log, "a", gate_a)))
+            heavy = asyncio.create_task(scheduler.run(_job(log, "heavy", gate), weight=3))
+            light = asyncio.create_task(scheduler.run(_job(log, "light", gate)))
+            await _settle()
+            # FIFO: the light run doesn't jump the heavy one at the head
+            assert [n for kind, n in log if kind == "start"] == ["a"]
+            gate_a.set()
+            await _settle()
+            assert [n for kind, n in log if kind == "start"] == ["a", "heavy"]
+            gate.set()
+            assert await asyncio.gather(a, heavy, light) == ["a", "heavy", "light"]
+            assert scheduler.active == 0
+
+        asyncio.run(scenario())
@@ -0,0 +1,94 @@
+"""
+Tests for the session stores (store.py): bounded memory with expiry and
+disk spill, and the Redis store (on fakeredis) shared between workers.
+"""
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+import store
+from main import app
+from models.event import Event
+from models.session import Session
+from scoring.engine import compute_score
+from store import MemorySessionStore, RedisSessionStore, pack_event
+
+
+def _event(session_id: str, ts: int, kind: str = "file_edit", file=None) -> Event:
+    return Event(session_id=session_id, event=kind, ts=ts, file=file)
+
+
+class TestMemorySessionStore:
+
+    def test_lru_bound_and_expiry(self):
+        sessions = MemorySessionStore(size=2, ttl_s=60)
+        for name in ("a", "b", "c"):
+            sessions[name] = Session(session_id=name)
+        assert "a" not in sessions and len(sessions) == 2
+
+        expired = MemorySessionStore(size=2, ttl_s=0)
+        expired["a"] = Session(session_id="a")
+        assert expired.get("a") is None
+
+    def test_evicted_sessions_spill_to_disk(self, tmp_path):
+        sessions = MemorySessionStore(size=1, ttl_s=60, spill_dir=str(tmp_path))
+        sessions.append_event("a", _event("a", 1_000, file="rq/queue.py"))
+        score = sessions["a"].score = compute_score(sessions["a"])
+        sessions["b"] = Session(session_id="b")          # pushes "a" out
+
+        assert len(sessions) == 1 and len(list(tmp_path.glob("*.json"))) == 1
+        assert {s.session_id for s in sessions.values()} == {"a", "b"}
+        restored = sessions["a"]
+        assert restored.events[0].file == "rq/queue.py"
+        assert restored.score == score
+
+    def test_spilled_ids_do_not_collide(self, tmp_path):
+        sessions = MemorySessionStore(size=1, ttl_s=60, spill_dir=str(tmp_path))
+        for session_id in ("a/b", "a_b", "other"):       # each pushes the previous out
+            sessions.append_event(session_id, _event(session_id, 1_000, file=session_id))
+        assert [sessions[i].events[0].file for i in ("a/b", "a_b")] == ["a/b", "a_b"]
+
+
+class TestRedisSessionStore:
+
+    @pytest.fixture
+    def server(self):
+        return fakeredis.FakeServer()
+
+    def test_workers_share_sessions(self, server):
+        worker_a = RedisSessionStore(client=fakeredis.FakeRedis(server=server))
+        worker_b = RedisSessionStore(client=fakeredis.FakeRedis(server=server))
+
+        worker_a.append_event("s", _event("s", 1_000, "prompt_sent"))
+        worker_b.append_event("s", _event("s", 2_000))
+        session = worker_b.get("s")
+        session.conversation_history = [{"role": "user", "content": "hi"}]
+        worker_b.save(session, "conversation_history")
+
+        seen = worker_a["s"]
+        assert [e.ts for e in seen.events] == [1_000, 2_000]
+        assert seen.conversation_history == [{"role": "user", "content": "hi"}]
+        assert [s.session_id for s in worker_a.values()] == ["s"]
+        assert worker_a.pop("s").session_id == "s" and "s" not in worker_b
+
+    def test_events_are_appended_compactly(self, server):
+        client = fakeredis.FakeRedis(server=server)
+        sessions = RedisSessionStore(client=client, ttl_s=60)
+        sessions["s"] = Session(session_id="s", username="ada")
+        sessions.append_event("s", _event("s", 5, file="rq/job.py"))
+
+        assert client.lrange("sponge:session:s:events", 0, -1) == [b'["file_edit",5,"rq/job.py"]']
+        assert pack_event(_event("s", 7)) == '["file_edit",7]'
+        assert sessions["s"].username == "ada"              # not overwritten by the append
+        assert 0 < client.ttl("sponge:session:s") <= 60
+
+    def test_routes_run_on_redis(self, server, monkeypatch):
+        monkeypatch.setattr(store, "sessions", RedisSessionStore(client=fakeredis.FakeRedis(server=server)))
+        with TestClient(app) as http:
+            session_id = http.post("/session/start", json={"username": "ada"}).json()["session_id"]
+            for kind, ts in [("prompt_sent", 1_000), ("file_edit", 2_000)]:
+                http.post("/session/event", json={"session_id": session_id, "event": kind, "ts": ts})
+            body = http.get(f"/session/{session_id}/live-score").json()
+        assert body["event_count"] == 2
+        assert body["incremental"] is False      # loaded fresh per request: replayed
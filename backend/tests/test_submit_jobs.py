@@ -0,0 +1,106 @@
+"""
+Tests for background submits on the RQ queue (scoring/jobs.py, local mode):
+enqueue, status polling, the SSE progress stream and score persistence.
+"""
+
+import json
+import time
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+import ranking
+import store
+from main import app
+from scoring import jobs, pipeline
+from scoring.jobs import Queue
+
+
+@pytest.fixture
+def local_queue(monkeypatch):
+    async def nothing(*args, **kwargs):
+        return None
+
+    async def no_insights(**kwargs):
+        return []
+
+    monkeypatch.setattr(jobs, "SUBMIT_QUEUE_MODE", "local")
+    monkeypatch.setattr(jobs, "_queue", Queue(jobs.QUEUE_NAME, connection=fakeredis.FakeRedis()))
+    monkeypatch.setattr(pipeline, "FUSED_EVAL", False)
+    for name in ("evaluate_conversation", "analyze_final_code", "run_correctness_tests"):
+        monkeypatch.setattr(pipeline, name, nothing)
+    monkeypatch.setattr(pipeline, "generate_insights", no_insights)
+
+
+def _submit(http: TestClient, session_id: str):
+    return http.post("/submit", json={
+        "session_id": session_id,
+        "final_code": "// --- rq/queue.py ---\nclass Queue: ...\n",
+        "background": True,
+    })
+
+
+def _wait_finished(http: TestClient, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        state = http.get(f"/submit/jobs/{job_id}").json()
+        if state["status"] in ("finished", "failed"):
+            return state
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+class TestBackgroundSubmit:
+
+    def test_enqueue_then_poll_until_scored(self, local_queue):
+        store.sessions.pop("jobs_a", None)
+        with TestClient(app) as http:
+            response = _submit(http, "jobs_a")
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+
+            state = _wait_finished(http, job_id)
+            assert state["status"] == "finished"
+            assert state["stage"] == "done"
+            assert state["score"]["degraded_stages"] == []
+            assert store.sessions["jobs_a"].score.total_score == state["score"]["total_score"]
+
+            # Scored sessions answer /submit directly, as before
+            assert _submit(http, "jobs_a").json()["total_score"] == state["score"]["total_score"]
+
+    def test_score_is_kept_without_polling(self, local_queue, monkeypatch):
+        index = ranking.LeaderboardIndex()
+        monkeypatch.setattr(ranking, "_index", index)
+        store.sessions.pop("jobs_d", None)
+        with TestClient(app) as http:
+            job_id = _submit(http, "jobs_d").json()["job_id"]
+            deadline = time.monotonic() + 10
+            while jobs.job_state(job_id)["status"] != "finished" and time.monotonic() < deadline:
+                time.sleep(0.05)
+        score = store.sessions["jobs_d"].score
+        assert score is not None
+        assert [e["score"] for e in index.page()[0]] == [score.total_score]
+
+    def test_retried_submit_reuses_job(self, local_queue):
+        store.sessions.pop("jobs_b", None)
+        with TestClient(app) as http:
+            first = _submit(http, "jobs_b").json()["job_id"]
+            second = _submit(http, "jobs_b").json()["job_id"]
+            assert first == second
+            _wait_finished(http, first)
+
+    def test_events_stream_ends_with_score(self, local_queue):
+        store.sessions.pop("jobs_c", None)
+        with TestClient(app) as http:
+            job_id = _submit(http, "jobs_c").json()["job_id"]
+            with http.stream("GET", f"/submit/jobs/{job_id}/events") as response:
+                text = "".join(response.iter_text())
+        events = [block.split("\n") for block in text.strip().split("\n\n")]
+        assert events[0][0] == "event: status"
+        assert events[-1][0] == "event: done"
+        assert "total_score" in json.loads(events[-1][1][len("data: "):])
+
+    def test_unknown_job_is_404(self, local_queue):
+        with TestClient(app) as http:
+            assert http.get("/submit/jobs/submit-nope").status_code == 404
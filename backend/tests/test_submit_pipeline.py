@@ -0,0 +1,109 @@
+"""
+Tests for the deadline-aware /submit pipeline (scoring/pipeline.py):
+over-budget stages fall back, are reported, and are cancelled or, with a
+late window, attach later.
+"""
+
+import asyncio
+
+import pytest
+
+from models.session import Session
+from scoring import pipeline
+from scoring.semantic import ConversationSemanticEval
+
+CONV_EVAL = ConversationSemanticEval(
+    a1_understanding=6, a2_decomposition=7, a3_justification=7, a4_edge_cases=5,
+    b3_efficiency_discussion=5, b4_ownership_dialogue=5, c2_test_mentions=9,
+    c3_ai_questioning=4, d1_narration=8, d2_tradeoffs=7, d3_ai_balance=5,
+    d4_status_updates=5, interpretation="Thorough.",
+)
+
+
+def _session() -> Session:
+    return Session(
+        session_id="pipeline_test",
+        conversation_history=[{"role": "user", "content": "How does enqueue work?"}],
+        final_code="// --- rq/queue.py ---\nclass Queue: ...\n",
+    )
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    def install(conversation_delay: float = 0.0, insights_delay: float = 0.0):
+        async def conversation(history):
+            try:
+                await asyncio.sleep(conversation_delay)
+            except asyncio.CancelledError:
+                cancelled.append("conversation")
+                raise
+            return CONV_EVAL
+
+        async def nothing(*args, **kwargs):
+            return None
+
+        async def insights(**kwargs):
+            await asyncio.sleep(insights_delay)
+            return []   # empty → fallback insights
+
+        monkeypatch.setattr(pipeline, "FUSED_EVAL", False)
+        monkeypatch.setattr(pipeline, "EVAL_BUDGET_S", 0.2)
+        monkeypatch.setattr(pipeline, "INSIGHTS_BUDGET_S", 0.2)
+        monkeypatch.setattr(pipeline, "evaluate_conversation", conversation)
+        monkeypatch.setattr(pipeline, "analyze_final_code", nothing)
+        monkeypatch.setattr(pipeline, "run_correctness_tests", nothing)
+        monkeypatch.setattr(pipeline, "generate_insights", insights)
+    cancelled = []
+    install.cancelled = cancelled
+    return install
+
+
+def _submit(session: Session):
+    """Score the session like /submit does, then let late stages finish."""
+    async def run():
+        score = await pipeline.score_session(session)
+        session.score = score
+        await asyncio.gather(*pipeline._late_tasks)
+        return score
+    return asyncio.run(run())
+
+
+class TestBudgets:
+
+    def test_all_stages_in_budget(self, stages):
+        stages()
+        score = _submit(_session())
+        assert score.degraded_stages == []
+        assert score.interpretation == "Thorough."
+
+    def test_slow_stage_is_cancelled_by_default(self, stages):
+        stages(conversation_delay=0.5)
+
+        async def run():
+            score = await pipeline.score_session(_session())
+            assert stages.cancelled == ["conversation"]    # before the response goes out
+            assert not pipeline._late_tasks
+            return score
+
+        assert asyncio.run(run()).degraded_stages == ["conversation"]
+
+    def test_slow_stage_degrades_then_attaches(self, stages, monkeypatch):
+        stages(conversation_delay=0.5)
+        monkeypatch.setattr(pipeline, "LATE_RESULT_S", 5)
+        session = _session()
+        score = _submit(session)
+        assert score.degraded_stages == ["conversation"]
+        assert score.interpretation != "Thorough."           # metric fallback
+        assert score.insights                                # fallback insights
+
+        assert session.score is not score
+        assert session.score.degraded_stages == []
+        assert session.score.interpretation == "Thorough."
+        assert session.score.insights == score.insights
+
+    def test_overall_deadline_caps_later_stages(self, stages, monkeypatch):
+        stages(insights_delay=0.5)
+        monkeypatch.setattr(pipeline, "INSIGHTS_BUDGET_S", 5)
+        monkeypatch.setattr(pipeline, "SUBMIT_BUDGET_S", 0.3)
+        score = _submit(_session())
+        assert score.degraded_stages == ["insights"]
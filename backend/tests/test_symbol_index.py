@@ -0,0 +1,92 @@
+"""
+Tests for relevance-ranked codebase context (gemini/symbol_index.py and
+the context builder in gemini/client.py).
+"""
+
+from gemini import client as gemini_client
+from gemini.client import _build_context_block, _condense
+from gemini.symbol_index import Query, build_query, file_symbols, rank_files
+from gemini.tokens import estimate_tokens
+
+QUEUE = '''
+class Queue:
+    def enqueue(self, f):
+        return self.enqueue_call(f)
+
+    def enqueue_call(self, f):
+        return Job.create(f)
+'''
+
+WORKER = '''
+class Worker:
+    def work(self):
+        job = self.dequeue_job()
+        self.perform_job(job)
+
+    def dequeue_job(self):
+        return None
+
+    def perform_job(self, job):
+        return job.perform()
+'''
+
+REGISTRY = '''
+class ScheduledJobRegistry:
+    def schedule(self, job, scheduled_time):
+        self.add(job, scheduled_time)
+'''
+
+FILES = {"rq/queue.py": QUEUE, "rq/worker.py": WORKER, "rq/registry.py": REGISTRY,
+         "rq/utils.py": "def utcnow():\n    return 0\n"}
+
+
+def _headers(block: str) -> list[str]:
+    return [line for line in block.split("\n") if line.startswith("--- ")]
+
+
+class TestRanking:
+
+    def test_symbols_are_indexed_with_spans(self):
+        symbols = {s.qualname: s for s in file_symbols("rq/worker.py", WORKER).symbols}
+        assert set(symbols) == {"Worker", "Worker.work", "Worker.dequeue_job", "Worker.perform_job"}
+        assert symbols["Worker.work"].kind == "method"
+        assert (symbols["Worker.work"].start, symbols["Worker.work"].end) == (3, 5)
+
+    def test_prompt_terms_rank_files(self):
+        query = build_query("How do scheduled jobs get added to the registry?", "rq/queue.py", FILES)
+        ranked = rank_files(FILES, query, exclude="rq/queue.py")
+        assert ranked[0][0] == "rq/registry.py"
+        assert "rq/queue.py" not in [path for path, _ in ranked]
+
+    def test_mentioned_path_outranks_symbol_matches(self):
+        query = Query("what does worker.py do with a ScheduledJobRegistry")
+        assert rank_files(FILES, query)[0][0] == "rq/worker.py"
+
+    def test_unparseable_file_still_ranked_by_path(self):
+        files = {**FILES, "rq/worker.py": "class Worker(:\n"}
+        query = Query("look at worker.py")
+        assert rank_files(files, query)[0][0] == "rq/worker.py"
+
+
+class TestContextBlock:
+
+    def test_relevant_files_come_first(self):
+        block = _build_context_block("rq/queue.py", FILES, "where does perform_job run?")
+        assert _headers(block)[:2] == ["--- ACTIVE FILE: rq/queue.py ---", "--- rq/worker.py ---"]
+
+    def test_condense_elides_least_relevant_bodies(self):
+        query = Query("perform_job")
+        condensed = _condense("rq/worker.py", WORKER, query, len(WORKER) - 20)
+        assert "return job.perform()" in condensed
+        assert "def work(self):" in condensed
+        assert "lines elided" in condensed
+
+    def test_excerpts_when_budget_runs_out(self, monkeypatch):
+        padding = "# filler\n" * 40
+        files = {"rq/queue.py": QUEUE + padding, "rq/worker.py": WORKER + padding}
+        budget = estimate_tokens(QUEUE + padding) + 80
+        monkeypatch.setattr(gemini_client, "_context_token_budget", lambda: budget)
+        block = _build_context_block("rq/queue.py", files, "how does perform_job work?")
+        assert "--- rq/worker.py --- [excerpts]" in block
+        assert "def perform_job(self, job):" in block
+        assert "def dequeue_job" not in block
@@ -0,0 +1,191 @@
+"""
+Tests for the sandbox test runner.
+
+Covers final_code parsing, the per-run sandbox views built on top of the
+shared template, and the result cache. Nothing here spawns pytest.
+"""
+
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from scoring import test_runner
+from scoring.test_runner import (
+    RQ_SOURCE, SANDBOX_RQ_DIRNAME, SUITE_TEST_NAMES,
+    parse_final_code, _create_run_view, _get_template, _overlay_files,
+)
+
+
+def _grade(final_code: str, include_hidden: bool = False):
+    return asyncio.run(test_runner._run_tests(final_code, include_hidden))
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def run_view():
+    """Yield a factory for run views and clean them all up afterwards."""
+    created = []
+
+    def make(user_files):
+        run_dir = _create_run_view(_overlay_files(user_files))
+        created.append(run_dir)
+        return run_dir
+
+    yield make
+    for run_dir in created:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+class TestParseFinalCode:
+
+    def test_splits_files(self):
+        files = parse_final_code("// --- rq/a.py ---\nA = 1\n// --- rq/b.py ---\nB = 2")
+        assert files == {"rq/a.py": "A = 1", "rq/b.py": "B = 2"}
+
+    def test_no_headers(self):
+        assert parse_final_code("print('hi')") == {}
+
+    def test_header_lines_only(self):
+        # Headers are whole lines; CRLF and empty files keep the line-by-line semantics
+        code = "preamble\r\n//---rq/a.py---\r\nA = 1\r\n// --- rq/b.py ---\n// --- rq/c.py ---\n\nx = '// --- no ---'\n"
+        assert parse_final_code(code) == {
+            "rq/a.py": "A = 1\r", "rq/b.py": "", "rq/c.py": "\nx = '// --- no ---'\n",
+        }
+
+
+class TestSandboxView:
+
+    def test_template_is_pruned(self):
+        rq_dir = os.path.join(_get_template(), SANDBOX_RQ_DIRNAME)
+        assert os.path.isfile(os.path.join(rq_dir, "rq", "queue.py"))
+        assert os.path.isfile(os.path.join(rq_dir, "tests", "fixtures.py"))
+        assert not os.path.exists(os.path.join(rq_dir, "docs"))
+        assert not os.path.exists(os.path.join(rq_dir, "tests", "test_queue.py"))
+
+    def test_overlay_written_and_template_untouched(self, run_view):
+        original = _read(os.path.join(RQ_SOURCE, "rq", "queue.py"))
+        run_dir = run_view({"rq/queue.py": "# edited\n"})
+
+        view_queue = os.path.join(run_dir, SANDBOX_RQ_DIRNAME, "rq", "queue.py")
+        assert _read(view_queue) == "# edited\n"
+        template_queue = os.path.join(_get_template(), SANDBOX_RQ_DIRNAME, "rq", "queue.py")
+        assert _read(template_queue) == original
+
+        # Untouched siblings and the suite are still visible through links
+        assert os.path.isfile(os.path.join(run_dir, SANDBOX_RQ_DIRNAME, "rq", "job.py"))
+        assert os.path.isfile(os.path.join(run_dir, "test_submission.py"))
+        assert os.path.isfile(os.path.join(run_dir, "conftest.py"))
+
+    def test_unchanged_file_is_linked_not_written(self, run_view):
+        content = _read(os.path.join(RQ_SOURCE, "rq", "job.py"))
+        # Trailing blank lines come from the frontend's file join
+        run_dir = run_view({"rq/job.py": content + "\n\n"})
+        # Nothing to overlay, so the whole rq-v1.0 tree is one symlink
+        assert os.path.islink(os.path.join(run_dir, SANDBOX_RQ_DIRNAME))
+
+    def test_new_file_added(self, run_view):
+        run_dir = run_view({"rq/scheduler.py": "X = 1\n"})
+        assert _read(os.path.join(run_dir, SANDBOX_RQ_DIRNAME, "rq", "scheduler.py")) == "X = 1\n"
+
+    def test_path_escape_rejected(self, run_view):
+        run_dir = run_view({"../../escape.py": "X = 1\n"})
+        assert not os.path.exists(os.path.join(os.path.dirname(run_dir), "escape.py"))
+
+
+class TestForkServerStaleModules:
+
+    def test_overlay_drops_importers(self):
+        from scoring.fork_server import _build_dependents, _stale_modules
+
+        rq_dir = os.path.join(_get_template(), SANDBOX_RQ_DIRNAME)
+        stale = _stale_modules([os.path.join(SANDBOX_RQ_DIRNAME, "rq", "queue.py")],
+                               _build_dependents(rq_dir))
+        # queue.py itself, the modules importing it, and the run's suites
+        assert {"rq.queue", "rq.worker", "rq", "test_submission", "conftest"} <= stale
+        assert "rq.compat" not in stale
+
+
+class TestResultCache:
+
+    @pytest.fixture
+    def fake_runs(self, monkeypatch):
+        """Replace pytest with canned all-pass outcomes, recording each run."""
+        runs = []
+
+        async def fake_run_suites(overlay, suites, on_result=None):
+            runs.append(list(suites))
+            return {name: (True, None) for suite in suites for name in SUITE_TEST_NAMES[suite]}
+
+        test_runner.clear_result_cache()
+        monkeypatch.setattr(test_runner, "TEST_SHARDS", 1)
+        monkeypatch.setattr(test_runner, "_run_suites", fake_run_suites)
+        yield runs
+        test_runner.clear_result_cache()
+
+    def test_unchanged_code_not_rerun(self, fake_runs):
+        code = "// --- rq/queue.py ---\n# edited\n"
+        first = _grade(code)
+        # Trailing newlines from the frontend's file join don't matter
+        second = _grade(code + "\n\n")
+        assert fake_runs == [["test_submission.py"]]
+        assert first == second
+
+    def test_submit_runs_only_hidden_when_visible_cached(self, fake_runs):
+        code = "// --- rq/queue.py ---\n# edited\n"
+        _grade(code)
+        result = _grade(code, include_hidden=True)
+        assert fake_runs == [["test_submission.py"], ["test_hidden.py"]]
+        assert result.total == 20 and result.passed == 20
+
+    def test_stream_yields_results_then_summary(self, monkeypatch, fake_runs):
+        async def streaming_run_suites(overlay, suites, on_result=None):
+            outcomes = {name: (name != "test_enqueue_at_exists", "boom")
+                        for suite in suites for name in SUITE_TEST_NAMES[suite]}
+            for name, (passed, message) in outcomes.items():
+                on_result(test_runner._test_result(name, passed, message))
+            return outcomes
+
+        monkeypatch.setattr(test_runner, "_run_suites", streaming_run_suites)
+
+        async def collect(code):
+            return [item async for item in test_runner.stream_correctness_tests(code)]
+
+        code = "// --- rq/queue.py ---\n# streamed\n"
+        items = asyncio.run(collect(code))
+        *results, summary = items
+        assert [r.test_name for r in results] == list(test_runner.VISIBLE_TEST_NAMES)
+        assert summary.core_failures == ["test_enqueue_at_exists"]
+        assert results[1].error_message == "boom" and results[1].is_core
+
+        # A second run is served from the cache, still result by result
+        assert asyncio.run(collect(code)) == items
+
+    def test_changed_code_reruns(self, fake_runs):
+        _grade("// --- rq/queue.py ---\n# one\n")
+        _grade("// --- rq/queue.py ---\n# two\n")
+        assert len(fake_runs) == 2
+
+
+class TestShardPlan:
+
+    def test_single_shard_runs_whole_files(self, monkeypatch):
+        monkeypatch.setattr(test_runner, "TEST_SHARDS", 4)
+        assert test_runner._plan_shards(["test_submission.py", "test_hidden.py"], 1) == [
+            ["test_submission.py", "test_hidden.py"]
+        ]
+
+    def test_tests_dealt_across_shards(self, monkeypatch):
+        monkeypatch.setattr(test_runner, "TEST_SHARDS", 4)
+        shards = test_runner._plan_shards(["test_submission.py", "test_hidden.py"], 8)
+        assert len(shards) == 4
+        node_ids = [node for shard in shards for node in shard]
+        assert len(node_ids) == len(set(node_ids)) == 20
+        # Core tests are spread out rather than piled into one shard
+        assert shards[0][0] == "test_submission.py::TestSubmission::test_enqueue_in_exists"
+        assert shards[1][0] == "test_submission.py::TestSubmission::test_enqueue_at_exists"
@@ -0,0 +1,73 @@
+"""
+Tests for the indexed event timeline (scoring/timeline.py): window queries
+match a direct scan of the event log, and long sessions score quickly.
+"""
+
+import random
+import time
+
+from models.event import Event
+from models.session import Session
+from scoring.engine import compute_score
+from scoring.timeline import SessionTimeline
+
+KINDS = ["file_open", "file_edit", "prompt_sent", "test_run", "ai_apply"]
+
+
+def _session(events: list[tuple[str, int]], prompts: int = 0) -> Session:
+    history = []
+    for i in range(prompts):
+        history.append({"role": "user", "content": f"How does enqueue handle case {i}?"})
+        history.append({"role": "assistant", "content": "It pushes the job id."})
+    return Session(
+        session_id="timeline_test",
+        events=[Event(session_id="timeline_test", event=kind, ts=ts) for kind, ts in events],
+        conversation_history=history,
+    )
+
+
+def _scan_windows(session: Session, kind: str) -> int:
+    prompts = [e for e in session.events if e.event == "prompt_sent"]
+    found = 0
+    for i, p in enumerate(prompts):
+        end = prompts[i + 1].ts if i + 1 < len(prompts) else float("inf")
+        if any(p.ts < e.ts < end for e in session.events if e.event == kind):
+            found += 1
+    return found
+
+
+class TestSessionTimeline:
+
+    def test_queries_match_scans(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            # Small ts range so ties and out-of-order prompts are common
+            events = [(rng.choice(KINDS), rng.randint(0, 60) * 1000) for _ in range(rng.randint(0, 30))]
+            session = _session(events)
+            timeline = SessionTimeline(session)
+            for kind in ("file_edit", "test_run"):
+                assert timeline.prompt_windows_with(kind) == _scan_windows(session, kind)
+            edits = [e.ts for e in session.events if e.event == "file_edit"]
+            assert timeline.applies_without_edit() == sum(
+                1 for e in session.events if e.event == "ai_apply"
+                and not any(e.ts < t < e.ts + 30_000 for t in edits)
+            )
+
+    def test_after_first_uses_stable_ts_order(self):
+        timeline = SessionTimeline(_session([("file_edit", 5), ("test_run", 5), ("test_run", 9)]))
+        # The edit sorts before the test run it ties with
+        assert not timeline.after_first("test_run", "file_edit")
+        assert timeline.after_first("test_run", "test_run")
+
+    def test_long_session_scores_quickly(self):
+        events = [("prompt_sent", i * 10_000) for i in range(500)]
+        events += [("file_edit", i * 250 + 3) for i in range(20_000)]
+        events += [("ai_apply", i * 10_000 + 1) for i in range(500)]
+        events += [("test_run", i * 50_000 + 2) for i in range(100)]
+        session = _session(events, prompts=500)
+
+        started = time.perf_counter()
+        score = compute_score(session)
+        assert time.perf_counter() - started < 2.0
+        assert score.headline_metrics.ai_modification_rate == 1.0
+        assert score.sub_criteria.c4_debug_discipline == 2.0
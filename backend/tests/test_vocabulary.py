@@ -0,0 +1,50 @@
+"""
+Tests for the combined vocabulary matcher (scoring/vocabulary.py): one scan
+agrees with per-term substring checks, and the RQ sources extend RQ_TERMS.
+"""
+
+import random
+
+from scoring import vocabulary
+from scoring.vocabulary import _Matcher, _words, rq_source_terms, vocabularies
+
+VOCABULARIES = {
+    "rq": frozenset(vocabulary.RQ_TERMS) | rq_source_terms(),
+    "tradeoff": frozenset(vocabulary.TRADEOFF_TERMS),
+    "edge_case": frozenset(vocabulary.EDGE_CASE_TERMS),
+}
+
+
+class TestVocabularyMatcher:
+
+    def test_matches_substring_semantics(self):
+        matcher = _Matcher(VOCABULARIES)
+        terms = sorted(set().union(*VOCABULARIES.values()))
+        rng = random.Random(3)
+        for _ in range(2000):
+            # Glued terms and term fragments, so matches overlap and nest
+            pieces = []
+            for _ in range(rng.randint(0, 6)):
+                term = rng.choice(terms + [" ", "the ", "_"])
+                if rng.random() < 0.3:
+                    start = rng.randrange(len(term))
+                    term = term[start:start + rng.randint(1, len(term))]
+                pieces.append(term)
+            text = "".join(pieces)
+            expected = {name for name, vocab in VOCABULARIES.items()
+                        if any(term in text for term in vocab)}
+            assert matcher.classify(text) == expected, text
+
+    def test_overlapping_terms_count_for_both(self):
+        # "timeouts.py" is grounding; the "timeout" inside it is edge-case language
+        assert vocabularies("Why does timeouts.py exist?") == {"rq", "edge_case"}
+
+    def test_rq_sources_extend_terms(self):
+        terms = rq_source_terms()
+        assert {"enqueue_call", "startedjobregistry", "worker_registration.py"} <= terms
+        assert "to_dict" not in terms            # one-part names are too generic
+        assert vocabulary._is_grounded("Should I call enqueue_call directly?")
+
+    def test_word_sets_are_memoized(self):
+        assert _words("Enqueue the job") is _words("Enqueue the job")
+        assert _words("Enqueue the job") == {"enqueue", "the", "job"}